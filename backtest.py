@@ -0,0 +1,123 @@
+# ----------------------------------------------------------------------
+# 規則回測 (Strategy Rule Backtest)
+#   在每一根歷史 K 棒上套用個股頁面的評語規則 (strategy.classify) 與頂部背離判斷，
+#   統計訊號出現後 N 根 K 棒的報酬、命中率與期間最大回撤：
+#   - 單一股票：calculate_indicators 的輸出 (一欄)
+#   - 全市場：IndicatorMatrix 的 (日期 × 股票) 陣列一次計算
+#   只評估「K 棒數 ≥ MIN_BARS 且 MA200 已有數值」的 K 棒；各訊號樣本重疊，不是獨立交易。
+# ----------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+from strategy import classify, MIN_BARS, VERDICT_BULL, VERDICT_OVERBOUGHT, VERDICT_BEAR, VERDICT_RANGE
+
+BACKTEST_HORIZONS = [5, 20, 60]
+
+# 訊號 → (顯示名稱, 預期方向：+1 看多 / -1 看空 / 0 無方向)
+SIGNALS = {
+    VERDICT_BULL[0]: ("強勢多頭，沿 MA20 操作", 1),
+    VERDICT_OVERBOUGHT[0]: ("趨勢向上但超買，勿追高", -1),
+    VERDICT_BEAR[0]: ("空頭走勢，保守觀望", -1),
+    VERDICT_RANGE[0]: ("區間震盪，等待突破", 0),
+    'divergence': ("頂部背離 (Bearish Divergence)", -1),
+    'all': ("全部 K 棒 (基準)", 0),
+}
+
+
+def _rolling(arr, window, how):
+    # 沿日期方向的滑動 max/min，忽略 NaN (與 strategy._window_max 的 fmax 行為相同)
+    rolling = pd.DataFrame(arr).rolling(window, min_periods=1)
+    return (rolling.max() if how == 'max' else rolling.min()).to_numpy()
+
+
+def _shift(arr, periods):
+    out = np.full_like(arr, np.nan)
+    if periods > 0:
+        out[periods:] = arr[:-periods]
+    else:
+        out[:periods] = arr[-periods:]
+    return out
+
+
+def signal_history(values, min_bars=MIN_BARS):
+    """
+    [核心優化] 每一根 K 棒的規則判斷：回傳 {訊號: (日期 × 股票) bool 陣列}，不可評估的 K 棒為 False。
+    第 t 列的結果等同於只用前 t+1 列呼叫 strategy.evaluate_rules。
+    """
+    close = values['Close']
+    rules = classify(close, _shift(close, 1), values['MA20'], values['MA50'], values['MA200'],
+                     values['RSI'], values['MACD_Hist'])
+
+    # 近 20 根 vs 前 40 根 (第 t-59 ~ t-20 根) 的高點
+    price_high_recent = _rolling(close, 20, 'max')
+    rsi_high_recent = _rolling(values['RSI'], 20, 'max')
+    price_high_prev = _shift(_rolling(close, 40, 'max'), 20)
+    rsi_high_prev = _shift(_rolling(values['RSI'], 40, 'max'), 20)
+    divergence = (price_high_recent > price_high_prev) & (rsi_high_recent < rsi_high_prev)
+
+    valid = (np.cumsum(~np.isnan(close), axis=0) >= min_bars) & ~np.isnan(values['MA200'])
+    signals = {code: (rules['verdict'] == code) & valid for code in SIGNALS if code not in ('divergence', 'all')}
+    signals['divergence'] = divergence & valid
+    signals['all'] = valid
+    return signals
+
+
+def forward_returns(close, horizon):
+    """第 t 根收盤買進、持有 horizon 根後的報酬"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _shift(close, -horizon) / close - 1
+
+
+def forward_drawdown(close, horizon):
+    """持有期間 (第 t+1 ~ t+horizon 根) 收盤價相對進場價的最大跌幅 (≤ 0)"""
+    future_low = _shift(_rolling(close, horizon, 'min'), -horizon)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.minimum(future_low / close - 1, 0)
+
+
+def backtest(values, horizons=BACKTEST_HORIZONS, min_bars=MIN_BARS):
+    """
+    [核心優化] 各訊號 × 持有期的統計：樣本數、命中率 (依預期方向)、平均/中位數報酬、
+    相對全部 K 棒的超額報酬、平均/最差期間回撤 (百分比)。
+    """
+    close = values['Close']
+    signals = signal_history(values, min_bars)
+    rows = []
+    for horizon in horizons:
+        returns = forward_returns(close, horizon)
+        drawdown = forward_drawdown(close, horizon)
+        has_future = ~np.isnan(returns)
+        baseline = np.nan
+        stats = []
+        for code, (label, direction) in SIGNALS.items():
+            mask = signals[code] & has_future
+            r, dd = returns[mask], drawdown[mask]
+            count = int(mask.sum())
+            mean = r.mean() * 100 if count else np.nan
+            if code == 'all':
+                baseline = mean
+            hit = np.nan
+            if count and direction:
+                hit = (np.sign(r) == direction).mean() * 100
+            stats.append({
+                'Signal': label,
+                'Horizon': horizon,
+                'Count': count,
+                'Hit Rate %': hit,
+                'Mean Return %': mean,
+                'Median Return %': np.median(r) * 100 if count else np.nan,
+                'Avg Drawdown %': dd.mean() * 100 if count else np.nan,
+                'Worst Drawdown %': dd.min() * 100 if count else np.nan,
+            })
+        for row in stats:
+            row['Excess %'] = row['Mean Return %'] - baseline
+        rows.extend(stats)
+    columns = ['Signal', 'Horizon', 'Count', 'Hit Rate %', 'Mean Return %', 'Excess %',
+               'Median Return %', 'Avg Drawdown %', 'Worst Drawdown %']
+    return pd.DataFrame(rows, columns=columns)
+
+
+def backtest_frame(df, horizons=BACKTEST_HORIZONS, min_bars=MIN_BARS):
+    """單一股票：對 calculate_indicators 的輸出回測"""
+    values = {c: df[c].to_numpy(dtype='f8')[:, None] for c in df.columns if df[c].dtype.kind in 'fiu'}
+    return backtest(values, horizons, min_bars)
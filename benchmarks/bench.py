@@ -0,0 +1,263 @@
+# ----------------------------------------------------------------------
+# 效能基準 (Benchmarks)
+#   以合成數據 (synthetic.py) 離線量測熱點函數的耗時與記憶體峰值：
+#   - 股票池大小 (20 → 500 → 5,000 檔) × 歷史長度 (1 → 5 → 10 年)
+#   - 耗時：先熱身一次，再重複執行取最小值 / 中位數 (perf_counter)
+#   - 記憶體：另外執行一次，以 tracemalloc 記錄峰值 (含 NumPy 陣列)
+#   結果寫成 JSON (含 git commit 與套件版本)，compare 比較兩份結果、找出退步的項目。
+#
+#   python benchmarks/bench.py run [--quick] [--cases ...] [--output FILE]
+#   python benchmarks/bench.py compare BASE.json NEW.json [--threshold 0.2]
+# ----------------------------------------------------------------------
+
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import tempfile
+import argparse
+import statistics
+import subprocess
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+import plotly
+import synthetic
+from treemap import TREEMAP_HORIZONS, process_data_for_periods, build_treemap_figure, build_treemap_snapshot, collapse_small_caps
+from indicators import calculate_indicators, compute_indicators, fear_greed_score
+from charts import build_tech_chart
+from datasets import derive_fundamentals, FEAR_GREED_TICKERS
+from macro_engine import FearGreedStore, fear_greed_history, close_matrix
+
+UNIVERSE_SIZES = [20, 500, 5000]
+HISTORY_YEARS = [1, 5, 10]
+QUICK_SIZES = [20, 500]
+QUICK_YEARS = [1, 5]
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+TIME_BUDGET = 2.0   # 每個量測點的重複執行總時間 (秒)
+MIN_REPEAT = 3
+MAX_REPEAT = 20
+MAX_CELLS = 13_000_000  # 股票數 × K 棒數超過此值的量測點略過 (記憶體不足的機器可調低)
+
+
+# --- 量測項目：每個項目接收 (股票數, 年數)，回傳要量測的零參數函數 ---
+def _process_data(size, years):
+    base, history, caps = synthetic.universe(size), synthetic.price_history(size, years), synthetic.market_caps(size)
+    return lambda: process_data_for_periods(base.copy(), history, caps)
+
+
+def _compute_indicators(size, years):
+    history = synthetic.price_history(size, years)
+    return lambda: compute_indicators(history)
+
+
+def _calculate_indicators(size, years):
+    df = synthetic.stock_history(years)
+    return lambda: calculate_indicators(df)
+
+
+def _fear_greed(size, years):
+    close, vix = synthetic.stock_history(years)['Close'], synthetic.vix_close()
+    return lambda: fear_greed_score(vix, close)  # 無 cache：首次計算 (整段重算)
+
+
+def _fear_greed_history(size, years):
+    # 多因子指數整段歷史：總經代號 years 年 + size 檔成分股最近一年的廣度
+    closes = synthetic.macro_closes(FEAR_GREED_TICKERS, years)
+    constituents = close_matrix(synthetic.price_history(size, 1))
+    return lambda: fear_greed_history(closes, constituents)
+
+
+def _fear_greed_update(size, years):
+    # 已有歷史檔時的增量更新 (只重算最後幾天)
+    closes = synthetic.macro_closes(FEAR_GREED_TICKERS, years)
+    constituents = close_matrix(synthetic.price_history(size, 1))
+    store = FearGreedStore(tempfile.mkdtemp())
+    store.update(closes, constituents)
+    return lambda: store.update(closes, constituents)
+
+
+def _treemap_figure(size, years):
+    # 單一週期的熱力圖建構 + JSON 序列化 (頁面送出的內容)
+    metrics = process_data_for_periods(synthetic.universe(size), synthetic.price_history(size, years),
+                                       synthetic.market_caps(size))
+    _, change_col, suffix, color_range = TREEMAP_HORIZONS[0]
+    display_df = collapse_small_caps(metrics, [change_col])
+    return lambda: build_treemap_figure(display_df, change_col, f"Benchmark {suffix}", color_range).to_json()
+
+
+def _treemap_snapshot(size, years):
+    base, history, caps = synthetic.universe(size), synthetic.price_history(size, years), synthetic.market_caps(size)
+    return lambda: build_treemap_snapshot(base, history, caps, "Benchmark")
+
+
+def _tech_chart(size, years):
+    df = calculate_indicators(synthetic.stock_history(years))
+    return lambda: build_tech_chart(df, "BENCH").to_json()
+
+
+def _fundamentals(size, years):
+    # 財報解析：size 檔股票各自的 info + 三張財報 (info 缺利潤率 / FCF，走財報備援路徑)
+    parts = synthetic.statements(size)
+    return lambda: [derive_fundamentals(*p) for p in parts]
+
+
+# 名稱 → (函數, 縮放軸)；'size' 軸固定 1 年、'years' 軸固定單一股票
+CASES = {
+    'process_data_for_periods': (_process_data, ('size', 'years')),
+    'compute_indicators': (_compute_indicators, ('size', 'years')),
+    'calculate_indicators': (_calculate_indicators, ('years',)),
+    'fear_greed_score': (_fear_greed, ('years',)),
+    'fear_greed_history': (_fear_greed_history, ('size', 'years')),
+    'fear_greed_update': (_fear_greed_update, ('size', 'years')),
+    'treemap_figure': (_treemap_figure, ('size',)),
+    'treemap_snapshot': (_treemap_snapshot, ('size',)),
+    'tech_chart': (_tech_chart, ('years',)),
+    'derive_fundamentals': (_fundamentals, ('size',)),
+}
+
+
+def grid(cases, sizes, years, max_cells=MAX_CELLS):
+    """(項目, 股票數, 年數) 量測點，依數據大小排序 (同一份合成數據連續使用)"""
+    points = set()
+    for name in cases:
+        axes = CASES[name][1]
+        for size in (sizes if 'size' in axes else [1]):
+            for y in (years if 'years' in axes else [1]):
+                if max_cells and size * y * synthetic.BARS_PER_YEAR > max_cells:
+                    continue
+                points.add((size, y, name))
+    return [(name, size, y) for size, y, name in sorted(points)]
+
+
+def measure(fn):
+    """回傳 (耗時列表, 記憶體峰值 bytes)"""
+    fn()  # 熱身 (import、lru_cache、plotly 驗證器)
+    gc.collect()
+    start = time.perf_counter()
+    fn()
+    first = time.perf_counter() - start
+    repeat = max(MIN_REPEAT, min(MAX_REPEAT, int(TIME_BUDGET / max(first, 1e-9))))
+    times = [first]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return times, peak
+
+
+def git_info():
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ''
+    return {'commit': git('rev-parse', 'HEAD') or None,
+            'subject': git('log', '-1', '--format=%s') or None,
+            'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+
+def environment():
+    return {
+        'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+        'plotly': plotly.__version__, 'platform': platform.platform(), 'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run(cases, sizes, years, max_cells=MAX_CELLS, verbose=True):
+    results = []
+    for name, size, y in grid(cases, sizes, years, max_cells):
+        fn = CASES[name][0](size, y)
+        times, peak = measure(fn)
+        row = {'case': name, 'size': size, 'years': y, 'repeat': len(times),
+               'min_s': min(times), 'median_s': statistics.median(times), 'peak_mb': peak / 2 ** 20}
+        results.append(row)
+        if verbose:
+            print(f"{name:<26} size={size:<5} years={y:<3} min={row['min_s'] * 1000:9.2f} ms  "
+                  f"median={row['median_s'] * 1000:9.2f} ms  peak={row['peak_mb']:8.1f} MB", flush=True)
+    return results
+
+
+def compare(base, new, threshold=0.2):
+    """回傳比較表 DataFrame；耗時 (中位數) 或記憶體峰值增加超過 threshold 的列標記為退步"""
+    key = ['case', 'size', 'years']
+    merged = pd.DataFrame(base['results']).merge(pd.DataFrame(new['results']), on=key, suffixes=('_base', '_new'))
+    merged['time_ratio'] = merged['median_s_new'] / merged['median_s_base']
+    merged['mem_ratio'] = merged['peak_mb_new'] / merged['peak_mb_base']
+    merged['regression'] = (merged['time_ratio'] > 1 + threshold) | (merged['mem_ratio'] > 1 + threshold)
+    return merged[key + ['median_s_base', 'median_s_new', 'time_ratio', 'peak_mb_base', 'peak_mb_new',
+                         'mem_ratio', 'regression']]
+
+
+def _default_output(info):
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    commit = (info['commit'] or 'nogit')[:10] + ('-dirty' if info['dirty'] else '')
+    return os.path.join(RESULTS_DIR, f"{stamp}-{commit}.json")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the dashboard hot paths")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_p = sub.add_parser('run', help="run benchmarks and write a JSON result file")
+    run_p.add_argument('--cases', nargs='*', choices=sorted(CASES), help="cases to run (default: all)")
+    run_p.add_argument('--sizes', nargs='*', type=int, help=f"universe sizes (default: {UNIVERSE_SIZES})")
+    run_p.add_argument('--years', nargs='*', type=int, help=f"history lengths in years (default: {HISTORY_YEARS})")
+    run_p.add_argument('--quick', action='store_true', help=f"sizes {QUICK_SIZES} x years {QUICK_YEARS}")
+    run_p.add_argument('--max-cells', type=int, default=MAX_CELLS,
+                       help="skip points with more ticker-bars than this (0 = no limit)")
+    run_p.add_argument('--output', help="result file (default: benchmarks/results/<time>-<commit>.json)")
+
+    cmp_p = sub.add_parser('compare', help="compare two result files")
+    cmp_p.add_argument('base')
+    cmp_p.add_argument('new')
+    cmp_p.add_argument('--threshold', type=float, default=0.2, help="relative slowdown / memory growth to flag")
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        with open(args.base, 'r', encoding='utf-8') as fh:
+            base = json.load(fh)
+        with open(args.new, 'r', encoding='utf-8') as fh:
+            new = json.load(fh)
+        table = compare(base, new, args.threshold)
+        print(f"base: {base['git']['commit']}  new: {new['git']['commit']}")
+        with pd.option_context('display.width', 200, 'display.max_rows', None):
+            print(table.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+        regressions = table[table['regression']]
+        if not regressions.empty:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            return 1
+        return 0
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else UNIVERSE_SIZES)
+    years = args.years or (QUICK_YEARS if args.quick else HISTORY_YEARS)
+    info = git_info()
+    results = run(args.cases or list(CASES), sizes, years, args.max_cells)
+    output = args.output or _default_output(info)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as fh:
+        json.dump({'git': info, 'environment': environment(), 'created': time.time(),
+                   'sizes': sizes, 'years': years, 'results': results}, fh, indent=2)
+    print(f"results written to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# ----------------------------------------------------------------------
+# 合成數據 (Synthetic Market Data)
+#   效能基準用的離線數據，格式與 price_store / yfinance 的輸出相同：
+#   - 價格：幾何布朗運動，(Ticker, Price) MultiIndex 寬表，工作日索引
+#   - 股票池：Ticker / Name / Sector / Industry 與對數常態分佈的市值
+#   - 財報：yfinance 列名稱 × 期別的損益表 / 現金流量表 / 資產負債表
+#   固定隨機種子與結束日期，同樣的參數在任何一個 commit 上都產生相同的數據。
+# ----------------------------------------------------------------------
+
+import functools
+import numpy as np
+import pandas as pd
+
+END_DATE = '2024-12-31'
+SEED = 20240101
+BARS_PER_YEAR = 252
+LATE_LISTING_RATIO = 0.05  # 有 5% 股票在期間中途才上市 (前段為 NaN)
+
+SECTORS = ['Technology', 'Financials', 'Health Care', 'Industrials', 'Consumer Discretionary',
+           'Consumer Staples', 'Energy', 'Materials', 'Utilities', 'Real Estate', 'Communication Services']
+INDUSTRIES_PER_SECTOR = 4
+
+# 財報列名稱格式 (各市場 / 各年度的 yfinance 列名稱不同，解析器依格式快取)
+STATEMENT_FORMATS = [
+    {'Revenue': 'Total Revenue', 'GrossProfit': 'Gross Profit', 'OperatingIncome': 'Operating Income',
+     'NetIncome': 'Net Income', 'BasicEPS': 'Basic EPS', 'OperatingCashFlow': 'Operating Cash Flow',
+     'CapitalExpenditure': 'Capital Expenditure', 'ContractLiabilities': 'Current Deferred Revenue'},
+    {'Revenue': 'Operating Revenue', 'GrossProfit': 'Gross Profit', 'OperatingIncome': 'Total Operating Income As Reported',
+     'NetIncome': 'Net Income Common Stockholders', 'BasicEPS': 'Basic EPS',
+     'OperatingCashFlow': 'Cash Flow From Continuing Operating Activities',
+     'CapitalExpenditure': 'Capital Expenditures', 'ContractLiabilities': 'Contract Liabilities'},
+    {'Revenue': 'Total Revenues (Reported)', 'GrossProfit': 'Reported Gross Profit',
+     'OperatingIncome': 'Operating Income Loss', 'NetIncome': 'Net Income Loss', 'BasicEPS': 'Basic EPS Reported',
+     'OperatingCashFlow': 'Total Cash From Operating Activities', 'CapitalExpenditure': 'Capital Expenditure Reported',
+     'ContractLiabilities': 'Deferred Revenue Non Current'},
+]
+FILLER_ROWS = 40  # 每張財報另有 40 列不相關的科目
+
+
+def tickers(n):
+    return [f"T{i:05d}" for i in range(n)]
+
+
+def trading_days(years):
+    return pd.bdate_range(end=END_DATE, periods=int(years * BARS_PER_YEAR), name='Date')
+
+
+def universe(n):
+    """股票池成分股：Ticker / Name / Sector / Industry"""
+    symbols = tickers(n)
+    sector = np.arange(n) % len(SECTORS)
+    industry = (np.arange(n) // len(SECTORS)) % INDUSTRIES_PER_SECTOR
+    return pd.DataFrame({
+        'Ticker': symbols,
+        'Name': [f"Company {s}" for s in symbols],
+        'Sector': [SECTORS[i] for i in sector],
+        'Industry': [f"{SECTORS[i]} {j + 1}" for i, j in zip(sector, industry)],
+    })
+
+
+def market_caps(n):
+    rng = np.random.default_rng(SEED + n)
+    return dict(zip(tickers(n), rng.lognormal(mean=23, sigma=1.5, size=n)))
+
+
+def _ohlcv(n, years, seed):
+    # (日期 × 股票) 的 OHLCV 陣列
+    rng = np.random.default_rng(seed)
+    days = int(years * BARS_PER_YEAR)
+    drift = rng.normal(0.0003, 0.0004, size=n)
+    vol = rng.uniform(0.01, 0.03, size=n)
+    close = 50 * np.exp(np.cumsum(drift + vol * rng.standard_normal((days, n)), axis=0))
+    open_ = close * (1 + vol * 0.3 * rng.standard_normal((days, n)))
+    spread = np.abs(vol * 0.5 * rng.standard_normal((days, n)))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.lognormal(mean=14, sigma=0.8, size=(days, n)).round()
+
+    late = rng.random(n) < LATE_LISTING_RATIO
+    listed_from = np.where(late, rng.integers(0, max(days - 60, 1), size=n), 0)
+    unlisted = np.arange(days)[:, None] < listed_from[None, :]
+    fields = {'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}
+    for arr in fields.values():
+        arr[unlisted] = np.nan
+    return fields
+
+
+@functools.lru_cache(maxsize=1)
+def price_history(n, years):
+    """n 檔股票 years 年的日 K：(Ticker, Price) MultiIndex 寬表 (與 fetch_price_history 相同)"""
+    fields = _ohlcv(n, years, SEED + n * 100 + int(years * 10))
+    stacked = np.stack([fields[f] for f in ['Open', 'High', 'Low', 'Close', 'Volume']], axis=2)
+    columns = pd.MultiIndex.from_product([tickers(n), ['Open', 'High', 'Low', 'Close', 'Volume']],
+                                         names=['Ticker', 'Price'])
+    return pd.DataFrame(stacked.reshape(stacked.shape[0], -1), index=trading_days(years), columns=columns)
+
+
+def stock_history(years):
+    """單一股票的 OHLCV 長表 (與 get_stock_data 相同)"""
+    fields = _ohlcv(1, years, SEED + int(years * 10))
+    return pd.DataFrame({f: arr[:, 0] for f, arr in fields.items()}, index=trading_days(years))
+
+
+def macro_closes(symbols, years):
+    """總經代號的收盤價寬表 (欄位為 symbols)"""
+    close = _ohlcv(len(symbols), years, SEED - 2 + int(years * 10))['Close']
+    return pd.DataFrame(close, index=trading_days(years), columns=list(symbols))
+
+
+def vix_close():
+    rng = np.random.default_rng(SEED - 1)
+    return float(np.clip(rng.normal(18, 6), 10, 60))
+
+
+def _statement(rng, values, fmt, fields, periods):
+    rows = {fmt[f]: values[f] * (1 + 0.05 * rng.standard_normal(len(periods))) for f in fields}
+    for i in range(FILLER_ROWS):
+        rows[f"Other Line Item {i}"] = rng.normal(1e8, 1e7, size=len(periods))
+    return pd.DataFrame(rows, index=periods).T
+
+
+def statements(n, periods=4):
+    """n 檔股票的 (info, cashflow, balance_sheet, financials, estimates)；info 不含利潤率與 FCF，需由財報計算"""
+    rng = np.random.default_rng(SEED + 7)
+    period_index = pd.DatetimeIndex(pd.date_range(end=END_DATE, periods=periods, freq='YE')[::-1])
+    out = []
+    for i in range(n):
+        fmt = STATEMENT_FORMATS[i % len(STATEMENT_FORMATS)]
+        revenue = rng.lognormal(22, 1.2)
+        values = {
+            'Revenue': revenue, 'GrossProfit': revenue * rng.uniform(0.2, 0.7),
+            'OperatingIncome': revenue * rng.uniform(0.05, 0.3), 'NetIncome': revenue * rng.uniform(0.02, 0.2),
+            'BasicEPS': rng.uniform(0.5, 15), 'OperatingCashFlow': revenue * rng.uniform(0.05, 0.3),
+            'CapitalExpenditure': -revenue * rng.uniform(0.01, 0.1), 'ContractLiabilities': revenue * rng.uniform(0, 0.1),
+        }
+        price = rng.uniform(10, 500)
+        info = {'marketCap': price * rng.uniform(1e8, 1e10), 'currentPrice': price,
+                'forwardPE': rng.uniform(8, 40), 'earningsGrowth': rng.uniform(-0.2, 0.5),
+                'targetMeanPrice': price * 1.1, 'recommendationKey': 'buy'}
+        fin = _statement(rng, values, fmt, ['Revenue', 'GrossProfit', 'OperatingIncome', 'NetIncome', 'BasicEPS'], period_index)
+        cf = _statement(rng, values, fmt, ['OperatingCashFlow', 'CapitalExpenditure'], period_index)
+        bs = _statement(rng, values, fmt, ['ContractLiabilities'], period_index)
+        out.append((info, cf, bs, fin, None))
+    return out
@@ -0,0 +1,75 @@
+# ----------------------------------------------------------------------
+# 個股技術圖 (Technical Chart)
+#   K 線 + 均線 / 布林通道、成交量、RSI、MACD 四層子圖，不依賴 Streamlit：
+#   - 儀表板以 st.plotly_chart 顯示
+#   - 效能基準 (benchmarks/) 直接量測圖表建構時間
+# ----------------------------------------------------------------------
+
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from downsample import CHART_WIDTH_PX, bar_label, chart_budget, choose_bar_rule, resample_bars, downsample_series, up_down_colors
+
+
+def build_tech_chart(df, title, interval='1d', width_px=CHART_WIDTH_PX):
+    # [核心優化] 依圖表寬度降採樣：K 棒太多時合併成週/月 K，折線以 LTTB 保留形狀 (downsample.py)
+    max_bars, max_points = chart_budget(width_px)
+    rule = choose_bar_rule(len(df), max_bars, interval)
+    bars = resample_bars(df, rule)
+
+    def line(column):
+        return downsample_series(df[column], max_points)
+
+    fig = make_subplots(
+        rows=4, cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.03,
+        row_heights=[0.5, 0.15, 0.15, 0.2],
+        subplot_titles=(f"{title} 價格趨勢 ({bar_label(rule, interval)})", "成交量", "RSI", "MACD")
+    )
+
+    # 1. 主圖：K線 + MA
+    fig.add_trace(go.Candlestick(x=bars.index, open=bars['Open'], high=bars['High'], low=bars['Low'], close=bars['Close'], name='Price'), row=1, col=1)
+    for column, color, width in [('MA20', 'orange', 1), ('MA50', 'blue', 1.5), ('MA200', 'red', 2)]:
+        series = line(column)
+        fig.add_trace(go.Scatter(x=series.index, y=series, line=dict(color=color, width=width), name=column), row=1, col=1)
+
+    # 布林通道 (上下軌取同一組點，填色才不會錯位；中軌即 MA20)
+    bands = df.loc[line('MA20').index, ['BB_Upper', 'BB_Lower']]
+    fig.add_trace(go.Scatter(x=bands.index, y=bands['BB_Upper'], line=dict(color='gray', width=0), showlegend=False, hoverinfo='skip'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=bands.index, y=bands['BB_Lower'], line=dict(color='gray', width=0), fill='tonexty', fillcolor='rgba(128,128,128,0.1)', name='BB Band'), row=1, col=1)
+
+    # 2. 成交量
+    colors = up_down_colors(bars['Open'].to_numpy() >= bars['Close'].to_numpy())
+    fig.add_trace(go.Bar(x=bars.index, y=bars['Volume'], marker_color=colors, name='Volume'), row=2, col=1)
+
+    # 3. RSI
+    rsi = line('RSI')
+    fig.add_trace(go.Scatter(x=rsi.index, y=rsi, line=dict(color='purple', width=2), name='RSI'), row=3, col=1)
+    fig.add_hline(y=70, line_dash="dash", line_color="red", row=3, col=1)
+    fig.add_hline(y=30, line_dash="dash", line_color="green", row=3, col=1)
+
+    # 4. MACD
+    macd, signal = line('MACD'), line('Signal_Line')
+    fig.add_trace(go.Scatter(x=macd.index, y=macd, line=dict(color='blue', width=1.5), name='MACD'), row=4, col=1)
+    fig.add_trace(go.Scatter(x=signal.index, y=signal, line=dict(color='orange', width=1.5), name='Signal'), row=4, col=1)
+    colors_hist = up_down_colors(bars['MACD_Hist'].to_numpy() >= 0)
+    fig.add_trace(go.Bar(x=bars.index, y=bars['MACD_Hist'], marker_color=colors_hist, name='Hist'), row=4, col=1)
+
+    # [Fix] Enforce High Contrast Black Text & Light Grid
+    fig.update_layout(
+        height=900,
+        xaxis_rangeslider_visible=False,
+        hovermode='x unified',
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        margin=dict(t=30, b=30),
+        font=dict(color='black')
+    )
+    fig.update_xaxes(showgrid=True, gridcolor='#e0e0e0')
+    fig.update_yaxes(showgrid=True, gridcolor='#e0e0e0')
+    if interval != '1d' and not df.empty:
+        # 盤中：隱藏週末與收盤後的空白時段 (交易時段取自數據本身)
+        hours = df.index.hour + df.index.minute / 60
+        session_end = hours.max() + int(interval[:-1]) / 60
+        fig.update_xaxes(rangebreaks=[dict(bounds=['sat', 'mon']), dict(bounds=[session_end, hours.min()], pattern='hour')])
+    return fig
@@ -0,0 +1,82 @@
+# ----------------------------------------------------------------------
+# 重跑感知的計算圖 (Rerun-aware Compute Graph)
+#   Streamlit 每次互動都會從頭執行頁面；把頁面的計算拆成節點存進 session_state：
+#   - source(名稱, 函數, key, version)：每次都執行 (通常是本程序快取的讀取)，輸出版本由數據內容決定
+#   - node(名稱, 函數, *依賴, key)：版本 = (名稱, key, 依賴的版本) 的雜湊；版本不變時直接取用上次的結果
+#   只有輸入 (代號、週期、顯示區間...) 或數據版本改變的節點會重算，其餘節點沿用。
+#   每個節點保留最近 MAX_VERSIONS 個版本 (來回切換週期時不必重算)，每次取值記錄一個 span (perf_trace.py)。
+# ----------------------------------------------------------------------
+
+import collections
+import numpy as np
+import pandas as pd
+from shared_cache import digest
+from perf_trace import span
+
+MAX_VERSIONS = 3
+
+
+class Result:
+    """節點輸出：值 + 版本字串 (作為下游節點的依賴)"""
+
+    __slots__ = ('value', 'version')
+
+    def __init__(self, value, version):
+        self.value = value
+        self.version = version
+
+
+def frame_version(value):
+    """DataFrame / Series 的內容版本：筆數 + 最後一列的索引與數值 (新 K 棒或最後一根變動時改變)"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        if value.empty:
+            return digest(('empty', tuple(getattr(value, 'columns', ()))))
+        last = value.iloc[-1]
+        values = last.to_numpy(dtype='f8', na_value=np.nan) if isinstance(last, pd.Series) else np.array([last], dtype='f8')
+        return digest((len(value), str(value.index[-1]), tuple(np.round(values, 6).tolist())))
+    return digest(value)
+
+
+class ComputeGraph:
+    """[核心優化] 以 session_state (或任何 dict) 保存節點結果；state[f'graph:{name}'] = {節點: {版本: 值}}"""
+
+    def __init__(self, state, name, max_versions=MAX_VERSIONS):
+        key = f"graph:{name}"
+        if key not in state:
+            state[key] = {}
+        self.memo = state[key]
+        self.name = name
+        self.max_versions = max_versions
+
+    def _lookup(self, node, version):
+        versions = self.memo.get(node)
+        if versions is None or version not in versions:
+            return False, None
+        versions.move_to_end(version)
+        return True, versions[version]
+
+    def _store(self, node, version, value):
+        versions = self.memo.setdefault(node, collections.OrderedDict())
+        versions[version] = value
+        while len(versions) > self.max_versions:
+            versions.popitem(last=False)
+
+    def source(self, node, fn, key=(), version=frame_version):
+        """每次執行 fn() 取得最新數據；輸出版本 = (節點, key, 內容版本)"""
+        with span(f"{self.name}.{node}", 'compute', cache='source'):
+            value = fn()
+        return Result(value, digest((node, key, version(value))))
+
+    def node(self, node, fn, *deps, key=()):
+        """依賴與 key 都沒變時回傳上次的結果，否則以依賴的值呼叫 fn(*values) 重算"""
+        version = digest((node, key, tuple(d.version for d in deps)))
+        hit, value = self._lookup(node, version)
+        with span(f"{self.name}.{node}", 'compute', cache='graph hit' if hit else 'graph miss'):
+            if not hit:
+                value = fn(*(d.value for d in deps))
+                self._store(node, version, value)
+        return Result(value, version)
+
+    def discard(self, node):
+        """移除節點的所有版本 (例如失敗的結果不應被沿用)"""
+        self.memo.pop(node, None)
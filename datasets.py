@@ -0,0 +1,651 @@
+# ----------------------------------------------------------------------
+# 數據集 (Datasets)
+#   所有行情/基本面抓取函數集中於此，不依賴 Streamlit：
+#   - 儀表板 (stock_treemap_dashboard.py) 在外層加上本程序快取 (st.cache_data)
+#   - 背景預熱排程 (prefetch.py) 可在獨立程序中直接呼叫並寫入共用快取
+# ----------------------------------------------------------------------
+
+import time
+import random
+import threading
+import concurrent.futures
+import pandas as pd
+from market_data import get_provider, TokenBucket, FixtureMissing, FetchError
+from price_store import PriceStore, SharesStore
+from intraday_store import IntradayStore
+from fundamentals_store import FundamentalsStore, INFO_TTL
+from macro_engine import FearGreedStore, close_matrix
+from symbols import SymbolDirectory
+from universes import UniverseRegistry
+from line_items import extract_line_items, INCOME_FIELDS, CASHFLOW_FIELDS, BALANCE_FIELDS
+from shared_cache import shared_cached, digest
+from treemap import build_treemap_snapshot
+from indicators import compute_indicators
+from strategy import screen_universe
+from backtest import backtest
+
+_stores = {}
+_stores_lock = threading.RLock()  # 工廠函數內可再取得其他單例
+
+
+def _singleton(name, factory):
+    if name not in _stores:
+        with _stores_lock:
+            if name not in _stores:
+                _stores[name] = factory()
+    return _stores[name]
+
+
+def get_price_store():
+    # 本地價格庫：跨程序保留歷史，刷新時只做增量抓取
+    return _singleton('prices', PriceStore)
+
+
+def get_intraday_store():
+    return _singleton('intraday', IntradayStore)
+
+
+def get_shares_store():
+    return _singleton('shares', SharesStore)
+
+
+# --- 股票池 ---
+def get_universe_registry():
+    return _singleton('universes', UniverseRegistry)
+
+
+@shared_cached('constituents', ttl=24 * 3600, scope_arg=0)
+def get_constituents(universe):
+    """股票池成分股 (Ticker, Name, Sector, Industry, Weight)，定義見 universes/registry.json"""
+    return get_universe_registry().load(universe)
+
+
+def available_universes():
+    """有成分股來源的股票池：{代號: 標題}"""
+    return {key: spec.get('title', key) for key, spec in get_universe_registry().available().items()}
+
+
+def universe_title(universe):
+    return get_universe_registry().title(universe)
+
+
+SHARES_MAX_AGE = 90 * 24 * 3600  # 股本一季才變動一次
+SHARES_RETRIES = 3
+SHARES_WORKERS = 8
+
+
+def fetch_single_shares(ticker):
+    try:
+        shares = get_provider().fast_info(ticker)['shares']
+        return ticker, float(shares) if shares else None
+    except Exception as e:
+        print(f"Shares fetch error for {ticker}: {e}")
+        return ticker, None
+
+
+def fetch_shares_outstanding(tickers):
+    """
+    [核心優化] 流通股數：本地持久化 + 長 TTL，只對缺少或過期的股票發請求，
+    失敗者以有限並行數重試，最後仍失敗則沿用舊值。
+    """
+    store = get_shares_store()
+    shares = store.get_many(tickers, max_age=SHARES_MAX_AGE)
+    missing = [t for t in tickers if t not in shares]
+
+    for attempt in range(SHARES_RETRIES):
+        if not missing:
+            break
+        if attempt:
+            time.sleep(2 ** (attempt - 1))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=SHARES_WORKERS) as executor:
+            results = dict(executor.map(fetch_single_shares, missing))
+        fetched = {t: v for t, v in results.items() if v}
+        store.update(fetched)
+        shares.update(fetched)
+        missing = [t for t in missing if t not in fetched]
+
+    if missing:
+        stale = store.get_many(missing)
+        shares.update(stale)
+        print(f"Shares outstanding unavailable for {len(missing) - len(stale)} tickers: {missing[:10]}")
+    return shares
+
+
+@shared_cached('market_caps', ttl=21600, scope_arg=0)
+def fetch_market_caps(tickers):
+    # 市值 = 流通股數 × 最新收盤價 (收盤價直接取自已快取的 fetch_price_history)
+    history_data = fetch_price_history(tickers)
+    if history_data.empty:
+        return {}
+    last_close = history_data.xs('Close', level=1, axis=1).ffill().iloc[-1]
+    shares = pd.Series(fetch_shares_outstanding(tickers), dtype='float64')
+    caps = (last_close * shares.reindex(last_close.index)).dropna()
+    return caps.to_dict()
+
+
+@shared_cached('prices', ttl=21600, scope_arg=0)
+def fetch_price_history(tickers, period="1y"):
+    try:
+        return get_price_store().get_history(tickers, period=period)
+    except Exception:
+        return pd.DataFrame()
+
+
+# --- 熱力圖快照 ---
+
+
+def history_version(history_data):
+    # 以最後交易日 + 最後一列收盤價的雜湊代表「數據快照版本」
+    if history_data.empty:
+        return None
+    last_row = history_data.iloc[-1]
+    return f"{history_data.index[-1]:%Y-%m-%d}:{digest(tuple(last_row.round(6).fillna(0).tolist()))}"
+
+
+@shared_cached('treemap', ttl=21600, scope_arg=0)
+def get_treemap_snapshot(universe, data_version=None):
+    """每個 (股票池, 數據版本) 只計算一次四個週期的 metrics 與 figure JSON"""
+    base_df = get_constituents(universe)
+    title_prefix = universe_title(universe)
+    if base_df.empty:
+        return {}
+    tickers_list = base_df['Ticker'].tolist()
+    history_data = fetch_price_history(tickers_list)
+    if history_data.empty:
+        return {}
+    snapshot = build_treemap_snapshot(base_df, history_data, fetch_market_caps(tickers_list), title_prefix)
+    return snapshot if snapshot['figures'] else {}
+
+
+@shared_cached('screener', ttl=21600, scope_arg=0)
+def get_screener_table(universe, data_version=None):
+    """全市場技術篩選：沿用熱力圖的 1y 價格寬表，一次套用個股頁面的規則"""
+    base_df = get_constituents(universe)
+    if base_df.empty:
+        return pd.DataFrame()
+    history_data = fetch_price_history(base_df['Ticker'].tolist())
+    if history_data.empty:
+        return pd.DataFrame()
+    table = screen_universe(compute_indicators(history_data))
+    info = base_df.drop_duplicates('Ticker').set_index('Ticker').reindex(columns=['Name', 'Sector'])
+    return info.join(table, how='inner').reset_index()
+
+
+def backtest_version(universe, period='5y'):
+    """回測實際使用的 period 價格寬表的數據版本 (篩選表的 1y 版本不代表 5y 歷史)"""
+    base_df = get_constituents(universe)
+    if base_df.empty:
+        return None
+    return history_version(fetch_price_history(base_df['Ticker'].tolist(), period=period))
+
+
+@shared_cached('backtest', ttl=21600, scope_arg=0)
+def get_backtest_table(universe, period='5y', data_version=None):
+    """全市場規則回測：整個股票池的價格矩陣一次套用所有歷史 K 棒 (data_version 見 backtest_version)"""
+    base_df = get_constituents(universe)
+    if base_df.empty:
+        return pd.DataFrame()
+    history_data = fetch_price_history(base_df['Ticker'].tolist(), period=period)
+    if history_data.empty:
+        return pd.DataFrame()
+    return backtest(compute_indicators(history_data).values)
+
+
+# --- 總經/原物料/資金 ---
+MACRO_TICKERS = ["^VIX", "^GSPC"]
+# 恐懼與貪婪指數的因子：VIX 期限結構、信用 (HYG / LQD)、避險資產 (TLT / 黃金)
+FEAR_GREED_TICKERS = MACRO_TICKERS + ["^VIX3M", "HYG", "LQD", "TLT", "GC=F"]
+MACRO_HISTORY_PERIOD = '5y'
+BREADTH_UNIVERSE = 'sp500'
+COMMODITY_TICKERS = ["BDRY", "DBC", "HG=F", "CL=F", "GC=F"]
+
+
+@shared_cached('macro', ttl=3600)
+def get_macro_data():
+    data = get_price_store().get_history(MACRO_TICKERS, period="1y")
+    
+    if isinstance(data.columns, pd.MultiIndex):
+        level0 = data.columns.get_level_values(0)
+        if 'Close' in level0:
+            data = data.swaplevel(0, 1, axis=1)
+            data.sort_index(axis=1, inplace=True)
+            
+    return data
+
+
+def get_fear_greed_store():
+    return _singleton('fear_greed', FearGreedStore)
+
+
+@shared_cached('fear_greed', ttl=3600)
+def get_fear_greed_history():
+    """多因子恐懼與貪婪指數的每日歷史 (macro_engine.py)：本地歷史檔只重算最後幾天"""
+    closes = close_matrix(get_price_store().get_history(FEAR_GREED_TICKERS, period=MACRO_HISTORY_PERIOD))
+    if closes.empty:
+        return pd.DataFrame()
+    # 市場廣度沿用熱力圖下載的成分股價格 (1y)；更早的廣度由歷史檔保留
+    base_df = get_constituents(BREADTH_UNIVERSE)
+    constituents = close_matrix(fetch_price_history(base_df['Ticker'].tolist())) if not base_df.empty else None
+    return get_fear_greed_store().update(closes, constituents)
+
+
+@shared_cached('commodity', ttl=3600)
+def get_commodity_data():
+    data = get_price_store().get_history(COMMODITY_TICKERS, period="1y")
+    
+    if isinstance(data.columns, pd.MultiIndex):
+        level0 = data.columns.get_level_values(0)
+        if 'Close' in level0:
+            data = data.swaplevel(0, 1, axis=1)
+            data.sort_index(axis=1, inplace=True)
+            
+    return data
+
+
+@shared_cached('stock', ttl=3600, scope_arg=0)
+def get_stock_data(ticker, period="2y"):
+    # 沒有 K 棒時：資料源出錯拋出 FetchError，資料源回應但沒有資料才回傳空 DataFrame (代號解析據此判斷)
+    store = get_price_store()
+    try:
+        history = store.get_history([ticker], period=period)
+    except Exception as e:
+        print(f"Error fetching {ticker}: {e}")
+        raise FetchError(f"{ticker}: {e}") from e
+
+    if not history.empty and ticker in history.columns.get_level_values(0):
+        data = history[ticker].dropna(subset=['Close'])
+        if not data.empty:
+            return data
+    if store.fetch_failed(ticker):
+        raise FetchError(f"{ticker}: 資料源暫時無法回應")
+    return pd.DataFrame()
+
+
+def get_intraday_data(ticker, interval, days=None):
+    # 盤中 K 棒由本地日檔組成，不經共用快取 (讀取只需毫秒、同步 60 秒一次)；錯誤處理同 get_stock_data
+    store = get_intraday_store()
+    try:
+        data = store.get_bars(ticker, interval, days)
+    except Exception as e:
+        print(f"Error fetching intraday {ticker} {interval}: {e}")
+        raise FetchError(f"{ticker} {interval}: {e}") from e
+    if data.empty and store.fetch_failed(ticker, interval):
+        raise FetchError(f"{ticker} {interval}: 資料源暫時無法回應")
+    return data
+
+
+# --- 基本面 ---
+# 各部分的抓取方式 (與 FundamentalsStore 的 part 名稱對應)
+FUNDAMENTAL_FETCHERS = {
+    'info': lambda provider, ticker: provider.info(ticker),
+    'estimates': lambda provider, ticker: provider.estimates(ticker),
+    'financials': lambda provider, ticker: provider.financials(ticker),  # 損益表
+    'cashflow': lambda provider, ticker: provider.cashflow(ticker),
+    'balance_sheet': lambda provider, ticker: provider.balance_sheet(ticker),
+}
+FUNDAMENTAL_DEFAULTS = {
+    'info': dict,
+    'estimates': lambda: (None, None, None),
+    'financials': pd.DataFrame,
+    'cashflow': pd.DataFrame,
+    'balance_sheet': pd.DataFrame,
+}
+
+
+# 所有基本面請求共用同一個執行緒池與速率限制 (單一股票頁面與整個股票池的批次計算)
+FUNDAMENTALS_WORKERS = 8
+FUNDAMENTALS_RATE = 5.0     # 每秒請求數
+FUNDAMENTALS_BURST = 10
+FUNDAMENTALS_RETRIES = 3
+FUNDAMENTALS_BACKOFF = 1.0  # 第一次重試前等待秒數，之後指數成長
+
+
+def get_fundamentals_store():
+    return _singleton('fundamentals', FundamentalsStore)
+
+
+def get_fundamentals_pool():
+    return _singleton('fundamentals_pool', lambda: concurrent.futures.ThreadPoolExecutor(
+        max_workers=FUNDAMENTALS_WORKERS, thread_name_prefix='fundamentals'))
+
+
+def get_fundamentals_limiter():
+    return _singleton('fundamentals_limiter', lambda: TokenBucket(FUNDAMENTALS_RATE, FUNDAMENTALS_BURST))
+
+
+def _fetch_part(provider, ticker, part):
+    """單一部分的請求：先取得速率額度，失敗時指數退避重試 (離線 fixture 缺檔不重試)"""
+    limiter = get_fundamentals_limiter()
+    for attempt in range(FUNDAMENTALS_RETRIES):
+        limiter.acquire()
+        try:
+            return FUNDAMENTAL_FETCHERS[part](provider, ticker)
+        except FixtureMissing:
+            raise
+        except Exception:
+            if attempt == FUNDAMENTALS_RETRIES - 1:
+                raise
+            time.sleep(FUNDAMENTALS_BACKOFF * (2 ** attempt) * (1 + random.random()))
+
+
+def _fetch_fundamental_parts(ticker, parts, parallel=True):
+    """
+    抓取指定的部分並寫入基本面資料庫；失敗的部分不寫入 (沿用舊資料)。
+    parallel 時各部分送進共用執行緒池；批次計算本身已在池中執行，改為依序抓取以免互相等待。
+    """
+    if not parts:
+        return {}
+    provider = get_provider()
+    store = get_fundamentals_store()
+    if parallel:
+        pool = get_fundamentals_pool()
+        futures = {part: pool.submit(_fetch_part, provider, ticker, part) for part in parts}
+        results = {part: future.exception() or future.result() for part, future in futures.items()}
+    else:
+        results = {}
+        for part in parts:
+            try:
+                results[part] = _fetch_part(provider, ticker, part)
+            except Exception as e:
+                results[part] = e
+
+    fetched = {}
+    for part, value in results.items():
+        if isinstance(value, Exception):
+            print(f"Fundamentals fetch error for {ticker} ({part}): {value}")
+            continue
+        store.save(ticker, part, value)
+        fetched[part] = value
+    return fetched
+
+
+def load_fundamental_parts(ticker, parallel=True):
+    """
+    [核心優化] 從基本面資料庫讀取各部分，只重新抓取過期的部分：
+    先抓 info / 預估，再依新的 info 判斷是否有新年度財報需要重抓。
+    """
+    store = get_fundamentals_store()
+    entries = store.load_all(ticker)
+    parts = {part: entry['value'] for part, entry in entries.items() if entry is not None}
+
+    stale = store.stale_parts(ticker, entries)
+    if stale:
+        parts.update(_fetch_fundamental_parts(ticker, stale, parallel))
+        if 'info' in stale and 'info' in parts:
+            recheck = [p for p in store.stale_parts(ticker, info=parts['info']) if p not in stale]
+            parts.update(_fetch_fundamental_parts(ticker, recheck, parallel))
+
+    for part, default in FUNDAMENTAL_DEFAULTS.items():
+        if parts.get(part) is None:
+            parts[part] = default()
+    return parts
+
+
+def derive_fundamentals(info, cf, bs, fin, est_data):
+    """由 info 與財報計算估值欄位 (含財報手動計算備援)，不發出網路請求"""
+    result = {
+        'P/FCF': None, 'FCF': None, 'MarketCap': None,
+        'GrossMargin': None, 'OperatingMargin': None,
+        'EarningsGrowth': None, 'ContractLiabilities': None,
+        'TrailingPE': None, 'ForwardPE': None,
+        'PEG': None, 'ForwardEPS': None,
+        'EarningsEst': None, 'EPSTrend': None,
+        'TargetMean': None, 'TargetHigh': None, 'TargetLow': None,
+        'Recommendation': None, 'NumAnalysts': None,
+        'RecSummary': None
+    }
+    
+    try:
+        info_lower = {k.lower(): v for k, v in info.items()} if info else {}
+        
+        def get_val(keys_list, default=None):
+            for k in keys_list:
+                if k.lower() in info_lower:
+                    return info_lower[k.lower()]
+            return default
+
+        # 1. 優先使用 Info 中的數據
+        result['MarketCap'] = get_val(['marketCap'])
+        result['GrossMargin'] = get_val(['grossMargins', 'grossMargin'])
+        result['OperatingMargin'] = get_val(['operatingMargins', 'operatingMargin'])
+        result['EarningsGrowth'] = get_val(['earningsGrowth'])
+        result['TrailingPE'] = get_val(['trailingPE'])
+        result['ForwardPE'] = get_val(['forwardPE'])
+        result['PEG'] = get_val(['pegRatio'])
+        result['ForwardEPS'] = get_val(['forwardEps', 'forwardEPS'])
+        
+        # 2. 手動計算備援：從損益表 (Income Statement) 計算 Margin 與 PE
+        if not fin.empty:
+            try:
+                # 科目對照 (line_items.py)：Total Revenue, Gross Profit, Operating Income, Basic EPS
+                items = extract_line_items(fin, INCOME_FIELDS)
+                rev = items['Revenue']
+                gross_profit = items['GrossProfit']
+                op_inc = items['OperatingIncome']
+                basic_eps = items['BasicEPS']
+
+                # 補救 Gross Margin
+                if result['GrossMargin'] is None and rev and gross_profit:
+                    result['GrossMargin'] = gross_profit / rev
+                
+                # 補救 Operating Margin
+                if result['OperatingMargin'] is None and rev and op_inc:
+                    result['OperatingMargin'] = op_inc / rev
+                
+                # 補救 Trailing PE (股價 / Basic EPS)
+                curr_price = get_val(['currentPrice', 'regularMarketPrice', 'ask', 'bid'])
+                if result['TrailingPE'] is None and curr_price and basic_eps:
+                    result['TrailingPE'] = curr_price / basic_eps
+
+            except: pass
+
+        # 3. 補救 Forward EPS (股價 / ForwardPE)
+        if result['ForwardEPS'] is None and result['ForwardPE']:
+             curr_price = get_val(['currentPrice', 'regularMarketPrice', 'ask', 'bid'])
+             if curr_price:
+                 result['ForwardEPS'] = curr_price / result['ForwardPE']
+
+        # 4. 補救 PEG
+        if result['PEG'] is None and result['TrailingPE'] and result['EarningsGrowth']:
+             if result['EarningsGrowth'] > 0:
+                result['PEG'] = result['TrailingPE'] / (result['EarningsGrowth'] * 100)
+
+        # 分析師數據
+        result['TargetMean'] = get_val(['targetMeanPrice'])
+        result['TargetHigh'] = get_val(['targetHighPrice'])
+        result['TargetLow'] = get_val(['targetLowPrice'])
+        result['Recommendation'] = get_val(['recommendationKey'])
+        result['NumAnalysts'] = get_val(['numberOfAnalystOpinions'])
+
+        # 5. 現金流解析
+        fcf = get_val(['freeCashflow'])
+        if fcf is None and not cf.empty:
+            try:
+                items = extract_line_items(cf, CASHFLOW_FIELDS)
+                op_cf = items['OperatingCashFlow']
+                capex = items['CapitalExpenditure']
+                
+                if op_cf is not None and capex is not None:
+                    fcf = op_cf + capex 
+            except: pass
+        result['FCF'] = fcf
+
+        if fcf and result['MarketCap'] and fcf > 0:
+            result['P/FCF'] = result['MarketCap'] / fcf
+
+        # 6. 資產負債表解析
+        if not bs.empty:
+            try:
+                result['ContractLiabilities'] = extract_line_items(bs, BALANCE_FIELDS)['ContractLiabilities']
+            except: pass
+
+        # 7. 分析師預估
+        if est_data:
+            result['EarningsEst'] = est_data[0]
+            result['EPSTrend'] = est_data[1]
+            result['RecSummary'] = est_data[2]
+
+    except Exception as e:
+        print(f"Fundamentals derive error: {e}")
+
+    return result
+
+
+@shared_cached('fundamentals', ttl=INFO_TTL, scope_arg=0)
+def get_fundamentals(ticker):
+    """
+    [核心優化] 各部分分開快取 (fundamentals_store.py)，曾查過的股票通常只需重抓 info
+    """
+    try:
+        parts = load_fundamental_parts(ticker)
+    except Exception as e:
+        print(f"Fundamentals critical error for {ticker}: {e}")
+        parts = {part: default() for part, default in FUNDAMENTAL_DEFAULTS.items()}
+    return _derive_parts(parts)
+
+
+def _derive_parts(parts):
+    return derive_fundamentals(parts['info'], parts['cashflow'], parts['balance_sheet'],
+                               parts['financials'], parts['estimates'])
+
+
+# --- 整個股票池的估值表 ---
+# 估值表保留的純量欄位 (分析師預估等 DataFrame 欄位不放進表格)
+VALUATION_FIELDS = ['MarketCap', 'TrailingPE', 'ForwardPE', 'PEG', 'P/FCF', 'FCF',
+                    'GrossMargin', 'OperatingMargin', 'EarningsGrowth', 'ContractLiabilities']
+
+
+def _bulk_fundamentals_task(ticker):
+    try:
+        return _derive_parts(load_fundamental_parts(ticker, parallel=False))
+    except Exception as e:
+        print(f"Fundamentals critical error for {ticker}: {e}")
+        return None
+
+
+def iter_fundamentals(tickers):
+    """
+    [核心優化] 串流回傳 (ticker, 估值 dict)：資料庫中仍新鮮的股票先直接回傳，
+    其餘送進共用執行緒池，完成一檔回傳一檔。每個部分抓到就寫入資料庫，
+    中斷後重跑只會抓尚未完成 (或已過期) 的股票。
+    """
+    store = get_fundamentals_store()
+    pending = []
+    for t in dict.fromkeys(tickers):
+        entries = store.load_all(t)
+        if store.stale_parts(t, entries):
+            pending.append(t)
+            continue
+        yield t, _derive_parts({part: entry['value'] for part, entry in entries.items()})
+
+    # 同時只送出與工作執行緒數相同的工作，單一股票頁面的請求不必排在整個股票池後面
+    pool = get_fundamentals_pool()
+    pending.reverse()
+    in_flight = {}
+    try:
+        while pending or in_flight:
+            while pending and len(in_flight) < FUNDAMENTALS_WORKERS:
+                t = pending.pop()
+                in_flight[pool.submit(_bulk_fundamentals_task, t)] = t
+            done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                t = in_flight.pop(future)
+                result = future.result()
+                if result is not None:
+                    yield t, result
+    finally:
+        # 呼叫端提前結束 (中斷) 時取消尚未開始的工作
+        for future in in_flight:
+            future.cancel()
+
+
+def _valuation_frame(rows):
+    if not rows:
+        return pd.DataFrame()
+    table = pd.DataFrame(rows)
+    table[VALUATION_FIELDS] = table[VALUATION_FIELDS].apply(pd.to_numeric, errors='coerce')
+    return table
+
+
+def build_valuation_table(tickers, progress_every=50, rows=None):
+    """rows：完成一檔就附加一列的 list (建立中可由其他執行緒讀取部分結果)"""
+    rows = [] if rows is None else rows
+    total = len(tickers)
+    started = time.time()
+    for done, (ticker, result) in enumerate(iter_fundamentals(tickers), start=1):
+        rows.append({'Ticker': ticker, **{k: result.get(k) for k in VALUATION_FIELDS}})
+        if done % progress_every == 0:
+            print(f"[fundamentals] {done}/{total} tickers in {time.time() - started:.1f}s")
+    return _valuation_frame(rows)
+
+
+_valuation_rows = {}  # 股票池 → 本程序建立中的估值表已完成的列
+
+
+@shared_cached('valuation', ttl=INFO_TTL, scope_arg=0)
+def get_valuation_table(universe):
+    """整個股票池的估值欄位 (P/E、P/FCF、毛利率、營益率、PEG、合約負債...)"""
+    base_df = get_constituents(universe)
+    if base_df.empty:
+        return pd.DataFrame()
+    rows = _valuation_rows[universe] = []
+    try:
+        return build_valuation_table(base_df['Ticker'].tolist(), rows=rows)
+    finally:
+        if _valuation_rows.get(universe) is rows:
+            del _valuation_rows[universe]
+
+
+VALUATION_BUILD_WORKERS = 2
+VALUATION_RETRY = 15 * 60   # 建立結果為空時，隔多久才再重試
+
+
+def get_valuation_builder():
+    return _singleton('valuation_builder', lambda: concurrent.futures.ThreadPoolExecutor(
+        max_workers=VALUATION_BUILD_WORKERS, thread_name_prefix='valuation-build'))
+
+
+_valuation_builds = {}  # 股票池 → (Future, 開始時間)
+_valuation_builds_lock = threading.Lock()
+
+
+def get_valuation_snapshot(universe):
+    """
+    [非阻塞] 頁面渲染用的估值表：回傳 (估值表, 已完成檔數, 總檔數, 是否建立中)。
+    共用快取有結果 (含過期，過期時背景更新) 就回傳完整表；否則在背景建立 (single-flight，
+    別的 replica 正在建立時背景執行緒只是等待)，先回傳本程序已完成的部分結果。
+    """
+    if get_valuation_table.peek(universe) is not None:
+        table = get_valuation_table(universe)
+        return table, len(table), len(table), False
+
+    with _valuation_builds_lock:
+        build = _valuation_builds.get(universe)
+        if build is not None and build[0].done():
+            # 完成的結果已寫入共用快取，只在這次回傳；結果為空時 VALUATION_RETRY 內不重建
+            table = build[0].result() if build[0].exception() is None else pd.DataFrame()
+            if table.empty and time.time() - build[1] < VALUATION_RETRY:
+                return table, 0, 0, False
+            del _valuation_builds[universe]
+            if not table.empty:
+                return table, len(table), len(table), False
+            build = None
+        if build is None:
+            _valuation_builds[universe] = (get_valuation_builder().submit(get_valuation_table, universe), time.time())
+
+    rows = list(_valuation_rows.get(universe, ()))
+    return _valuation_frame(rows), len(rows), len(get_constituents(universe)), True
+
+
+# --- 代號解析 ---
+def get_symbol_directory():
+    # 以所有股票池的成分股 (共用快取) 作為初始的已知代號
+    def factory():
+        directory = SymbolDirectory(price_store=get_price_store())
+        for universe in available_universes():
+            try:
+                directory.seed(get_constituents(universe))
+            except Exception as e:
+                print(f"Symbol directory seed error: {e}")
+        return directory
+    return _singleton('symbols', factory)
@@ -0,0 +1,105 @@
+# ----------------------------------------------------------------------
+# 圖表降採樣 (Server-side Chart Downsampling)
+#   技術分析圖表送到瀏覽器前先依圖表寬度減少點數：
+#   1. K 棒 / 成交量 / MACD 柱狀：K 棒太多時合併成較長週期 (日 → 週/月、分 → 較長的分 K；OHLC 聚合)
+#   2. 均線 / 布林 / RSI / MACD 線：LTTB (Largest-Triangle-Three-Buckets)，保留轉折形狀
+#   點數上限依圖表像素寬度決定；縮小顯示區間時，區間內的點數少了就自動回到完整解析度。
+# ----------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+CHART_WIDTH_PX = 1200   # 技術分析圖表的預估寬度 (Streamlit 不回報實際寬度)
+PX_PER_CANDLE = 4       # 每根 K 棒至少佔的像素
+PX_PER_POINT = 2        # 折線每個點至少佔的像素
+
+# K 棒合併規則 (依原始週期)：(pandas 週期, 每期約幾根原始 K 棒)，依序選第一個不超過上限的
+BAR_RULES = {
+    '1d': [(None, 1), ('W-FRI', 5), ('M', 21)],
+    '1m': [(None, 1), ('5min', 5), ('15min', 15), ('60min', 60), ('D', 390)],
+    '5m': [(None, 1), ('15min', 3), ('60min', 12), ('D', 78)],
+    '15m': [(None, 1), ('60min', 4), ('D', 26)],
+    '60m': [(None, 1), ('D', 7), ('W-FRI', 35)],
+}
+BAR_LABELS = {
+    '1d': '日K', 'W-FRI': '週K', 'M': '月K', 'D': '日K',
+    '1m': '1分K', '5m': '5分K', '5min': '5分K', '15m': '15分K', '15min': '15分K', '60m': '60分K', '60min': '60分K',
+}
+OHLC_AGG = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+
+def chart_budget(width_px=CHART_WIDTH_PX):
+    """圖表寬度 → (K 棒上限, 折線點數上限)"""
+    return max(1, width_px // PX_PER_CANDLE), max(3, width_px // PX_PER_POINT)
+
+
+def choose_bar_rule(n_bars, max_bars, interval='1d'):
+    rules = BAR_RULES[interval]
+    for rule, span in rules:
+        if n_bars / span <= max_bars:
+            return rule
+    return rules[-1][0]
+
+
+def bar_label(rule, interval='1d'):
+    return BAR_LABELS[rule or interval]
+
+
+def resample_bars(df, rule):
+    """
+    K 棒合併成較長週期 (例如日 K → 週 K、1 分 K → 15 分 K)：OHLCV 依 OHLC_AGG 聚合，其他欄位 (指標) 取每期最後一個值。
+    每期的日期標在該期實際最後一個交易日 (未走完的一週不會標到未來日期)。
+    """
+    if rule is None or df.empty:
+        return df
+    # 分鐘週期以時間切齊 (to_period 不支援 5min 這類倍數)，日/週/月以日曆週期分組
+    periods = df.index.floor(rule) if rule.endswith('min') else df.index.to_period(rule)
+    agg = {c: OHLC_AGG.get(c, 'last') for c in df.columns}
+    bars = df.groupby(periods, sort=True).agg(agg)
+    bars.index = df.index.to_series().groupby(periods, sort=True).max().values
+    bars.index.name = df.index.name
+    return bars.dropna(subset=['Close'])
+
+
+def lttb(x, y, threshold):
+    """
+    [核心優化] Largest-Triangle-Three-Buckets：回傳保留的點的位置 (含首尾)。
+    x, y 為 float 陣列 (不含 NaN)；點數不超過 threshold 時回傳全部位置。
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # 中間 n-2 個點平均分成 threshold-2 桶；各桶平均值一次算好
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(int)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    # 下一桶的平均點：最後一桶用終點
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 與前一個選中點、下一桶平均點構成的三角形面積 (省略常數 1/2)
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_series(series, threshold):
+    """折線降採樣：忽略 NaN (例如 MA200 前段)，以時間為 x 軸做 LTTB"""
+    valid = series.dropna()
+    if len(valid) <= threshold:
+        return valid
+    x = valid.index.asi8.astype('f8') if isinstance(valid.index, pd.DatetimeIndex) else np.arange(len(valid), dtype='f8')
+    return valid.iloc[lttb(x, valid.to_numpy(dtype='f8'), threshold)]
+
+
+def up_down_colors(up, up_color='green', down_color='red'):
+    """向量化的柱狀顏色 (取代逐筆 list comprehension)"""
+    return np.where(np.asarray(up, dtype=bool), up_color, down_color)
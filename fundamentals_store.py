@@ -0,0 +1,121 @@
+# ----------------------------------------------------------------------
+# 基本面資料庫 (Persistent Fundamentals Store)
+#   每檔股票的 info / 財報 / 分析師預估分開存放，各自有新鮮度規則：
+#   - info (含目標價、評級)：INFO_TTL (數小時)
+#   - 分析師預估 (estimates)：ESTIMATES_TTL (每日)
+#   - 年度財報 (financials / cashflow / balance_sheet)：info 顯示有更新的會計年度
+#     (lastFiscalYearEnd 晚於已存財報的最新欄位) 才重抓；申報前重抓仍是舊財報時，
+#     STATEMENT_RETRY 內不再重試
+#   查詢曾看過的股票時，通常只需要重新抓 info 一個請求。
+# ----------------------------------------------------------------------
+
+import os
+import time
+import pickle
+import threading
+import pandas as pd
+from market_data import DATA_DIR
+
+INFO_TTL = 4 * 3600
+ESTIMATES_TTL = 24 * 3600
+STATEMENT_RETRY = 24 * 3600
+STATEMENT_MAX_AGE = 400 * 86400  # info 沒有 lastFiscalYearEnd 時的保底更新週期
+
+STATEMENT_PARTS = ['financials', 'cashflow', 'balance_sheet']
+PARTS = ['info', 'estimates'] + STATEMENT_PARTS
+
+
+def latest_period(statement):
+    """財報最新一期的期末日 (欄位為各期日期)"""
+    if not isinstance(statement, pd.DataFrame) or statement.empty:
+        return None
+    periods = pd.to_datetime(pd.Index(statement.columns), errors='coerce').dropna()
+    return periods.max() if len(periods) else None
+
+
+def fiscal_year_end(info):
+    value = (info or {}).get('lastFiscalYearEnd')
+    try:
+        return pd.Timestamp(int(value), unit='s') if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+class FundamentalsStore:
+    """
+    [核心優化] 以 <root>/fundamentals/<ticker>/<part>.pkl 保存各部分與抓取時間，
+    stale_parts() 依各自的規則決定哪些部分需要重新抓取。
+    """
+
+    def __init__(self, root=DATA_DIR):
+        self.root = os.path.join(root, 'fundamentals')
+        os.makedirs(self.root, exist_ok=True)
+        self._expired_at = {}  # 代號 → 強制更新時間
+        self._lock = threading.Lock()
+
+    def _path(self, ticker, part):
+        return os.path.join(self.root, ticker.replace(os.sep, '_'), part + '.pkl')
+
+    def load(self, ticker, part):
+        """回傳 {'value', 'fetched_at', 'checked_at'}；不存在時回傳 None"""
+        try:
+            with open(self._path(ticker, part), 'rb') as fh:
+                return pickle.load(fh)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def save(self, ticker, part, value, fetched_at=None):
+        path = self._path(ticker, part)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        now = time.time()
+        entry = {'value': value, 'fetched_at': fetched_at or now, 'checked_at': now}
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as fh:
+            pickle.dump(entry, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def load_all(self, ticker):
+        return {part: self.load(ticker, part) for part in PARTS}
+
+    def expire(self, tickers):
+        """
+        強制更新 (本程序內)：這些代號之前抓到的 info / 預估視為過期；
+        年度財報仍依申報日判斷，只是過時的財報不必等 STATEMENT_RETRY 就重新檢查。
+        """
+        now = time.time()
+        with self._lock:
+            for t in tickers:
+                self._expired_at[t] = now
+
+    def _fresh(self, entry, ttl, now, expired_at=0.0):
+        return entry is not None and entry['fetched_at'] > expired_at and now - entry['fetched_at'] <= ttl
+
+    def stale_parts(self, ticker, entries=None, info=None):
+        """
+        回傳需要重新抓取的部分。info 為最新的 info (已抓到時傳入)，用來判斷是否有新的年度財報。
+        """
+        now = time.time()
+        entries = entries if entries is not None else self.load_all(ticker)
+        expired_at = self._expired_at.get(ticker, 0.0)
+        stale = []
+        if not self._fresh(entries['info'], INFO_TTL, now, expired_at):
+            stale.append('info')
+        if not self._fresh(entries['estimates'], ESTIMATES_TTL, now, expired_at):
+            stale.append('estimates')
+
+        if info is None and entries['info'] is not None:
+            info = entries['info']['value']
+        fy_end = fiscal_year_end(info)
+        for part in STATEMENT_PARTS:
+            entry = entries[part]
+            if entry is None:
+                stale.append(part)
+                continue
+            stored = latest_period(entry['value'])
+            if fy_end is not None:
+                outdated = stored is None or fy_end > stored
+            else:
+                outdated = now - entry['fetched_at'] > STATEMENT_MAX_AGE
+            if outdated and (now - entry['checked_at'] > STATEMENT_RETRY or entry['checked_at'] <= expired_at):
+                stale.append(part)
+        return stale
@@ -0,0 +1,454 @@
+# ----------------------------------------------------------------------
+# 技術指標引擎 (Vectorized Indicator Engine)
+#   對 fetch_price_history 回傳的寬表 (日期 × 股票) 一次算出所有股票的
+#   MA20/50/200、RSI、MACD、布林通道，全部以 NumPy 2-D 陣列運算：
+#   - 移動平均 / 標準差：累積和 (cumsum) 差分，O(T×N)
+#   - EMA：沿時間軸遞迴，每一步同時更新全部股票
+#   結果與 pandas rolling / ewm(adjust=False) 的定義一致 (含 NaN 行為)。
+# ----------------------------------------------------------------------
+
+import copy
+import numpy as np
+import pandas as pd
+
+INDICATOR_COLUMNS = ['MA20', 'MA50', 'MA200', 'RSI', 'MACD', 'Signal_Line', 'MACD_Hist', 'BB_Upper', 'BB_Lower']
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def _as_2d(values):
+    arr = np.asarray(values, dtype='f8')
+    return arr[:, None] if arr.ndim == 1 else arr
+
+
+def _window_sums(x, window):
+    """回傳 (視窗內總和, 視窗內有效筆數)，NaN 以 0 計入總和、不計入筆數"""
+    valid = ~np.isnan(x)
+    zero_filled = np.where(valid, x, 0.0)
+    pad = np.zeros((1, x.shape[1]))
+    csum = np.concatenate([pad, np.cumsum(zero_filled, axis=0)])
+    ccount = np.concatenate([pad, np.cumsum(valid, axis=0)])
+    sums = np.full_like(x, np.nan)
+    counts = np.zeros_like(x)
+    if len(x) >= window:
+        sums[window - 1:] = csum[window:] - csum[:-window]
+        counts[window - 1:] = ccount[window:] - ccount[:-window]
+    return sums, counts
+
+
+def rolling_mean(values, window):
+    """等同 pandas rolling(window).mean()：視窗內有任一 NaN 即為 NaN"""
+    x = _as_2d(values)
+    # 先減去各欄第一個有效值，降低累積和的數值誤差
+    offset = np.nan_to_num(x[np.argmax(~np.isnan(x), axis=0), np.arange(x.shape[1])])
+    sums, counts = _window_sums(x - offset, window)
+    out = sums / window + offset
+    out[counts < window] = np.nan
+    return out
+
+
+def rolling_std(values, window, mean=None):
+    """等同 pandas rolling(window).std() (ddof=1)；可傳入已算好的移動平均避免重算"""
+    x = _as_2d(values)
+    offset = np.nan_to_num(x[np.argmax(~np.isnan(x), axis=0), np.arange(x.shape[1])])
+    shifted = x - offset
+    sums, counts = _window_sums(shifted, window)
+    sq_sums, _ = _window_sums(shifted * shifted, window)
+    m = sums / window if mean is None else _as_2d(mean) - offset
+    var = (sq_sums - window * m * m) / (window - 1)
+    out = np.sqrt(np.clip(var, 0.0, None))
+    out[counts < window] = np.nan
+    return out
+
+
+def ewm_mean(values, span):
+    """等同 pandas ewm(span=span, adjust=False).mean()，沿時間軸遞迴、跨股票向量化"""
+    x = _as_2d(values)
+    alpha = 2.0 / (span + 1.0)
+    out = np.full_like(x, np.nan)
+    state = np.full(x.shape[1], np.nan)
+    old_wt = np.ones(x.shape[1])
+    for t in range(len(x)):
+        row = x[t]
+        valid = ~np.isnan(row)
+        started = ~np.isnan(state)
+        # 缺值期間舊權重持續衰減 (pandas ignore_na=False 的行為)
+        old_wt = np.where(started, old_wt * (1.0 - alpha), old_wt)
+        update = valid & started
+        state = np.where(update, (old_wt * state + alpha * row) / (old_wt + alpha), state)
+        old_wt = np.where(update, 1.0, old_wt)
+        state = np.where(valid & ~started, row, state)
+        out[t] = state
+    return out
+
+
+def rsi(values, window=14):
+    """與原本 calculate_indicators 相同的簡單移動平均版 RSI"""
+    x = _as_2d(values)
+    delta = np.full_like(x, np.nan)
+    delta[1:] = x[1:] - x[:-1]
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    avg_gain = rolling_mean(gain, window)
+    avg_loss = rolling_mean(loss, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+class IndicatorMatrix:
+    """
+    多股票指標結果：values[欄位] 為 (日期 × 股票) 的 2-D 陣列，
+    含原始 OHLCV 與 INDICATOR_COLUMNS。
+    """
+
+    __slots__ = ('dates', 'tickers', 'values')
+
+    def __init__(self, dates, tickers, values):
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = list(tickers)
+        self.values = values
+
+    def __getitem__(self, column):
+        return self.values[column]
+
+    def column(self, ticker):
+        return self.tickers.index(ticker)
+
+    def frame(self, column):
+        """單一欄位的寬表 DataFrame (日期 × 股票)"""
+        return pd.DataFrame(self.values[column], index=self.dates, columns=self.tickers)
+
+    def for_ticker(self, ticker):
+        """單一股票的長表，欄位與 calculate_indicators 的輸出相同"""
+        j = self.column(ticker)
+        return pd.DataFrame({k: v[:, j] for k, v in self.values.items()}, index=self.dates)
+
+    def last(self):
+        """最新一列的橫截面 (股票 × 欄位)"""
+        return pd.DataFrame({k: v[-1] for k, v in self.values.items()}, index=self.tickers)
+
+
+def price_matrices(history_data, ffill=True):
+    """把 (Ticker, Price) MultiIndex 寬表拆成 {欄位: 2-D 陣列}"""
+    tickers = list(dict.fromkeys(history_data.columns.get_level_values(0)))
+    mats = {}
+    for field in PRICE_COLUMNS:
+        if field not in history_data.columns.get_level_values(1):
+            continue
+        frame = history_data.xs(field, level=1, axis=1).reindex(columns=tickers)
+        if ffill and field != 'Volume':
+            frame = frame.ffill()
+        mats[field] = frame.to_numpy(dtype='f8')
+    return history_data.index, tickers, mats
+
+
+def _indicator_arrays(close):
+    close = _as_2d(close)
+    ma20 = rolling_mean(close, 20)
+    std20 = rolling_std(close, 20, mean=ma20)
+    ema12, ema26 = ewm_mean(close, 12), ewm_mean(close, 26)
+    macd = ema12 - ema26
+    signal = ewm_mean(macd, 9)
+    arrays = {
+        'MA20': ma20,
+        'MA50': rolling_mean(close, 50),
+        'MA200': rolling_mean(close, 200),
+        'RSI': rsi(close, 14),
+        'MACD': macd,
+        'Signal_Line': signal,
+        'MACD_Hist': macd - signal,
+        'BB_Upper': ma20 + std20 * 2,
+        'BB_Lower': ma20 - std20 * 2,
+    }
+    return arrays, (close, ema12, ema26, macd, signal)
+
+
+def compute_indicator_arrays(close):
+    """對 (日期 × 股票) 收盤價陣列計算所有指標，回傳 {欄位: 2-D 陣列}"""
+    return _indicator_arrays(close)[0]
+
+
+def compute_indicators(history_data, ffill=True):
+    """
+    [核心優化] 一次計算整個股票池的技術指標。
+    history_data 為 fetch_price_history 的 (Ticker, Price) 寬表。
+    """
+    dates, tickers, mats = price_matrices(history_data, ffill=ffill)
+    values = dict(mats)
+    values.update(compute_indicator_arrays(mats['Close']))
+    return IndicatorMatrix(dates, tickers, values)
+
+
+def calculate_indicators(df):
+    df = df.copy()
+    for name, arr in compute_indicator_arrays(df['Close'].to_numpy(dtype='f8')).items():
+        df[name] = arr[:, 0]
+    return df
+
+
+# ----------------------------------------------------------------------
+# 增量更新 (Incremental Updates)
+#   新 K 棒到達時只推進狀態，不重算整段歷史：
+#   - 移動平均 / 布林通道：環狀緩衝區 + 視窗總和 (加入新值、減去離開的值)
+#   - EMA / MACD / Signal：保留最後的 EMA 值與權重
+#   - RSI：14 期漲跌幅的視窗總和
+#   數值定義與上方的批次計算完全相同 (含 NaN 行為)。
+# ----------------------------------------------------------------------
+
+class RollingState:
+    """單一視窗長度的滑動總和 (可選平方和)，每推進一列 O(股票數)"""
+
+    def __init__(self, window, n, squares=False):
+        self.window = window
+        self.buf = np.full((window, n), np.nan)
+        self.pos = 0
+        self.offset = np.full(n, np.nan)
+        self.sums = np.zeros(n)
+        self.sq_sums = np.zeros(n) if squares else None
+        self.counts = np.zeros(n)
+        self.pushes = 0
+
+    @classmethod
+    def from_history(cls, x, window, squares=False):
+        x = _as_2d(x)
+        state = cls(window, x.shape[1], squares)
+        tail = x[-window:]
+        state.buf[window - len(tail):] = tail
+        valid = ~np.isnan(x)
+        has_valid = valid.any(axis=0)
+        first = x[np.argmax(valid, axis=0), np.arange(x.shape[1])]
+        state.offset = np.where(has_valid, first, np.nan)
+        state._resum()
+        return state
+
+    def _resum(self):
+        # 定期由緩衝區重新加總，避免長時間累加的浮點誤差
+        shifted = self.buf - np.nan_to_num(self.offset)
+        valid = ~np.isnan(shifted)
+        zero_filled = np.where(valid, shifted, 0.0)
+        self.sums = zero_filled.sum(axis=0)
+        self.counts = valid.sum(axis=0).astype('f8')
+        if self.sq_sums is not None:
+            self.sq_sums = (zero_filled * zero_filled).sum(axis=0)
+
+    def push(self, row):
+        self.offset = np.where(np.isnan(self.offset), row, self.offset)
+        offset = np.nan_to_num(self.offset)
+        old = self.buf[self.pos] - offset
+        new = row - offset
+        old_valid, new_valid = ~np.isnan(old), ~np.isnan(new)
+        old0, new0 = np.where(old_valid, old, 0.0), np.where(new_valid, new, 0.0)
+        self.sums += new0 - old0
+        self.counts += new_valid.astype('f8') - old_valid
+        if self.sq_sums is not None:
+            self.sq_sums += new0 * new0 - old0 * old0
+        self.buf[self.pos] = row
+        self.pos = (self.pos + 1) % self.window
+        self.pushes += 1
+        if self.pushes % self.window == 0:
+            self._resum()
+
+    def mean(self):
+        out = self.sums / self.window + np.nan_to_num(self.offset)
+        return np.where(self.counts < self.window, np.nan, out)
+
+    def std(self):
+        m = self.sums / self.window
+        var = (self.sq_sums - self.window * m * m) / (self.window - 1)
+        return np.where(self.counts < self.window, np.nan, np.sqrt(np.clip(var, 0.0, None)))
+
+
+class EmaState:
+    """ewm(span, adjust=False) 的遞迴狀態：目前值與舊權重"""
+
+    def __init__(self, span, n):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = np.full(n, np.nan)
+        self.old_wt = np.ones(n)
+
+    @classmethod
+    def from_history(cls, x, ema, span):
+        x, ema = _as_2d(x), _as_2d(ema)
+        state = cls(span, x.shape[1])
+        if len(x):
+            state.value = ema[-1].copy()
+            # 最後一個有效值之後的缺值期間，舊權重持續衰減
+            valid = ~np.isnan(x)
+            trailing_nan = np.argmax(valid[::-1], axis=0)
+            trailing_nan = np.where(valid.any(axis=0), trailing_nan, 0)
+            state.old_wt = (1.0 - state.alpha) ** trailing_nan
+        return state
+
+    def push(self, row):
+        alpha = self.alpha
+        valid = ~np.isnan(row)
+        started = ~np.isnan(self.value)
+        self.old_wt = np.where(started, self.old_wt * (1.0 - alpha), self.old_wt)
+        update = valid & started
+        self.value = np.where(update, (self.old_wt * self.value + alpha * row) / (self.old_wt + alpha), self.value)
+        self.old_wt = np.where(update, 1.0, self.old_wt)
+        self.value = np.where(valid & ~started, row, self.value)
+        return self.value
+
+
+class RsiState:
+    """14 期 RSI 的增量狀態 (與 rsi() 相同的簡單移動平均定義)"""
+
+    columns = ['RSI']
+
+    def __init__(self, n, window=14):
+        self.prev = np.full(n, np.nan)
+        self.gains = RollingState(window, n)
+        self.losses = RollingState(window, n)
+
+    @classmethod
+    def from_close(cls, close, window=14):
+        close = _as_2d(close)
+        state = cls(close.shape[1], window)
+        if len(close):
+            delta = np.full_like(close, np.nan)
+            delta[1:] = close[1:] - close[:-1]
+            state.prev = close[-1].copy()
+            state.gains = RollingState.from_history(np.where(delta > 0, delta, 0.0), window)
+            state.losses = RollingState.from_history(np.where(delta < 0, -delta, 0.0), window)
+        return state
+
+    @classmethod
+    def from_history(cls, close, window=14):
+        return cls.from_close(close, window), {'RSI': rsi(close, window)}
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+    def push(self, row):
+        delta = row - self.prev
+        self.prev = row
+        self.gains.push(np.where(delta > 0, delta, 0.0))
+        self.losses.push(np.where(delta < 0, -delta, 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = self.gains.mean() / self.losses.mean()
+            return 100 - (100 / (1 + rs))
+
+    def update(self, close):
+        close = _as_2d(close)
+        out = np.full_like(close, np.nan)
+        for t in range(len(close)):
+            out[t] = self.push(close[t])
+        return {'RSI': out}
+
+
+class IndicatorState:
+    """INDICATOR_COLUMNS 全部指標的增量狀態；update() 的成本只與新 K 棒數成正比"""
+
+    columns = INDICATOR_COLUMNS
+
+    def __init__(self, n):
+        self.ma20 = RollingState(20, n, squares=True)
+        self.ma50 = RollingState(50, n)
+        self.ma200 = RollingState(200, n)
+        self.ema12 = EmaState(12, n)
+        self.ema26 = EmaState(26, n)
+        self.signal = EmaState(9, n)
+        self.rsi = RsiState(n)
+
+    @classmethod
+    def from_history(cls, close):
+        """批次計算整段歷史 (向量化)，同時建立可接續推進的狀態"""
+        arrays, (close, ema12, ema26, macd, signal) = _indicator_arrays(close)
+        state = cls(close.shape[1])
+        state.ma20 = RollingState.from_history(close, 20, squares=True)
+        state.ma50 = RollingState.from_history(close, 50)
+        state.ma200 = RollingState.from_history(close, 200)
+        state.ema12 = EmaState.from_history(close, ema12, 12)
+        state.ema26 = EmaState.from_history(close, ema26, 26)
+        state.signal = EmaState.from_history(macd, signal, 9)
+        state.rsi = RsiState.from_close(close)
+        return state, arrays
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+    def update(self, close):
+        close = _as_2d(close)
+        out = {k: np.full_like(close, np.nan) for k in INDICATOR_COLUMNS}
+        for t in range(len(close)):
+            row = close[t]
+            for rolling in (self.ma20, self.ma50, self.ma200):
+                rolling.push(row)
+            ma20, std20 = self.ma20.mean(), self.ma20.std()
+            macd = self.ema12.push(row) - self.ema26.push(row)
+            signal = self.signal.push(macd)
+            out['MA20'][t] = ma20
+            out['MA50'][t] = self.ma50.mean()
+            out['MA200'][t] = self.ma200.mean()
+            out['RSI'][t] = self.rsi.push(row)
+            out['MACD'][t] = macd
+            out['Signal_Line'][t] = signal
+            out['MACD_Hist'][t] = macd - signal
+            out['BB_Upper'][t] = ma20 + std20 * 2
+            out['BB_Lower'][t] = ma20 - std20 * 2
+        return out
+
+
+def _append_position(cache, df, close):
+    """新 df 與上次已定案的 K 棒完全銜接時，回傳已定案部分在 df 中的長度；否則回傳 None"""
+    if cache is None:
+        return None
+    committed = cache['frame'].iloc[:-1]
+    if committed.empty:
+        return None
+    n = df.index.searchsorted(committed.index[-1]) + 1
+    if n > len(committed) or n >= len(df):
+        return None
+    # 期間起點可能隨日期往後移 (例如 1y)，只比對兩者重疊的部分
+    overlap = committed.iloc[len(committed) - n:]
+    if not overlap.index.equals(df.index[:n]):
+        return None
+    if not np.array_equal(overlap['Close'].to_numpy(dtype='f8'), close[:n], equal_nan=True):
+        return None  # 還原價被改寫
+    return n
+
+
+def update_indicators(df, cache=None, state_cls=IndicatorState):
+    """
+    [核心優化] 增量版 calculate_indicators：回傳 (含指標的 df, 新 cache)。
+    cache 保存上一次的結果與「倒數第二根 K 棒之後」的狀態 (最後一根盤中仍可能變動)；
+    新 df 只是在舊數據後面多了 K 棒時只推進新 K 棒，否則整段重算。
+    """
+    close = df['Close'].to_numpy(dtype='f8')
+    if len(df) < 2:
+        return calculate_indicators(df), None
+
+    n = _append_position(cache, df, close)
+    if n is None:
+        state, head = state_cls.from_history(close[:-1])
+        kept = df.iloc[:-1].copy()
+        for name in state_cls.columns:
+            kept[name] = head[name][:, 0]
+    else:
+        state = cache['state'].copy()
+        kept = cache['frame'].iloc[len(cache['frame']) - 1 - n:-1]
+        if n < len(df) - 1:
+            added = df.iloc[n:-1].copy()
+            for name, values in state.update(close[n:-1]).items():
+                added[name] = values[:, 0]
+            kept = pd.concat([kept, added])
+
+    # 最後一根在暫存狀態上推進，cache 只保存定案部分的狀態
+    last = df.iloc[-1:].copy()
+    for name, values in state.copy().update(close[-1:]).items():
+        last[name] = values[:, 0]
+    out = pd.concat([kept, last])
+    return out, {'frame': out, 'state': state}
+
+
+def fear_greed_score(vix_close, sp500_close, cache=None):
+    """
+    市場情緒代理指標：VIX 分數 (60%) + S&P 500 的 14 期 RSI (40%)。
+    RSI 以增量狀態計算 (cache 同 update_indicators)，回傳 (分數, VIX, RSI, 新 cache)。
+    """
+    vix_score = max(0, min(100, (40 - vix_close) * (100 / 30)))
+    rsi_frame, cache = update_indicators(sp500_close.to_frame('Close'), cache, state_cls=RsiState)
+    last_rsi = rsi_frame['RSI'].iloc[-1]
+    final = (vix_score * 0.6) + (last_rsi * 0.4)
+    return int(final), vix_close, last_rsi, cache
@@ -0,0 +1,179 @@
+# ----------------------------------------------------------------------
+# 盤中 K 棒庫 (Intraday Bar Store)
+#   1m / 5m / 15m / 60m K 棒以精簡格式存在本地，每檔股票每個交易日一個 memory-mapped .npy：
+#   - 時間：int32 (交易所當地時間的 epoch 秒)
+#   - 價格：float32
+#   - 成交量：當日內差分編碼 (第一根存原值，之後存與前一根的差)
+#   已收盤的交易日不再重抓，同步時只抓「最後一個交易日」之後的 K 棒；
+#   讀取時把視窗內的日檔串接還原成 DataFrame，指標由頁面即時計算。
+# ----------------------------------------------------------------------
+
+import os
+import json
+import time
+import threading
+import numpy as np
+import pandas as pd
+from market_data import DATA_DIR, get_provider
+from price_store import split_download
+
+# 週期 → (預設顯示天數, 資料源可回溯天數)；Yahoo 1m 最多 7 天、5m/15m 60 天、60m 730 天
+INTRADAY_INTERVALS = {
+    '1m': (5, 7),
+    '5m': (20, 59),
+    '15m': (40, 59),
+    '60m': (120, 729),
+}
+INTRADAY_SYNC_INTERVAL = 60  # 同一程序內，同一檔股票同一週期 60 秒內不重複同步
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+_BASE_FIELDS = [('time', '<i4')] + [(f, '<f4') for f in PRICE_COLUMNS]
+INTRADAY_DTYPE = np.dtype(_BASE_FIELDS + [('Volume', '<i4')])
+INTRADAY_DTYPE_WIDE = np.dtype(_BASE_FIELDS + [('Volume', '<i8')])  # 成交量差值超出 int32 時使用
+
+
+def encode_day(df):
+    """單日 OHLCV (索引為交易所當地時間，不含時區) → 精簡 structured array"""
+    volume = np.nan_to_num(df['Volume'].to_numpy(dtype='f8')).round().astype('i8')
+    delta = np.diff(volume, prepend=0)
+    fits = len(delta) == 0 or np.abs(delta).max() <= np.iinfo(np.int32).max
+    bars = np.empty(len(df), dtype=INTRADAY_DTYPE if fits else INTRADAY_DTYPE_WIDE)
+    bars['time'] = df.index.values.astype('datetime64[s]').astype('i8')
+    for f in PRICE_COLUMNS:
+        bars[f] = df[f].to_numpy(dtype='f8')
+    bars['Volume'] = delta
+    return bars
+
+
+def decode_days(days):
+    """多個日檔 → OHLCV DataFrame (價格轉回 float64，成交量逐日累加還原)"""
+    if not days:
+        return pd.DataFrame(columns=PRICE_COLUMNS + ['Volume'])
+    index = pd.DatetimeIndex(np.concatenate([d['time'] for d in days]).astype('datetime64[s]').astype('datetime64[ns]'),
+                             name='Date')
+    data = {f: np.concatenate([d[f] for d in days]).astype('f8') for f in PRICE_COLUMNS}
+    data['Volume'] = np.concatenate([np.cumsum(d['Volume'], dtype='i8') for d in days]).astype('f8')
+    return pd.DataFrame(data, index=index)
+
+
+class IntradayStore:
+    """
+    [核心優化] <root>/intraday/<週期>/<ticker>/<日期>.npy，meta.json 記錄已涵蓋的起點與尚未收盤的最後一日。
+    """
+
+    def __init__(self, root=DATA_DIR, downloader=None):
+        self.root = os.path.join(root, 'intraday')
+        self._download = downloader or self._provider_download
+        self._synced_at = {}
+        self._failed = set()  # 最近一次同步下載出錯的 (代號, 週期)
+        self._lock = threading.Lock()
+
+    # --- 檔案存取 ---
+    def _dir(self, ticker, interval):
+        return os.path.join(self.root, interval, ticker.replace(os.sep, '_'))
+
+    def _load_meta(self, ticker, interval):
+        try:
+            with open(os.path.join(self._dir(ticker, interval), 'meta.json'), 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write(self, path, write):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as fh:
+            write(fh)
+        os.replace(tmp, path)
+
+    def _save_day(self, ticker, interval, day, df):
+        path = os.path.join(self._dir(ticker, interval), f"{day}.npy")
+        self._write(path, lambda fh: np.save(fh, encode_day(df)))
+
+    def _save_meta(self, ticker, interval, meta):
+        path = os.path.join(self._dir(ticker, interval), 'meta.json')
+        self._write(path, lambda fh: fh.write(json.dumps(meta).encode('utf-8')))
+
+    def load_day(self, ticker, interval, day):
+        try:
+            return np.load(os.path.join(self._dir(ticker, interval), f"{day}.npy"), mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def stored_days(self, ticker, interval):
+        try:
+            names = os.listdir(self._dir(ticker, interval))
+        except FileNotFoundError:
+            return []
+        return sorted(n[:-4] for n in names if n.endswith('.npy'))
+
+    # --- 同步邏輯 ---
+    @staticmethod
+    def _provider_download(tickers, start, interval):
+        return get_provider().download(tickers, start=start, interval=interval)
+
+    def expire(self, tickers=None):
+        """讓下一次讀取重新同步 (強制更新按鈕使用)；tickers 為 None 時全部"""
+        with self._lock:
+            if tickers is None:
+                self._synced_at.clear()
+            else:
+                tickers = set(tickers)
+                for key in [k for k in self._synced_at if k[0] in tickers]:
+                    del self._synced_at[key]
+
+    def sync(self, ticker, interval, start):
+        now = time.time()
+        start = pd.Timestamp(start).normalize()
+        key = (ticker, interval)
+        with self._lock:
+            last = self._synced_at.get(key)
+            if last is not None and now - last[0] <= INTRADAY_SYNC_INTERVAL and start >= last[1]:
+                return
+
+        meta = self._load_meta(ticker, interval)
+        covered_from = pd.Timestamp(meta['covered_from']) if meta.get('covered_from') else None
+        if covered_from is None or start < covered_from:
+            fetch_from = start
+        else:
+            # 已收盤的交易日不重抓：從尚未收盤的最後一日開始
+            fetch_from = max(pd.Timestamp(meta.get('open_day') or covered_from), start)
+
+        try:
+            frames = split_download(self._download([ticker], fetch_from, interval), [ticker])
+        except Exception as e:
+            print(f"Intraday fetch error ({ticker} {interval} from {fetch_from.date()}): {e}")
+            with self._lock:
+                self._failed.add(key)
+            return
+
+        if ticker in frames:
+            df = frames[ticker]
+            if df.index.tz is not None:
+                df = df.tz_localize(None)  # 保留交易所當地時間
+            os.makedirs(self._dir(ticker, interval), exist_ok=True)
+            days = df.index.normalize()
+            for day, bars in df.groupby(days):
+                self._save_day(ticker, interval, day.date(), bars)
+            open_day = days.max()
+            self._save_meta(ticker, interval, {
+                'covered_from': str(min(start, covered_from or start).date()),
+                'open_day': str(max(open_day, pd.Timestamp(meta.get('open_day') or open_day)).date()),
+            })
+
+        with self._lock:
+            self._synced_at[key] = (now, start)
+            self._failed.discard(key)
+
+    def fetch_failed(self, ticker, interval):
+        """最近一次同步這個代號時資料源出錯 (而不是沒有資料)"""
+        return (ticker, interval) in self._failed
+
+    # --- 讀取 ---
+    def get_bars(self, ticker, interval, days=None):
+        """最近 days 個日曆天的盤中 K 棒 (預設依週期而定)，回傳 OHLCV DataFrame"""
+        default_days, max_days = INTRADAY_INTERVALS[interval]
+        start = pd.Timestamp.today().normalize() - pd.Timedelta(days=min(days or default_days, max_days))
+        self.sync(ticker, interval, start)
+        first = str(start.date())
+        stored = [self.load_day(ticker, interval, day) for day in self.stored_days(ticker, interval) if day >= first]
+        return decode_days([d for d in stored if d is not None and len(d)])
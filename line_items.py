@@ -0,0 +1,78 @@
+# ----------------------------------------------------------------------
+# 財報科目對照 (Statement Line-Item Index)
+#   把 yfinance 財報的列名稱對應到固定的欄位名稱：
+#   1. 每個欄位有依優先順序排列的標準名稱，找不到時才用關鍵字模糊比對
+#   2. 對照結果依「列名稱組合」快取 (同一種財報格式只解析一次)
+#   3. 取值時一次 reindex 所有候選列，每個欄位取第一個非空值
+#      (取代原本逐列比對、最後一個符合者覆蓋前面的寫法)
+# ----------------------------------------------------------------------
+
+import functools
+import numpy as np
+import pandas as pd
+
+# 欄位 → (標準名稱 (優先順序), 模糊比對條件：任一組關鍵字全部出現即符合)
+LINE_ITEMS = {
+    'Revenue': (['Total Revenue', 'Operating Revenue'], [('total', 'revenue')]),
+    'GrossProfit': (['Gross Profit'], [('gross', 'profit')]),
+    'OperatingIncome': (['Operating Income', 'Total Operating Income As Reported'], [('operating', 'income')]),
+    'NetIncome': (['Net Income', 'Net Income Common Stockholders',
+                   'Net Income From Continuing Operation Net Minority Interest'], [('net', 'income')]),
+    'BasicEPS': (['Basic EPS'], [('basic', 'eps')]),
+    'OperatingCashFlow': (['Operating Cash Flow', 'Cash Flow From Continuing Operating Activities',
+                           'Total Cash From Operating Activities'],
+                          [('operating', 'cash'), ('total cash from operating activities',)]),
+    'CapitalExpenditure': (['Capital Expenditure', 'Capital Expenditures'], [('capital', 'expenditure')]),
+    'ContractLiabilities': (['Contract Liabilities', 'Current Deferred Revenue', 'Deferred Revenue'],
+                            [('contract', 'liabilities'), ('deferred', 'revenue')]),
+}
+
+INCOME_FIELDS = ['Revenue', 'GrossProfit', 'OperatingIncome', 'NetIncome', 'BasicEPS']
+CASHFLOW_FIELDS = ['OperatingCashFlow', 'CapitalExpenditure']
+BALANCE_FIELDS = ['ContractLiabilities']
+
+
+@functools.lru_cache(maxsize=512)
+def resolve_line_items(labels, fields):
+    """
+    (列名稱 tuple, 欄位 tuple) → {欄位: [候選列名稱 (優先順序)]}。
+    標準名稱優先，其後依原始順序加入模糊比對符合的列。
+    """
+    lowered = [(label, str(label).lower()) for label in labels]
+    exact = {str(label).lower(): label for label in labels}
+    mapping = {}
+    for field in fields:
+        preferred, keyword_sets = LINE_ITEMS[field]
+        candidates = [exact[name.lower()] for name in preferred if name.lower() in exact]
+        for label, low in lowered:
+            if label not in candidates and any(all(k in low for k in keys) for keys in keyword_sets):
+                candidates.append(label)
+        mapping[field] = candidates
+    return mapping
+
+
+def extract_line_items(statement, fields, column=0):
+    """
+    [核心優化] 從財報 (列 = 科目、欄 = 各期) 取出指定欄位在第 column 期的數值，缺少時為 None。
+    """
+    result = {field: None for field in fields}
+    if not isinstance(statement, pd.DataFrame) or statement.empty:
+        return result
+
+    mapping = resolve_line_items(tuple(statement.index), tuple(fields))
+    wanted = list(dict.fromkeys(label for labels in mapping.values() for label in labels))
+    if not wanted:
+        return result
+    # 重複的列名稱只保留第一列，再一次取出所有候選列
+    series = statement.iloc[:, column]
+    series = series[~series.index.duplicated()].reindex(wanted)
+    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype='f8')
+    position = {label: i for i, label in enumerate(wanted)}
+
+    for field, labels in mapping.items():
+        for label in labels:
+            value = values[position[label]]
+            if not np.isnan(value):
+                result[field] = float(value)
+                break
+    return result
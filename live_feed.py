@@ -0,0 +1,143 @@
+# ----------------------------------------------------------------------
+# 即時報價 (Live Price Feed)
+#   背景執行緒把成交價推進記憶體中的價格表 (LivePriceTable)，
+#   熱力圖的即時模式依固定頻率讀取價格表、只重算有變動的股票。
+#
+#   報價來源 (LIVE_FEED_SOURCE)：
+#   - yfinance  ：Yahoo 串流報價 (yf.WebSocket)
+#   - simulated ：本地隨機漫步報價，離線測試用 (fixture 模式預設)
+# ----------------------------------------------------------------------
+
+import os
+import time
+import threading
+import numpy as np
+
+SIMULATED_INTERVAL = 0.2   # 模擬報價每批間隔 (秒)
+SIMULATED_FRACTION = 0.1   # 每批有成交的股票比例
+SIMULATED_VOL = 0.002      # 每筆成交的價格波動 (對數報酬標準差)
+
+
+class LivePriceTable:
+    """
+    以 NumPy 陣列保存每檔股票的最新成交價；寫入端 (報價執行緒) 與讀取端 (頁面) 以 lock 隔開，
+    讀取端拿到的是複本。
+    """
+
+    def __init__(self, tickers, prices):
+        self.tickers = list(tickers)
+        self._index = {t: i for i, t in enumerate(self.tickers)}
+        self._prices = np.asarray(prices, dtype='f8').copy()
+        self._lock = threading.Lock()
+        self.version = 0
+        self.updated_at = None
+
+    def apply(self, tickers, prices):
+        """批次寫入成交價，未知的代號直接忽略"""
+        pairs = [(self._index[t], p) for t, p in zip(tickers, prices) if t in self._index and p is not None]
+        if not pairs:
+            return
+        idx, values = zip(*pairs)
+        with self._lock:
+            self._prices[list(idx)] = values
+            self.version += 1
+            self.updated_at = time.time()
+
+    def positions(self, tickers):
+        """代號 → 陣列位置 (讓讀取端依自己的順序取價)"""
+        return np.array([self._index[t] for t in tickers], dtype=int)
+
+    def prices(self):
+        with self._lock:
+            return self._prices.copy()
+
+
+class SimulatedTickSource:
+    """隨機漫步報價：每批隨機挑一部分股票產生一筆成交"""
+
+    def __init__(self, tickers, prices, interval=SIMULATED_INTERVAL, fraction=SIMULATED_FRACTION,
+                 vol=SIMULATED_VOL, seed=None):
+        self.tickers = np.asarray(list(tickers), dtype=object)
+        self._prices = np.asarray(prices, dtype='f8').copy()
+        self.interval = interval
+        self.fraction = fraction
+        self.vol = vol
+        self._rng = np.random.default_rng(seed)
+        self._stop_event = threading.Event()
+
+    def run(self, sink):
+        n = len(self.tickers)
+        batch = max(1, int(n * self.fraction))
+        while not self._stop_event.wait(self.interval):
+            idx = self._rng.choice(n, size=min(batch, n), replace=False)
+            self._prices[idx] *= np.exp(self._rng.normal(0.0, self.vol, len(idx)))
+            sink(self.tickers[idx], self._prices[idx])
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class YFinanceTickSource:
+    """Yahoo 串流報價；每則訊息只帶一檔股票的最新成交價"""
+
+    def __init__(self, tickers, prices=None):
+        self.tickers = list(tickers)
+        self._ws = None
+        self._stopped = False
+
+    def run(self, sink):
+        import yfinance as yf
+
+        def on_message(msg):
+            if msg.get('id') and msg.get('price'):
+                sink([msg['id']], [float(msg['price'])])
+
+        self._ws = yf.WebSocket(verbose=False)
+        self._ws.subscribe(self.tickers)
+        if not self._stopped:
+            self._ws.listen(on_message)
+
+    def stop(self):
+        self._stopped = True
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+
+
+TICK_SOURCES = {
+    'simulated': SimulatedTickSource,
+    'yfinance': YFinanceTickSource,
+}
+
+
+def create_tick_source(tickers, prices, name=None):
+    if name is None:
+        offline = os.environ.get('MARKET_DATA_PROVIDER', 'yfinance').lower() == 'fixture'
+        name = os.environ.get('LIVE_FEED_SOURCE', 'simulated' if offline else 'yfinance')
+    return TICK_SOURCES[name.lower()](tickers, prices)
+
+
+class LiveFeed:
+    """把報價來源接到價格表的背景執行緒"""
+
+    def __init__(self, tickers, prices, source=None):
+        self.table = LivePriceTable(tickers, prices)
+        self.source = source or create_tick_source(tickers, prices)
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='live-feed', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.source.run(self.table.apply)
+        except Exception as e:
+            print(f"Live feed stopped: {e}")
+
+    def stop(self):
+        self.source.stop()
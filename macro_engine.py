@@ -0,0 +1,200 @@
+# ----------------------------------------------------------------------
+# 總經風險引擎 (Macro Risk Engine)
+#   多因子恐懼與貪婪指數 (Fear & Greed)，每個因子都是完整的每日序列 (整段向量化計算)：
+#   - 市場動能：S&P 500 相對 125 日均線
+#   - 市場廣度：S&P 500 成分股站上 50 日均線的比例 (沿用熱力圖下載的成分股收盤價)
+#   - 垃圾債需求：HYG / LQD 比值的 20 日變化 (信用利差的代理)
+#   - 避險需求：VIX / VIX3M 期限結構 (5 日平均，Put/Call 比率的代理；逆價差 = 恐懼)
+#   - 波動率：VIX 相對 50 日均線
+#   - 避險資產：S&P 500 與 TLT、黃金 (GC=F) 的 20 日報酬差
+#   每個因子以過去一年 (252 日) 的百分位換算成 0~100 分 (恐懼因子反向)，指數為可用因子的平均。
+#   結果存在本地歷史檔，更新時只重算最後幾天 (加上計算所需的回溯區間)，
+#   成分股歷史較短時，更早日期的廣度沿用已存的數值。
+# ----------------------------------------------------------------------
+
+import os
+import pickle
+import threading
+import numpy as np
+import pandas as pd
+from market_data import DATA_DIR
+
+MOMENTUM_WINDOW = 125
+BREADTH_WINDOW = 50
+VOLATILITY_WINDOW = 50
+RETURN_WINDOW = 20
+PUT_CALL_SMOOTH = 5
+RANK_WINDOW = 252           # 百分位的回看期間 (約一年)
+MIN_FACTORS = 3             # 可用因子少於此數的日期不計算指數
+RAW_LOOKBACK = MOMENTUM_WINDOW + 10  # 重算原始因子時往前多取的 K 棒數 (最長的均線 + 假日緩衝)
+OVERLAP_ROWS = 5            # 每次更新重算已存的最後幾列 (盤中 / 修正過的 K 棒)
+FILL_LIMIT = 3              # 不同交易日曆 (期貨、債券 ETF) 對齊時最多往前補的天數
+
+INDEX_COLUMN = 'Fear & Greed'
+
+# 因子 → (顯示名稱, 數值越高是否代表貪婪)
+FACTORS = {
+    'momentum': ('市場動能 (S&P 500 vs MA125)', True),
+    'breadth': ('市場廣度 (成分股站上 MA50)', True),
+    'credit': ('垃圾債需求 (HYG / LQD)', True),
+    'put_call': ('避險需求 (VIX / VIX3M)', False),
+    'volatility': ('波動率 (VIX vs MA50)', False),
+    'safe_haven': ('避險資產 (股票 vs TLT / 黃金)', True),
+}
+
+
+def close_matrix(data):
+    """(Ticker, Price) 或 (Price, Ticker) 欄位的行情 → 收盤價寬表 (欄位為代號)"""
+    if data is None or data.empty:
+        return pd.DataFrame()
+    if not isinstance(data.columns, pd.MultiIndex):
+        return data[['Close']] if 'Close' in data.columns else pd.DataFrame()
+    for level in (1, 0):
+        if 'Close' in data.columns.get_level_values(level):
+            return data.xs('Close', axis=1, level=level)
+    return pd.DataFrame()
+
+
+def _column(closes, ticker):
+    if ticker in closes.columns:
+        return closes[ticker].astype('f8')
+    return pd.Series(np.nan, index=closes.index)
+
+
+def breadth(constituents, index):
+    """成分股收盤價 (日期 × 代號) → 每日站上 50 日均線的比例 (%)，對齊到 index"""
+    if constituents is None or constituents.empty or not len(index):
+        return pd.Series(np.nan, index=index)
+    # 只取 index 起點前 BREADTH_WINDOW 根之後的部分 (增量更新時只算最後幾天)
+    first = constituents.index.searchsorted(index[0])
+    constituents = constituents.iloc[max(0, first - BREADTH_WINDOW + 1):]
+    values = constituents.to_numpy(dtype='f8')
+    valid = ~np.isnan(values)
+
+    # 整個矩陣一次以累積和計算 50 日均線 (視窗內全部有值才計算，同 rolling(50).mean())
+    sums = np.zeros((len(values) + 1, values.shape[1]))
+    counts = np.zeros((len(values) + 1, values.shape[1]), dtype=np.int64)
+    np.cumsum(np.where(valid, values, 0.0), axis=0, out=sums[1:])
+    np.cumsum(valid, axis=0, out=counts[1:])
+    window_sum = np.full(values.shape, np.nan)
+    window_count = np.zeros(values.shape, dtype=np.int64)
+    window_sum[BREADTH_WINDOW - 1:] = sums[BREADTH_WINDOW:] - sums[:-BREADTH_WINDOW]
+    window_count[BREADTH_WINDOW - 1:] = counts[BREADTH_WINDOW:] - counts[:-BREADTH_WINDOW]
+    has_ma = window_count == BREADTH_WINDOW
+    ma = np.where(has_ma, window_sum / BREADTH_WINDOW, np.nan)
+
+    listed = has_ma.sum(axis=1)
+    above = (has_ma & (values > ma)).sum(axis=1)
+    share = np.where(listed > 0, above / np.maximum(listed, 1) * 100, np.nan)
+    return pd.Series(share, index=constituents.index).reindex(index)
+
+
+def raw_factors(closes, constituents=None):
+    """
+    各因子的原始每日數值 (以 ^GSPC 的交易日為索引)。
+    closes：總經代號的收盤價寬表；constituents：S&P 500 成分股收盤價寬表 (可省略)。
+    """
+    if '^GSPC' not in closes.columns:
+        return pd.DataFrame(columns=list(FACTORS), dtype='f8')
+    spx_close = closes['^GSPC'].dropna()
+    aligned = closes.reindex(spx_close.index).ffill(limit=FILL_LIMIT)
+    spx, vix = _column(aligned, '^GSPC'), _column(aligned, '^VIX')
+
+    stock_return = spx.pct_change(RETURN_WINDOW, fill_method=None)
+    haven_return = pd.concat([_column(aligned, t).pct_change(RETURN_WINDOW, fill_method=None)
+                              for t in ('TLT', 'GC=F')], axis=1).mean(axis=1)
+    return pd.DataFrame({
+        'momentum': spx / spx.rolling(MOMENTUM_WINDOW).mean() - 1,
+        'breadth': breadth(constituents, spx.index),
+        'credit': np.log(_column(aligned, 'HYG') / _column(aligned, 'LQD')).diff(RETURN_WINDOW),
+        'put_call': (vix / _column(aligned, '^VIX3M')).rolling(PUT_CALL_SMOOTH).mean(),
+        'volatility': vix / vix.rolling(VOLATILITY_WINDOW).mean() - 1,
+        'safe_haven': stock_return - haven_return,
+    }, index=spx.index)
+
+
+def score_factors(raw):
+    """原始因子 → 0~100 分 (過去 RANK_WINDOW 日的百分位；恐懼因子反向) + 綜合指數"""
+    ranks = raw.rolling(RANK_WINDOW, min_periods=RANK_WINDOW // 2).rank(pct=True) * 100
+    scores = pd.DataFrame({name: ranks[name] if greed else 100 - ranks[name]
+                           for name, (_, greed) in FACTORS.items()}, index=raw.index)
+    available = scores.notna().sum(axis=1)
+    scores[INDEX_COLUMN] = scores.mean(axis=1).where(available >= MIN_FACTORS)
+    return scores
+
+
+def fear_greed_history(closes, constituents=None):
+    """一次計算整段歷史 (沒有已存的歷史時使用)，回傳 (原始因子, 分數)"""
+    raw = raw_factors(closes, constituents)
+    return raw, score_factors(raw)
+
+
+def label(score):
+    if np.isnan(score):
+        return "無數據"
+    if score < 25:
+        return "極度恐懼"
+    if score < 45:
+        return "恐懼"
+    if score <= 55:
+        return "中性"
+    if score <= 75:
+        return "貪婪"
+    return "極度貪婪"
+
+
+class FearGreedStore:
+    """
+    [核心優化] 以 <root>/macro/fear_greed.pkl 保存原始因子與分數的完整每日歷史。
+    update() 只重算最後 OVERLAP_ROWS 列之後的部分：原始因子往前取 RAW_LOOKBACK 根 K 棒，
+    分數往前取 RANK_WINDOW 列已存的原始因子，其餘歷史直接沿用。
+    """
+
+    def __init__(self, root=DATA_DIR):
+        self.path = os.path.join(root, 'macro', 'fear_greed.pkl')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+
+    def load(self):
+        """回傳 (原始因子, 分數)；不存在時回傳 (None, None)"""
+        try:
+            with open(self.path, 'rb') as fh:
+                entry = pickle.load(fh)
+            return entry['raw'], entry['scores']
+        except (FileNotFoundError, EOFError, KeyError, pickle.UnpicklingError):
+            return None, None
+
+    def _save(self, raw, scores):
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as fh:
+            pickle.dump({'raw': raw, 'scores': scores}, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def update(self, closes, constituents=None):
+        """合併最新行情，回傳完整的分數歷史"""
+        with self._lock:
+            raw, scores = self.load()
+            if raw is None or raw.empty:
+                raw, scores = fear_greed_history(closes, constituents)
+            else:
+                raw, scores = self._update_tail(raw, scores, closes, constituents)
+            if not raw.empty:
+                self._save(raw, scores)
+            return scores
+
+    @staticmethod
+    def _update_tail(raw, scores, closes, constituents):
+        cutoff = raw.index[-min(OVERLAP_ROWS, len(raw))]
+        start = closes.index.searchsorted(cutoff)
+        fresh = raw_factors(closes.iloc[max(0, start - RAW_LOOKBACK):], constituents)
+        fresh = fresh[fresh.index >= cutoff]
+        if fresh.empty:
+            return raw, scores
+        # 這次沒有數據的因子 (例如成分股缺漏) 沿用已存的數值
+        fresh = fresh.fillna(raw.reindex(fresh.index))
+        raw = pd.concat([raw[raw.index < cutoff], fresh])
+
+        first = raw.index.searchsorted(cutoff)
+        tail = score_factors(raw.iloc[max(0, first - RANK_WINDOW):])
+        scores = pd.concat([scores[scores.index < cutoff], tail[tail.index >= cutoff]])
+        return raw, scores
@@ -0,0 +1,466 @@
+# ----------------------------------------------------------------------
+# 行情資料來源層 (Market Data Providers)
+#   1. YFinanceProvider : 正式環境，直接呼叫 yfinance / 遠端 CSV
+#   2. RecordingProvider: 包住任一 provider，把每次回應錄製到 fixture 目錄
+#   3. FixtureProvider  : 離線回放錄製的資料，可設定延遲 (壓測 / 基準測試用)
+# 以環境變數切換：
+#   MARKET_DATA_PROVIDER = yfinance | record | fixture
+#   MARKET_DATA_FIXTURES = fixture 目錄 (預設 <data dir>/fixtures)
+#   MARKET_DATA_LATENCY  = fixture 每次呼叫的模擬延遲秒數
+#   MARKET_DATA_COALESCE = on | off (CoalescingProvider：合併同時發出的相同請求、每個主機限流)
+# CoalescingProvider 的每次呼叫記錄一個 'fetch' span (perf_trace.py)：回應筆數 / 位元組數、是否被合併
+# ----------------------------------------------------------------------
+
+import os
+import time
+import pickle
+import hashlib
+import threading
+import concurrent.futures
+from urllib.parse import quote, urlparse
+import pandas as pd
+from perf_trace import span, size_of
+
+DATA_DIR = os.environ.get(
+    'STOCK_DASHBOARD_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.market_data')
+)
+
+PRICE_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+_PERIOD_OFFSETS = {
+    '1d': pd.DateOffset(days=1), '5d': pd.DateOffset(days=5),
+    '1mo': pd.DateOffset(months=1), '3mo': pd.DateOffset(months=3), '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1), '2y': pd.DateOffset(years=2), '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10),
+}
+
+
+def period_start(period, today=None):
+    """將 yfinance 的 period 字串 (1y, 2y, ytd, max...) 轉為起始日"""
+    today = pd.Timestamp.today().normalize() if today is None else pd.Timestamp(today).normalize()
+    if period == 'ytd':
+        return pd.Timestamp(year=today.year, month=1, day=1)
+    if period == 'max':
+        return pd.Timestamp('1970-01-01')
+    if period not in _PERIOD_OFFSETS:
+        raise ValueError(f"Unsupported period: {period}")
+    return today - _PERIOD_OFFSETS[period]
+
+
+class TokenBucket:
+    """請求速率限制：平均每秒 rate 個請求，允許瞬間 burst 個 (多執行緒共用)"""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _as_list(tickers):
+    return [tickers] if isinstance(tickers, str) else list(tickers)
+
+
+def _to_ticker_major(data, tickers):
+    """統一成 (Ticker, Price) 欄位排列，單一股票也保留 MultiIndex"""
+    if data is None or data.empty:
+        return pd.DataFrame()
+    if not isinstance(data.columns, pd.MultiIndex):
+        if len(tickers) != 1:
+            return pd.DataFrame()
+        data = pd.concat({tickers[0]: data}, axis=1)
+    elif 'Close' in data.columns.get_level_values(0) or 'Adj Close' in data.columns.get_level_values(0):
+        data = data.swaplevel(0, 1, axis=1)
+    data.columns.names = ['Ticker', 'Price']
+    return data
+
+
+class MarketDataProvider:
+    """所有資料函數只透過這個介面取數，換資料商時不必改動任何渲染函數"""
+
+    name = 'base'
+
+    def download(self, tickers, start=None, period=None, interval='1d'):
+        """日/分 K 棒，回傳 (Ticker, Price) MultiIndex 欄位的 DataFrame"""
+        raise NotImplementedError
+
+    def fast_info(self, ticker):
+        """輕量報價資訊 dict：market_cap, shares, last_price"""
+        raise NotImplementedError
+
+    def info(self, ticker):
+        raise NotImplementedError
+
+    def cashflow(self, ticker):
+        raise NotImplementedError
+
+    def balance_sheet(self, ticker):
+        raise NotImplementedError
+
+    def financials(self, ticker):
+        raise NotImplementedError
+
+    def estimates(self, ticker):
+        """(earnings_estimate, eps_trend, recommendations_summary)"""
+        raise NotImplementedError
+
+    def read_csv(self, url):
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    name = 'yfinance'
+
+    def __init__(self):
+        import yfinance as yf
+        self._yf = yf
+
+    def download(self, tickers, start=None, period=None, interval='1d'):
+        tickers = _as_list(tickers)
+        kwargs = {'start': pd.Timestamp(start).strftime('%Y-%m-%d')} if start is not None else {'period': period or '1y'}
+        data = self._yf.download(tickers, interval=interval, group_by='ticker', auto_adjust=True,
+                                 threads=True, progress=False, **kwargs)
+        return _to_ticker_major(data, tickers)
+
+    def fast_info(self, ticker):
+        fi = self._yf.Ticker(ticker).fast_info
+        return {'market_cap': fi['market_cap'], 'shares': fi['shares'], 'last_price': fi['last_price']}
+
+    def info(self, ticker):
+        return self._yf.Ticker(ticker).info
+
+    def cashflow(self, ticker):
+        return self._yf.Ticker(ticker).cashflow
+
+    def balance_sheet(self, ticker):
+        return self._yf.Ticker(ticker).balance_sheet
+
+    def financials(self, ticker):
+        return self._yf.Ticker(ticker).financials
+
+    def estimates(self, ticker):
+        stock = self._yf.Ticker(ticker)
+        return stock.earnings_estimate, stock.eps_trend, stock.recommendations_summary
+
+    def read_csv(self, url):
+        return pd.read_csv(url)
+
+
+class FixtureMissing(KeyError):
+    pass
+
+
+class FetchError(RuntimeError):
+    """資料源出錯 (網路中斷、限流等)，與「資料源回應但沒有資料」區分"""
+
+
+class _FixtureFiles:
+    """fixture 目錄結構：<root>/<method>/<key>.pkl，K 棒另存在 <root>/prices/<interval>/<ticker>.pkl"""
+
+    def __init__(self, root):
+        self.root = root
+
+    @staticmethod
+    def key(value):
+        if value.startswith('http'):
+            return hashlib.sha1(value.encode('utf-8')).hexdigest()
+        return quote(value, safe='')
+
+    def path(self, method, key):
+        return os.path.join(self.root, method, self.key(key) + '.pkl')
+
+    def load(self, method, key):
+        try:
+            with open(self.path(method, key), 'rb') as fh:
+                return pickle.load(fh)
+        except FileNotFoundError:
+            raise FixtureMissing(f"{method}/{key}") from None
+
+    def save(self, method, key, value):
+        path = self.path(method, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as fh:
+            pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+
+class RecordingProvider(MarketDataProvider):
+    """轉送給真實 provider，並把回應寫入 fixture 目錄供 FixtureProvider 回放"""
+
+    name = 'record'
+
+    def __init__(self, inner, root):
+        self.inner = inner
+        self.files = _FixtureFiles(root)
+        self._lock = threading.Lock()
+
+    def download(self, tickers, start=None, period=None, interval='1d'):
+        tickers = _as_list(tickers)
+        data = self.inner.download(tickers, start=start, period=period, interval=interval)
+        if data.empty:
+            return data
+        with self._lock:
+            for t in set(data.columns.get_level_values(0)):
+                method = f"prices/{interval}"
+                frame = data[t].dropna(how='all')
+                try:
+                    old = self.files.load(method, t)
+                    frame = pd.concat([old[~old.index.isin(frame.index)], frame]).sort_index()
+                except FixtureMissing:
+                    pass
+                self.files.save(method, t, frame)
+        return data
+
+    def _record(self, method, key):
+        value = getattr(self.inner, method)(key)
+        self.files.save(method, key, value)
+        return value
+
+    def fast_info(self, ticker):
+        return self._record('fast_info', ticker)
+
+    def info(self, ticker):
+        return self._record('info', ticker)
+
+    def cashflow(self, ticker):
+        return self._record('cashflow', ticker)
+
+    def balance_sheet(self, ticker):
+        return self._record('balance_sheet', ticker)
+
+    def financials(self, ticker):
+        return self._record('financials', ticker)
+
+    def estimates(self, ticker):
+        return self._record('estimates', ticker)
+
+    def read_csv(self, url):
+        return self._record('read_csv', url)
+
+
+class FixtureProvider(MarketDataProvider):
+    """
+    [離線回放] 從磁碟讀取錄製的資料，完全不連網。
+    latency 為每次呼叫的模擬延遲 (秒)，用來重現真實網路下的渲染時間。
+    """
+
+    name = 'fixture'
+
+    def __init__(self, root, latency=0.0):
+        self.files = _FixtureFiles(root)
+        self.latency = float(latency)
+
+    def _wait(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def download(self, tickers, start=None, period=None, interval='1d'):
+        self._wait()
+        tickers = _as_list(tickers)
+        start = pd.Timestamp(start) if start is not None else period_start(period or '1y')
+
+        frames = {}
+        for t in tickers:
+            try:
+                frame = self.files.load(f"prices/{interval}", t)
+            except FixtureMissing:
+                continue
+            # 盤中 K 棒的索引帶交易所時區
+            frame = frame[frame.index >= (start.tz_localize(frame.index.tz) if frame.index.tz else start)]
+            if not frame.empty:
+                frames[t] = frame
+        if not frames:
+            return pd.DataFrame()
+        data = pd.concat(frames, axis=1)
+        data.columns.names = ['Ticker', 'Price']
+        return data
+
+    def _replay(self, method, key):
+        self._wait()
+        return self.files.load(method, key)
+
+    def fast_info(self, ticker):
+        return self._replay('fast_info', ticker)
+
+    def info(self, ticker):
+        return self._replay('info', ticker)
+
+    def cashflow(self, ticker):
+        return self._replay('cashflow', ticker)
+
+    def balance_sheet(self, ticker):
+        return self._replay('balance_sheet', ticker)
+
+    def financials(self, ticker):
+        return self._replay('financials', ticker)
+
+    def estimates(self, ticker):
+        return self._replay('estimates', ticker)
+
+    def read_csv(self, url):
+        return self._replay('read_csv', url)
+
+
+# 每個主機：(同時請求數上限, 每秒請求數, 瞬間額度)
+HOST_LIMITS = {
+    'yahoo': (4, 10.0, 20),
+}
+DEFAULT_HOST_LIMIT = (4, 5.0, 10)
+
+
+def _share(value):
+    # 等待同一請求的呼叫端各拿一份複本，避免彼此修改同一個 DataFrame
+    if isinstance(value, (pd.DataFrame, pd.Series, dict)):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(_share(v) for v in value)
+    return value
+
+
+class CoalescingProvider(MarketDataProvider):
+    """
+    [核心優化] 包在任一 provider 前面的請求合併層 (single-flight)：
+    - 同一時間相同的請求 (方法 + 參數) 只真正發出一次，其他呼叫端等待同一個 future
+    - 每個主機有同時請求數上限與 token bucket 速率限制，多位使用者同時湧入時不被限流
+    """
+
+    def __init__(self, inner, host_limits=None):
+        self.inner = inner
+        self.name = inner.name
+        self.host_limits = dict(HOST_LIMITS if host_limits is None else host_limits)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._buckets = {}
+        self.stats = {'requests': 0, 'coalesced': 0}
+
+    @staticmethod
+    def _host(method, args):
+        if method == 'read_csv':
+            return urlparse(str(args[0])).netloc or 'local'
+        return 'yahoo'
+
+    def _limits(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                concurrency, rate, burst = self.host_limits.get(host, DEFAULT_HOST_LIMIT)
+                self._semaphores[host] = threading.BoundedSemaphore(concurrency)
+                self._buckets[host] = TokenBucket(rate, burst)
+            return self._semaphores[host], self._buckets[host]
+
+    def _call(self, method, *args, **kwargs):
+        with span(f"{self.name}.{method}", 'fetch') as node:
+            result = self._call_once(method, node, *args, **kwargs)
+            rows, nbytes = size_of(result)
+            node.set(rows=rows, bytes=nbytes)
+            return result
+
+    def _call_once(self, method, node, *args, **kwargs):
+        key = (method, repr(args), repr(sorted(kwargs.items())))
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+                self.stats['requests'] += 1
+            else:
+                self.stats['coalesced'] += 1
+        if not owner:
+            node.set(coalesced=True)
+            return _share(future.result())
+
+        try:
+            semaphore, bucket = self._limits(self._host(method, args))
+            with semaphore:
+                bucket.acquire()
+                result = getattr(self.inner, method)(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def download(self, tickers, start=None, period=None, interval='1d'):
+        return self._call('download', tickers, start=start, period=period, interval=interval)
+
+    def fast_info(self, ticker):
+        return self._call('fast_info', ticker)
+
+    def info(self, ticker):
+        return self._call('info', ticker)
+
+    def cashflow(self, ticker):
+        return self._call('cashflow', ticker)
+
+    def balance_sheet(self, ticker):
+        return self._call('balance_sheet', ticker)
+
+    def financials(self, ticker):
+        return self._call('financials', ticker)
+
+    def estimates(self, ticker):
+        return self._call('estimates', ticker)
+
+    def read_csv(self, url):
+        return self._call('read_csv', url)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def _create_base_provider(kind, fixtures_dir, latency):
+    if kind == 'fixture':
+        latency = latency if latency is not None else os.environ.get('MARKET_DATA_LATENCY', 0)
+        return FixtureProvider(fixtures_dir, latency=latency)
+    if kind == 'record':
+        return RecordingProvider(YFinanceProvider(), fixtures_dir)
+    if kind == 'yfinance':
+        return YFinanceProvider()
+    raise ValueError(f"Unknown market data provider: {kind}")
+
+
+def create_provider(kind=None, fixtures_dir=None, latency=None, coalesce=None):
+    kind = (kind or os.environ.get('MARKET_DATA_PROVIDER', 'yfinance')).lower()
+    fixtures_dir = fixtures_dir or os.environ.get('MARKET_DATA_FIXTURES', os.path.join(DATA_DIR, 'fixtures'))
+    provider = _create_base_provider(kind, fixtures_dir, latency)
+    if coalesce is None:
+        coalesce = os.environ.get('MARKET_DATA_COALESCE', 'on').lower() not in ('0', 'off', 'false')
+    return CoalescingProvider(provider) if coalesce else provider
+
+
+def get_provider():
+    """程序內共用的 provider (依環境變數建立)"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = create_provider()
+    return _provider
+
+
+def set_provider(provider):
+    """基準測試 / 壓測時直接注入 provider"""
+    global _provider
+    with _provider_lock:
+        _provider = provider
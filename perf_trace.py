@@ -0,0 +1,283 @@
+# ----------------------------------------------------------------------
+# 效能追蹤 (Performance Tracing)
+#   輕量 span 記錄，不依賴 Streamlit：
+#   - span(name, cat, **attrs)：巢狀計時區塊 (每個執行緒各自的堆疊)，可附加快取命中、抓取位元組數、筆數
+#   - traced / traced_cache：資料函數與渲染函數的裝飾器 (traced_cache 包住 st.cache_data，區分本程序快取命中)
+#   - 最外層 span 結束時整棵樹存進 Tracer：近期請求 (側邊欄效能面板) 與各頁面的 p50 / p95
+#   - 匯出 Chrome Trace Event 格式 (chrome://tracing、Perfetto 可直接開啟)；
+#     設定 STOCK_DASHBOARD_TRACE_FILE 時持續附加到檔案 ({pid} 會換成程序代號，多個 replica 各寫一檔)
+#   python perf_trace.py trace.json ...  彙整檔案中各頁面的渲染延遲
+# ----------------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import argparse
+import functools
+import threading
+import collections
+import contextlib
+import numpy as np
+import pandas as pd
+
+TRACE_FILE = os.environ.get('STOCK_DASHBOARD_TRACE_FILE')
+MAX_REQUESTS = 500        # 本程序保留的最近請求 (span 樹) 數
+MAX_PAGE_SAMPLES = 1000   # 每個頁面保留的延遲樣本數 (p50 / p95)
+PAGE_CATEGORY = 'page'
+
+
+class Span:
+    __slots__ = ('name', 'cat', 'attrs', 'start', 'wall', 'duration', 'depth', 'children', 'thread')
+
+    def __init__(self, name, cat, attrs, depth):
+        self.name = name
+        self.cat = cat
+        self.attrs = attrs
+        self.depth = depth
+        self.children = []
+        self.thread = threading.get_ident()
+        self.wall = time.time()
+        self.duration = None
+        self.start = time.perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_event(self, pid):
+        """Chrome Trace Event (complete event，時間單位 µs)"""
+        args = {k: v if isinstance(v, (int, float, str, bool)) or v is None else str(v) for k, v in self.attrs.items()}
+        return {'name': self.name, 'cat': self.cat, 'ph': 'X', 'pid': pid, 'tid': self.thread,
+                'ts': round(self.wall * 1e6), 'dur': round((self.duration or 0) * 1e6), 'args': args}
+
+
+_local = threading.local()
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current_span():
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def annotate(**attrs):
+    """在目前的 span 上附加屬性 (沒有進行中的 span 時忽略)"""
+    span = current_span()
+    if span is not None:
+        span.attrs.update(attrs)
+
+
+@contextlib.contextmanager
+def span(name, cat='function', **attrs):
+    stack = _stack()
+    node = Span(name, cat, attrs, len(stack))
+    if stack:
+        stack[-1].children.append(node)
+    stack.append(node)
+    try:
+        yield node
+    except BaseException as e:
+        node.attrs['error'] = type(e).__name__
+        raise
+    finally:
+        node.duration = time.perf_counter() - node.start
+        stack.pop()
+        if not stack:
+            get_tracer().record(node)
+
+
+def size_of(value):
+    """(筆數, 位元組數)：DataFrame / Series / ndarray 以實際大小計算，其他型別只估筆數"""
+    if isinstance(value, pd.DataFrame):
+        return len(value), int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return len(value), int(value.memory_usage(index=True))
+    if isinstance(value, np.ndarray):
+        return len(value), int(value.nbytes)
+    if isinstance(value, bytes):
+        return None, len(value)
+    if isinstance(value, (tuple, list)) and value and all(isinstance(v, (pd.DataFrame, pd.Series)) for v in value):
+        sizes = [size_of(v) for v in value]
+        return sum(s[0] for s in sizes), sum(s[1] for s in sizes)
+    if isinstance(value, (dict, list, tuple)):
+        return len(value), None
+    return None, None
+
+
+def _record_result(node, result, key):
+    rows, nbytes = size_of(result)
+    if rows is not None:
+        node.attrs.setdefault('rows', rows)
+    if nbytes is not None:
+        node.attrs.setdefault(key, nbytes)
+
+
+def traced(name=None, cat='function'):
+    """函數計時；回傳值為 DataFrame 等時記錄筆數與大小"""
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label, cat) as node:
+                result = fn(*args, **kwargs)
+                _record_result(node, result, 'bytes')
+                return result
+        return wrapper
+    return decorator
+
+
+def traced_cache(cache_decorator, name=None, cat='data'):
+    """
+    包住快取裝飾器 (例如 st.cache_data(ttl=...))：快取命中時函數本體不會執行，
+    span 記為 cache='L1 hit'，否則為 'L1 miss' (共用快取層在子 span 記錄 L2 結果)。
+    """
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def compute(*args, **kwargs):
+            annotate(cache='L1 miss')
+            return fn(*args, **kwargs)
+
+        cached = cache_decorator(compute)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label, cat, cache='L1 hit') as node:
+                result = cached(*args, **kwargs)
+                _record_result(node, result, 'bytes')
+                return result
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+
+class Tracer:
+    """[核心優化] 本程序的 span 彙整：最近的請求樹、各頁面延遲樣本，並可持續寫入 trace 檔"""
+
+    def __init__(self, path=TRACE_FILE):
+        self.requests = collections.deque(maxlen=MAX_REQUESTS)
+        self.page_latency = collections.defaultdict(lambda: collections.deque(maxlen=MAX_PAGE_SAMPLES))
+        self.path = path.replace('{pid}', str(os.getpid())) if path else None
+        self._lock = threading.Lock()
+
+    def record(self, root):
+        with self._lock:
+            self.requests.append(root)
+            if root.cat == PAGE_CATEGORY:
+                self.page_latency[root.name].append(root.duration)
+        if self.path:
+            self._append(root)
+
+    def _append(self, root):
+        # JSON Array Format：結尾的 ']' 可省略，檔案可以一直附加 (工具仍能開啟)
+        events = ''.join(json.dumps(span.to_event(os.getpid()), ensure_ascii=False) + ',\n' for span in root.walk())
+        try:
+            with self._lock:
+                new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as fh:
+                    fh.write(('[\n' if new else '') + events)
+        except OSError as e:
+            print(f"Trace export error ({self.path}): {e}")
+            self.path = None
+
+    def recent(self, limit=None):
+        with self._lock:
+            roots = list(self.requests)
+        return roots[-limit:] if limit else roots
+
+    def latency_summary(self):
+        with self._lock:
+            samples = {page: list(values) for page, values in self.page_latency.items()}
+        return latency_table(samples)
+
+
+def latency_table(samples):
+    """{頁面: [秒]} → 頁面 / 次數 / p50 / p95 / 最大值 (毫秒)"""
+    rows = [{'Page': page, 'Count': len(values),
+             'p50 ms': np.percentile(values, 50) * 1000, 'p95 ms': np.percentile(values, 95) * 1000,
+             'Max ms': max(values) * 1000}
+            for page, values in samples.items() if values]
+    return pd.DataFrame(rows, columns=['Page', 'Count', 'p50 ms', 'p95 ms', 'Max ms'])
+
+
+def span_table(root):
+    """單一請求的 span 樹攤平成表格 (名稱依深度縮排)"""
+    rows = []
+    for node in root.walk():
+        rows.append({
+            'Span': '  ' * (node.depth - root.depth) + node.name,
+            'Kind': node.cat,
+            'ms': (node.duration or 0) * 1000,
+            'Cache': node.attrs.get('cache'),
+            'Rows': node.attrs.get('rows'),
+            'Bytes': node.attrs.get('bytes'),
+        })
+    return pd.DataFrame(rows, columns=['Span', 'Kind', 'ms', 'Cache', 'Rows', 'Bytes'])
+
+
+def chrome_trace(roots):
+    """Chrome Trace Event JSON (dict)"""
+    pid = os.getpid()
+    return {'traceEvents': [node.to_event(pid) for root in roots for node in root.walk()],
+            'displayTimeUnit': 'ms'}
+
+
+def load_trace(path):
+    """讀取 trace 檔 (容許 JSON Array Format 缺少結尾 ']')，回傳事件列表"""
+    with open(path, 'r', encoding='utf-8') as fh:
+        text = fh.read().strip()
+    if text.startswith('{'):
+        return json.loads(text).get('traceEvents', [])
+    if not text.endswith(']'):
+        text = text.rstrip(',') + ']'
+    return json.loads(text)
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize page render latency from exported trace files")
+    parser.add_argument('paths', nargs='+', help="trace files (Chrome trace event format)")
+    args = parser.parse_args(argv)
+
+    samples = collections.defaultdict(list)
+    for path in args.paths:
+        for event in load_trace(path):
+            if event.get('cat') == PAGE_CATEGORY and event.get('ph') == 'X':
+                samples[event['name']].append(event['dur'] / 1e6)
+    table = latency_table(samples)
+    if table.empty:
+        print("no page spans found")
+        return 1
+    print(table.to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+# ----------------------------------------------------------------------
+# 背景預熱排程 (Background Prefetch Scheduler)
+#   依交易時段在開盤前 / 收盤後重新抓取各頁面的數據並寫入共用快取，
+#   頁面渲染直接讀取已完成的快照 (配合 shared_cache 的 stale-while-revalidate)。
+#
+#   - 內嵌模式：儀表板啟動時呼叫 start_background_scheduler() (每個程序一個執行緒)
+#   - 獨立程序：python prefetch.py          → 依時刻表常駐執行
+#               python prefetch.py --once   → 立即執行全部工作 (含估值表) 後結束
+#   所有程序 (各 replica 的內嵌排程、獨立程序) 以共用快取中的長期租約選出一個 leader，
+#   只有 leader 執行排程；leader 結束時其他程序在 LEADER_RETRY 內接手。
+#   啟動預熱不含全市場估值表 (HEAVY_JOBS，數分鐘的基本面抓取)；
+#   設定 STOCK_DASHBOARD_PREFETCH_VALUATION=on 或以 --once 執行時才包含。
+#   交易日曆只排除週末，國定假日觸發時增量抓取不會拿到新 K 棒，成本很低。
+# ----------------------------------------------------------------------
+
+import os
+import sys
+import time
+import argparse
+import functools
+import threading
+from datetime import datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+import datasets
+from shared_cache import get_shared_cache
+
+SETTLE_DELAY = timedelta(minutes=20)   # 收盤後等報價源結算再抓
+PREOPEN_LEAD = timedelta(minutes=30)   # 開盤前提早預熱
+LEADER_KEY = 'prefetch:leader'
+LEADER_RETRY = 60                      # 非 leader 每隔多久嘗試接手 (秒)
+HEAVY_JOBS = {'sp500_valuation', 'twse_valuation'}
+WARM_VALUATION = os.environ.get('STOCK_DASHBOARD_PREFETCH_VALUATION', 'off').lower() in ('1', 'on', 'true')
+
+
+def _load(fn, *args, force=False):
+    # force：不論新舊都重新抓取 (排程時刻)；否則只補齊缺少/過期的項目 (啟動預熱)
+    return fn.refresh(*args) if force else fn(*args)
+
+
+def _refresh_universe(universe, force):
+    _load(datasets.get_constituents, universe, force=force)
+    base_df = datasets.get_constituents(universe)
+    if base_df.empty:
+        return
+    datasets.get_symbol_directory().seed(base_df)
+    tickers_list = base_df['Ticker'].tolist()
+    if force:
+        datasets.get_price_store().expire(tickers_list)
+    _load(datasets.fetch_price_history, tickers_list, force=force)
+    _load(datasets.fetch_market_caps, tickers_list, force=force)
+    # 以最新數據版本預先建好熱力圖快照與全市場篩選表
+    version = datasets.history_version(datasets.fetch_price_history(tickers_list))
+    _load(datasets.get_treemap_snapshot, universe, version, force=force)
+    _load(datasets.get_screener_table, universe, version, force=force)
+
+
+def refresh_sp500(force=True):
+    _refresh_universe('sp500', force)
+
+
+def refresh_twse(force=True):
+    _refresh_universe('twse', force)
+
+
+def refresh_macro(force=True):
+    if force:
+        datasets.get_price_store().expire(datasets.FEAR_GREED_TICKERS)
+    _load(datasets.get_macro_data, force=force)
+    _load(datasets.get_fear_greed_history, force=force)
+
+
+def refresh_commodity(force=True):
+    if force:
+        datasets.get_price_store().expire(datasets.COMMODITY_TICKERS)
+    _load(datasets.get_commodity_data, force=force)
+
+
+def refresh_sp500_valuation(force=True):
+    # 每檔股票的基本面各自有新鮮度規則 (fundamentals_store)，重算時只抓過期的部分
+    _load(datasets.get_valuation_table, 'sp500', force=force)
+
+
+def refresh_twse_valuation(force=True):
+    _load(datasets.get_valuation_table, 'twse', force=force)
+
+
+JOBS = {
+    'sp500': refresh_sp500,
+    'twse': refresh_twse,
+    'macro': refresh_macro,
+    'commodity': refresh_commodity,
+    'sp500_valuation': refresh_sp500_valuation,
+    'twse_valuation': refresh_twse_valuation,
+}
+
+# (市場, 時區, 開盤, 收盤, 觸發的工作)
+MARKET_SESSIONS = [
+    ('TWSE', 'Asia/Taipei', dtime(9, 0), dtime(13, 30), ['twse', 'twse_valuation']),
+    ('NYSE', 'America/New_York', dtime(9, 30), dtime(16, 0), ['sp500', 'macro', 'commodity', 'sp500_valuation']),
+]
+
+
+def register_universe_jobs():
+    """
+    universes/registry.json 中其他有成分股的股票池 (例如放了 nasdaq100.csv) 也加入排程：
+    工作名稱即股票池代號，依 session 掛到對應市場的開盤前 / 收盤後。
+    """
+    sessions = {market: jobs for market, _, _, _, jobs in MARKET_SESSIONS}
+    for universe, spec in datasets.get_universe_registry().available().items():
+        if universe in JOBS:
+            continue
+        JOBS[universe] = functools.partial(_refresh_universe, universe)
+        if spec.get('session') in sessions:
+            sessions[spec['session']].append(universe)
+
+
+def upcoming_runs(now=None):
+    """回傳未來 8 天內所有排程時刻 [(UTC datetime, 事件名稱, 工作清單)]，依時間排序"""
+    now = now or datetime.now(ZoneInfo('UTC'))
+    runs = []
+    for market, tz_name, open_t, close_t, jobs in MARKET_SESSIONS:
+        tz = ZoneInfo(tz_name)
+        local_today = now.astimezone(tz).date()
+        for offset in range(8):
+            day = local_today + timedelta(days=offset)
+            if day.weekday() >= 5:
+                continue
+            pre_open = datetime.combine(day, open_t, tz) - PREOPEN_LEAD
+            post_close = datetime.combine(day, close_t, tz) + SETTLE_DELAY
+            for when, label in ((pre_open, f"{market} pre-open"), (post_close, f"{market} post-close")):
+                if when > now:
+                    runs.append((when.astimezone(ZoneInfo('UTC')), label, jobs))
+    return sorted(runs, key=lambda r: r[0])
+
+
+def run_jobs(job_names, force=True):
+    for name in job_names:
+        started = time.time()
+        try:
+            JOBS[name](force=force)
+            print(f"[prefetch] {name} refreshed in {time.time() - started:.1f}s")
+        except Exception as e:
+            print(f"[prefetch] {name} failed: {e}")
+
+
+def warm_jobs(include_heavy=WARM_VALUATION):
+    return [name for name in JOBS if include_heavy or name not in HEAVY_JOBS]
+
+
+class PrefetchScheduler(threading.Thread):
+    def __init__(self, warm_on_start=True):
+        super().__init__(name='prefetch-scheduler', daemon=True)
+        self.warm_on_start = warm_on_start
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        register_universe_jobs()
+        # 只有取得 leader 租約的程序執行排程 (持有期間持續續約)
+        cache = get_shared_cache()
+        while not self._stop_event.is_set():
+            if cache.try_lock(LEADER_KEY):
+                with cache.hold(LEADER_KEY):
+                    print(f"[prefetch] leader: {cache.owner}")
+                    self._run_schedule()
+                return
+            if self._stop_event.wait(LEADER_RETRY):
+                return
+
+    def _run_schedule(self):
+        if self.warm_on_start:
+            run_jobs(warm_jobs(), force=False)
+        while not self._stop_event.is_set():
+            when, label, jobs = upcoming_runs()[0]
+            wait = (when - datetime.now(ZoneInfo('UTC'))).total_seconds()
+            # 分段睡眠，避免系統休眠/時鐘調整造成錯過時刻
+            if self._stop_event.wait(min(max(wait, 0), 600)):
+                break
+            if datetime.now(ZoneInfo('UTC')) >= when:
+                print(f"[prefetch] {label}: {', '.join(jobs)}")
+                run_jobs(jobs)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_background_scheduler(warm_on_start=True):
+    """每個程序只啟動一個排程執行緒"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = PrefetchScheduler(warm_on_start=warm_on_start)
+            _scheduler.start()
+    return _scheduler
+
+
+def main(argv=None):
+    register_universe_jobs()
+    parser = argparse.ArgumentParser(description="Warm dashboard caches on the trading calendar")
+    parser.add_argument('--once', action='store_true', help="run every job immediately and exit")
+    parser.add_argument('--jobs', nargs='*', choices=sorted(JOBS), help="jobs to run with --once")
+    args = parser.parse_args(argv)
+
+    if args.once:
+        run_jobs(args.jobs or list(JOBS))
+        return 0
+
+    scheduler = PrefetchScheduler(warm_on_start=True)
+    scheduler.start()
+    for when, label, jobs in upcoming_runs()[:4]:
+        print(f"[prefetch] next: {when:%Y-%m-%d %H:%M} UTC  {label}  {jobs}")
+    try:
+        while scheduler.is_alive():
+            scheduler.join(timeout=1)
+    except KeyboardInterrupt:
+        scheduler.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,283 @@
+# ----------------------------------------------------------------------
+# 本地 OHLCV 價格庫 (Persistent Price Store)
+#   1. 每檔股票一個 memory-mapped .npy (structured array: date + OHLCV)
+#   2. 只向資料源請求「最後一筆之後」的 K 棒 (Incremental Delta Fetch)
+#   3. 重疊抓取最近幾天，偵測除權息/分割造成的還原價改寫，必要時整段重抓
+# ----------------------------------------------------------------------
+
+import os
+import json
+import time
+import threading
+import numpy as np
+import pandas as pd
+from market_data import DATA_DIR, PRICE_FIELDS as FIELDS, get_provider, period_start
+
+BAR_DTYPE = np.dtype([('date', '<i8')] + [(f, '<f8') for f in FIELDS])
+
+OVERLAP_DAYS = 7        # 增量抓取時往前重疊的日曆天數
+ADJ_TOLERANCE = 1e-4    # 重疊區收盤價相對誤差超過此值 → 視為還原價被改寫
+SYNC_INTERVAL = 15 * 60 # 同一程序內，同一檔股票 15 分鐘內不重複同步
+FETCH_CHUNK = 200       # 每次下載的股票數上限 (大型股票池分批抓取、逐批寫入，記憶體用量固定)
+
+
+def split_download(data, tickers):
+    """把 yf.download 的結果拆成 {ticker: DataFrame[OHLCV]}，相容 (Ticker, Price) 與 (Price, Ticker) 兩種欄位排列"""
+    frames = {}
+    if data is None or data.empty:
+        return frames
+
+    if not isinstance(data.columns, pd.MultiIndex):
+        if len(tickers) == 1:
+            data = pd.concat({tickers[0]: data}, axis=1)
+        else:
+            return frames
+    elif 'Close' in data.columns.get_level_values(0):
+        data = data.swaplevel(0, 1, axis=1)
+
+    level0 = set(data.columns.get_level_values(0))
+    for t in tickers:
+        if t not in level0:
+            continue
+        df = data[t]
+        if 'Close' not in df.columns and 'Adj Close' in df.columns:
+            df = df.rename(columns={'Adj Close': 'Close'})
+        if 'Close' not in df.columns:
+            continue
+        df = df.reindex(columns=FIELDS).dropna(subset=['Close'])
+        if not df.empty:
+            frames[t] = df
+    return frames
+
+
+def frame_to_bars(df):
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    bars['date'] = pd.DatetimeIndex(df.index).tz_localize(None).normalize().values.astype('datetime64[ns]').view('i8')
+    for f in FIELDS:
+        bars[f] = df[f].to_numpy(dtype='f8', na_value=np.nan)
+    return bars
+
+
+def bars_to_frame(bars):
+    index = pd.DatetimeIndex(np.asarray(bars['date']).astype('datetime64[ns]'), name='Date')
+    return pd.DataFrame({f: np.asarray(bars[f]) for f in FIELDS}, index=index)
+
+
+class PriceStore:
+    """
+    [核心優化] 跨程序重啟保留的日 K 價格庫。
+    讀取時只對「已過期」的股票發出增量請求，一次刷新只抓最近幾根 K 棒。
+    """
+
+    def __init__(self, root=DATA_DIR, downloader=None):
+        self.root = os.path.join(root, 'ohlcv_1d')
+        os.makedirs(self.root, exist_ok=True)
+        self._download = downloader or self._provider_download
+        self._synced_at = {}
+        self._failed = set()  # 最近一次同步下載出錯的代號
+        self._lock = threading.Lock()
+
+    # --- 檔案存取 ---
+    def _path(self, ticker, ext='.npy'):
+        return os.path.join(self.root, ticker.replace(os.sep, '_') + ext)
+
+    def load_bars(self, ticker):
+        try:
+            return np.load(self._path(ticker), mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _load_meta(self, ticker):
+        try:
+            with open(self._path(ticker, '.json'), 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save(self, ticker, bars, covered_from):
+        # 先寫暫存檔再 os.replace，讀取端 (其他 replica) 永遠看到完整檔案
+        path = self._path(ticker)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as fh:
+            np.save(fh, np.ascontiguousarray(bars, dtype=BAR_DTYPE))
+        os.replace(tmp, path)
+
+        meta_path = self._path(ticker, '.json')
+        tmp = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump({'covered_from': str(pd.Timestamp(covered_from).date())}, fh)
+        os.replace(tmp, meta_path)
+
+    # --- 同步邏輯 ---
+    @staticmethod
+    def _provider_download(tickers, start):
+        return get_provider().download(tickers, start=start)
+
+    def _fetch(self, tickers, start):
+        try:
+            return split_download(self._download(list(tickers), start), list(tickers))
+        except Exception as e:
+            print(f"Price store fetch error ({len(tickers)} tickers from {start.date()}): {e}")
+            return None  # 與「資料源沒有這些代號」(空 dict) 區分
+
+    def _fetch_chunks(self, tickers, start):
+        # 逐批下載：呼叫端處理完一批再抓下一批
+        for i in range(0, len(tickers), FETCH_CHUNK):
+            chunk = tickers[i:i + FETCH_CHUNK]
+            yield chunk, self._fetch(chunk, start)
+
+    def expire(self, tickers=None):
+        """讓下一次讀取重新向資料源同步 (強制更新按鈕使用)"""
+        with self._lock:
+            if tickers is None:
+                self._synced_at.clear()
+            else:
+                for t in tickers:
+                    self._synced_at.pop(t, None)
+
+    def sync(self, tickers, start):
+        now = time.time()
+        start = pd.Timestamp(start).normalize()
+        full, delta_groups = [], {}
+
+        with self._lock:
+            # 節流期間內仍要同步：要求的起點比上次同步的起點更早 (例如 1y → 5y)
+            pending = [t for t in dict.fromkeys(tickers)
+                       if t not in self._synced_at or now - self._synced_at[t][0] > SYNC_INTERVAL
+                       or start < self._synced_at[t][1]]
+
+        for t in pending:
+            bars = self.load_bars(t)
+            covered_from = self._load_meta(t).get('covered_from')
+            if bars is None or len(bars) == 0 or covered_from is None or pd.Timestamp(covered_from) > start:
+                full.append(t)
+                continue
+            last_date = pd.Timestamp(int(bars['date'][-1]))
+            fetch_from = last_date - pd.Timedelta(days=OVERLAP_DAYS)
+            delta_groups.setdefault(fetch_from, []).append(t)
+
+        full_groups = {start: full} if full else {}
+        failed = set()  # 下載出錯的代號不記錄同步時間，下一次讀取會重試
+        for fetch_from, group in delta_groups.items():
+            for chunk, frames in self._fetch_chunks(group, fetch_from):
+                if frames is None:
+                    failed.update(chunk)
+                    continue
+                for t in chunk:
+                    if t in frames and not self._merge_delta(t, frames[t]):
+                        # 還原價被改寫：從原本涵蓋的起點整段重抓
+                        refetch_from = min(start, pd.Timestamp(self._load_meta(t)['covered_from']))
+                        full_groups.setdefault(refetch_from, []).append(t)
+
+        for fetch_from, group in full_groups.items():
+            for chunk, frames in self._fetch_chunks(group, fetch_from):
+                if frames is None:
+                    failed.update(chunk)
+                    continue
+                for t, df in frames.items():
+                    self._save(t, frame_to_bars(df), fetch_from)
+
+        with self._lock:
+            for t in pending:
+                if t not in failed:
+                    self._synced_at[t] = (now, start)
+            self._failed.difference_update(pending)
+            self._failed.update(failed)
+
+    def fetch_failed(self, ticker):
+        """最近一次同步這個代號時資料源出錯 (而不是沒有資料)"""
+        return ticker in self._failed
+
+    def _merge_delta(self, ticker, new_df):
+        """合併增量 K 棒；若重疊區還原價不一致則回傳 False 代表需要整段重抓"""
+        old = self.load_bars(ticker)
+        new = frame_to_bars(new_df)
+        if len(new) == 0:
+            return True
+
+        first_new = new['date'][0]
+        keep = np.asarray(old[old['date'] < first_new])
+
+        # 重疊區比對 (排除舊資料最後一根，盤中可能是未收盤的 K 棒)
+        overlap = np.asarray(old[(old['date'] >= first_new)][:-1])
+        if len(overlap):
+            _, i_old, i_new = np.intersect1d(overlap['date'], new['date'], return_indices=True)
+            if len(i_old):
+                a, b = overlap['Close'][i_old], new['Close'][i_new]
+                if np.any(np.abs(a - b) > ADJ_TOLERANCE * np.abs(a)):
+                    return False
+
+        self._save(ticker, np.concatenate([keep, new]), self._load_meta(ticker)['covered_from'])
+        return True
+
+    # --- 讀取 ---
+    def get_history(self, tickers, period='1y'):
+        """
+        回傳與 yf.download(group_by='ticker') 相同格式的 DataFrame：
+        欄位為 MultiIndex (Ticker, Price)，索引為交易日。
+        """
+        tickers = list(tickers)
+        start = period_start(period)
+        self.sync(tickers, start)
+
+        start_ns = start.value
+        frames = {}
+        for t in tickers:
+            bars = self.load_bars(t)
+            if bars is None or len(bars) == 0:
+                continue
+            window = bars[bars['date'] >= start_ns]
+            if len(window):
+                frames[t] = bars_to_frame(window)
+
+        if not frames:
+            # 沒有任何 K 棒 (例如首次同步失敗) 仍維持 (Ticker, Price) 欄位格式
+            return pd.DataFrame(index=pd.DatetimeIndex([], name='Date'),
+                                columns=pd.MultiIndex.from_tuples([], names=['Ticker', 'Price']))
+        data = pd.concat(frames, axis=1)
+        data.columns.names = ['Ticker', 'Price']
+        return data.sort_index()
+
+
+class SharesStore:
+    """
+    流通股數快取 (一季才變動一次)：持久化在單一 JSON，讓市值可由「股數 × 最新收盤價」批次算出，
+    不必每次對每檔股票發出 fast_info 請求。
+    """
+
+    def __init__(self, root=DATA_DIR):
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, 'shares_outstanding.json')
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def get_many(self, tickers, max_age=None):
+        """回傳 {ticker: shares}；max_age (秒) 為 None 時連過期資料一併回傳"""
+        now = time.time()
+        entries = self._load()
+        result = {}
+        for t in tickers:
+            if t in entries:
+                shares, fetched_at = entries[t]
+                if max_age is None or now - fetched_at <= max_age:
+                    result[t] = shares
+        return result
+
+    def update(self, shares):
+        if not shares:
+            return
+        now = time.time()
+        with self._lock:
+            entries = self._load()
+            for t, v in shares.items():
+                entries[t] = [float(v), now]
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                json.dump(entries, fh)
+            os.replace(tmp, self.path)
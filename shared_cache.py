@@ -0,0 +1,296 @@
+# ----------------------------------------------------------------------
+# 跨程序共用快取 (Shared Cross-Replica Cache)
+#   1. SQLite 檔案 (WAL) 當作多個 Streamlit replica 共用的 key-value 存放區
+#   2. Key = (函數, 參數, 資料日期)，每個 dataset 有各自的 TTL
+#   3. Single-flight：同一個 key 只有一個 replica 負責重新抓取，其他人等結果
+#      (持有者在計算期間持續續約；等待者不自行重算，等太久時先回傳舊資料)
+#   4. 可只作廢單一 dataset (例如目前頁面的股票池)，不影響其他頁面
+#   5. Stale-while-revalidate：過期資料先回傳，背景執行緒再更新
+#   6. 每次呼叫記錄一個 span (perf_trace.py)，標記命中 / 過期 / 重新計算
+# 環境變數 STOCK_DASHBOARD_CACHE_DB 可指定共用的資料庫路徑。
+# ----------------------------------------------------------------------
+
+import os
+import time
+import uuid
+import pickle
+import hashlib
+import sqlite3
+import functools
+import contextlib
+import threading
+import concurrent.futures
+from datetime import datetime
+import pandas as pd
+from market_data import DATA_DIR
+from perf_trace import span, annotate
+
+DEFAULT_DB_PATH = os.environ.get('STOCK_DASHBOARD_CACHE_DB', os.path.join(DATA_DIR, 'shared_cache.sqlite3'))
+
+LOCK_LEASE = 180        # 取得重新整理權的租約秒數 (持有者當掉、停止續約時自動釋放)
+LEASE_RENEW = 60        # 計算期間每隔多久續約一次 (需小於 LOCK_LEASE)
+WAIT_POLL = 0.25        # 等待其他 replica 完成時的輪詢間隔
+WAIT_STALE_AFTER = 30   # 等待超過此秒數且有舊資料時，先回傳舊資料 (不自行重算)
+PURGE_AFTER = 7 * 86400 # 過期超過 7 天的項目才真正刪除 (之前都可作為 stale 回傳)
+REVALIDATE_WORKERS = 4
+
+
+def digest(value):
+    return hashlib.sha1(repr(value).encode('utf-8')).hexdigest()[:16]
+
+
+def dataset_name(dataset, scope=None):
+    return dataset if scope is None else f"{dataset}:{digest(scope)}"
+
+
+def _is_empty(value):
+    # 抓取失敗時各函數回傳空 DataFrame / dict，這種結果不寫入共用快取
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.empty
+    return value is None or (isinstance(value, dict) and not value)
+
+
+class SharedCache:
+    def __init__(self, path=DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._revalidating = set()
+        self._revalidate_lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=REVALIDATE_WORKERS,
+                                                               thread_name_prefix='cache-revalidate')
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY, dataset TEXT NOT NULL, value BLOB NOT NULL,
+            created_at REAL NOT NULL, expires_at REAL NOT NULL, base_key TEXT)""")
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+        if 'base_key' not in columns:
+            conn.execute("ALTER TABLE entries ADD COLUMN base_key TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_dataset ON entries(dataset)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_base_key ON entries(base_key, created_at)")
+        conn.execute("""CREATE TABLE IF NOT EXISTS locks (
+            key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)""")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    # --- 基本存取 ---
+    def get(self, key):
+        """回傳 (value, expires_at)；不存在時回傳 None"""
+        row = self._conn().execute("SELECT value, expires_at FROM entries WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return pickle.loads(row[0]), row[1]
+        except Exception:
+            return None
+
+    def get_latest(self, base_key):
+        """同一函數+參數最近一次 (任何資料日期) 未被作廢的結果，作為 stale 候選"""
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM entries WHERE base_key=? AND expires_at>0 ORDER BY created_at DESC LIMIT 1",
+            (base_key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return pickle.loads(row[0]), row[1]
+        except Exception:
+            return None
+
+    def set(self, dataset, key, value, ttl, base_key=None):
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO entries(key, dataset, value, created_at, expires_at, base_key) VALUES (?,?,?,?,?,?)",
+                     (key, dataset, blob, now, now + ttl, base_key))
+        conn.execute("DELETE FROM entries WHERE expires_at < ?", (now - PURGE_AFTER,))
+
+    def invalidate(self, dataset):
+        """作廢整個 dataset (含所有 scope，例如 'prices' 會一併作廢 'prices:<hash>')"""
+        self._conn().execute("UPDATE entries SET expires_at=0 WHERE dataset=? OR dataset LIKE ?",
+                             (dataset, dataset + ':%'))
+
+    # --- Single-flight 鎖 ---
+    def try_lock(self, key, lease=LOCK_LEASE):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM locks WHERE key=? AND expires_at<?", (key, now))
+            cur = conn.execute("INSERT OR IGNORE INTO locks(key, owner, expires_at) VALUES (?,?,?)",
+                               (key, self.owner, now + lease))
+            conn.execute("COMMIT")
+            return cur.rowcount == 1
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, key):
+        self._conn().execute("DELETE FROM locks WHERE key=? AND owner=?", (key, self.owner))
+
+    def renew(self, key, lease=LOCK_LEASE):
+        cur = self._conn().execute("UPDATE locks SET expires_at=? WHERE key=? AND owner=?",
+                                   (time.time() + lease, key, self.owner))
+        return cur.rowcount == 1
+
+    @contextlib.contextmanager
+    def hold(self, key):
+        """已取得 key 的鎖 (try_lock)：期間由背景執行緒續約 (超過 LOCK_LEASE 也不會被其他 replica 搶走)，結束時釋放"""
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.wait(LEASE_RENEW):
+                try:
+                    self.renew(key)
+                except Exception as e:
+                    print(f"Shared cache lease renew error ({key}): {e}")
+
+        thread = threading.Thread(target=heartbeat, name='cache-lease', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            self.release(key)
+
+    def refresh(self, dataset, key, compute, ttl, base_key=None):
+        """不論是否過期都重新計算並寫入；若其他 replica 正在更新同一個 key 則略過 (回傳 False)"""
+        if not self.try_lock(key):
+            return False
+        with self.hold(key):
+            value = compute()
+            if _is_empty(value):
+                return False
+            self.set(dataset, key, value, ttl, base_key)
+            return True
+
+    def _revalidate_async(self, dataset, key, compute, ttl, base_key):
+        with self._revalidate_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def task():
+            try:
+                self.refresh(dataset, key, compute, ttl, base_key)
+            except Exception as e:
+                print(f"Shared cache revalidate error ({dataset}): {e}")
+            finally:
+                with self._revalidate_lock:
+                    self._revalidating.discard(key)
+
+        self._executor.submit(task)
+
+    def peek(self, key, base_key=None):
+        """不計算：新鮮的結果，或 (有 base_key 時) 未被作廢的舊結果；都沒有時回傳 None"""
+        hit = self.get(key)
+        if hit is not None and hit[1] > time.time():
+            return hit[0]
+        if base_key is None:
+            return None
+        stale = hit if hit is not None and hit[1] > 0 else self.get_latest(base_key)
+        return stale[0] if stale is not None else None
+
+    def get_or_compute(self, dataset, key, compute, ttl, base_key=None, stale_ok=False, stale_after=WAIT_STALE_AFTER):
+        hit = self.get(key)
+        if hit is not None and hit[1] > time.time():
+            annotate(cache='L2 hit')
+            return hit[0]
+
+        # Stale-while-revalidate：有舊資料 (且未被手動作廢) 就先回傳，背景更新
+        if stale_ok:
+            stale = hit if hit is not None and hit[1] > 0 else (self.get_latest(base_key) if base_key else None)
+            if stale is not None:
+                self._revalidate_async(dataset, key, compute, ttl, base_key)
+                annotate(cache='L2 stale')
+                return stale[0]
+
+        # 其他 replica 正在計算時持續等待 (持有者會續約)；只有持有者當掉、租約過期時才由這裡接手計算
+        stale_at = time.time() + stale_after
+        while True:
+            if self.try_lock(key):
+                with self.hold(key):
+                    # 拿到鎖後再確認一次，可能剛被別的 replica 寫入
+                    hit = self.get(key)
+                    if hit is not None and hit[1] > time.time():
+                        annotate(cache='L2 hit')
+                        return hit[0]
+                    annotate(cache='L2 miss')
+                    value = compute()
+                    if not _is_empty(value):
+                        self.set(dataset, key, value, ttl, base_key)
+                    return value
+
+            time.sleep(WAIT_POLL)
+            hit = self.get(key)
+            if hit is not None and hit[1] > time.time():
+                annotate(cache='L2 waited')
+                return hit[0]
+            if stale_at is not None and time.time() > stale_at:
+                # 等太久 (例如整個股票池的估值表)：有舊資料就先回傳，沒有就繼續等
+                stale = hit if hit is not None and hit[1] > 0 else (self.get_latest(base_key) if base_key else None)
+                if stale is not None:
+                    annotate(cache='L2 stale (waiting)')
+                    return stale[0]
+                stale_at = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_shared_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SharedCache()
+    return _cache
+
+
+def shared_cached(dataset, ttl, scope_arg=None, stale_ok=True):
+    """
+    把函數結果放進共用快取。
+    Key 為 (函數名稱, 參數, 資料日期)；scope_arg 指定哪個位置參數用來區分 dataset
+    (例如股票清單)，使作廢時可以只影響單一頁面的股票池。
+    stale_ok 時過期資料先回傳、背景更新；wrapper.refresh(...) 供預熱排程強制更新，
+    wrapper.peek(...) 只讀取已有的結果 (不計算、不等待)。
+    """
+    def decorator(fn):
+        def resolve(args, kwargs):
+            scope = args[scope_arg] if scope_arg is not None and len(args) > scope_arg else None
+            base_key = f"{fn.__module__}.{fn.__qualname__}:{digest((args, sorted(kwargs.items())))}"
+            data_date = datetime.now().strftime('%Y-%m-%d')
+            return dataset_name(dataset, scope), f"{base_key}:{data_date}", base_key
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            name, key, base_key = resolve(args, kwargs)
+            with span(fn.__name__, 'dataset', dataset=name):
+                return get_shared_cache().get_or_compute(name, key, lambda: fn(*args, **kwargs), ttl,
+                                                         base_key=base_key, stale_ok=stale_ok)
+
+        def refresh(*args, **kwargs):
+            name, key, base_key = resolve(args, kwargs)
+            return get_shared_cache().refresh(name, key, lambda: fn(*args, **kwargs), ttl, base_key=base_key)
+
+        def peek(*args, **kwargs):
+            name, key, base_key = resolve(args, kwargs)
+            return get_shared_cache().peek(key, base_key if stale_ok else None)
+
+        wrapper.dataset = dataset
+        wrapper.refresh = refresh
+        wrapper.peek = peek
+        return wrapper
+    return decorator
+
+
+def invalidate_dataset(dataset, scope=None):
+    get_shared_cache().invalidate(dataset_name(dataset, scope))
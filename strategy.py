@@ -0,0 +1,130 @@
+# ----------------------------------------------------------------------
+# 技術戰略規則 (Strategy Checklist Rules)
+#   「個股技術戰略」頁面的趨勢 / RSI / MACD / 均線排列 / 乖離率 / 60 日區間 /
+#   頂部背離 / 評語規則，以 (日期 × 股票) 陣列向量化實作：
+#   - 個股頁面：單一股票 (一欄) 取最新一列
+#   - 全市場篩選：整個股票池一次評估
+# ----------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+MIN_BARS = 50  # 與個股頁面相同：少於 50 根 K 棒視為數據不足
+
+TREND_BULL = "🚀 長期多頭"
+TREND_PULLBACK = "⚠️ 多頭回調"
+TREND_BEAR = "🐻 長期空頭"
+
+RSI_OVERBOUGHT = "🔴 超買"
+RSI_OVERSOLD = "🟢 超賣"
+RSI_NEUTRAL = "中性"
+
+DIVERGENCE_BEARISH = "🚨 頂部背離 (Bearish Divergence)"
+DIVERGENCE_NONE = "無明顯背離"
+
+# 評語 (依序判斷，先符合者優先)：(代號, Streamlit 訊息類型, 文字)
+VERDICT_BULL = ('bull', 'success', "評語：強勢多頭，沿 MA20 操作。")
+VERDICT_OVERBOUGHT = ('overbought', 'warning', "評語：趨勢向上但超買，勿追高。")
+VERDICT_BEAR = ('bear', 'error', "評語：空頭走勢，保守觀望。")
+VERDICT_RANGE = ('range', 'info', "評語：區間震盪，等待突破。")
+VERDICTS = [VERDICT_BULL, VERDICT_OVERBOUGHT, VERDICT_BEAR, VERDICT_RANGE]
+
+
+def _window_max(arr, start, stop):
+    # 等同 pandas Series.iloc[start:stop].max()：忽略 NaN，全為 NaN 時回傳 NaN
+    window = arr[start:stop]
+    if len(window) == 0:
+        return np.full(arr.shape[1], np.nan)
+    return np.fmax.reduce(window, axis=0)
+
+
+def _window_min(arr, start, stop):
+    window = arr[start:stop]
+    if len(window) == 0:
+        return np.full(arr.shape[1], np.nan)
+    return np.fmin.reduce(window, axis=0)
+
+
+def classify(close, prev_close, ma20, ma50, ma200, rsi_val, macd_val):
+    """
+    規則本體 (逐元素)：輸入可為單列 (股票,) 或整段歷史 (日期 × 股票)。
+    回傳漲跌幅、乖離率、趨勢、RSI 狀態、均線排列與評語代號。
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = (close - prev_close) / prev_close * 100
+        dist_ma200 = (close - ma200) / ma200 * 100
+
+    above_ma200 = close > ma200
+    trend = np.where(above_ma200, np.where(ma50 > ma200, TREND_BULL, TREND_PULLBACK), TREND_BEAR)
+    rsi_status = np.where(rsi_val > 70, RSI_OVERBOUGHT, np.where(rsi_val < 30, RSI_OVERSOLD, RSI_NEUTRAL))
+    ma_bullish = (ma20 > ma50) & (ma50 > ma200)
+
+    is_bull = trend == TREND_BULL
+    verdict = np.select(
+        [is_bull & (rsi_val < 70) & (macd_val > 0), rsi_val > 75, trend == TREND_BEAR],
+        [VERDICT_BULL[0], VERDICT_OVERBOUGHT[0], VERDICT_BEAR[0]],
+        default=VERDICT_RANGE[0],
+    )
+    return {
+        'change': change, 'dist_ma200': dist_ma200, 'trend': trend,
+        'rsi_status': rsi_status, 'ma_bullish': ma_bullish, 'verdict': verdict,
+    }
+
+
+def evaluate_rules(values):
+    """
+    values: {欄位: (日期 × 股票) 陣列}，需含 Close/High/Low 與 indicators.INDICATOR_COLUMNS。
+    回傳每檔股票最新一列的規則判斷 (DataFrame，列順序同陣列欄位順序)。
+    """
+    close = values['Close']
+    last = {k: values[k][-1] for k in ('Close', 'MA20', 'MA50', 'MA200', 'RSI', 'MACD_Hist')}
+    prev_close = close[-2] if len(close) > 1 else np.full(close.shape[1], np.nan)
+    rules = classify(last['Close'], prev_close, last['MA20'], last['MA50'], last['MA200'],
+                     last['RSI'], last['MACD_Hist'])
+
+    price_high_recent = _window_max(close, -20, None)
+    rsi_high_recent = _window_max(values['RSI'], -20, None)
+    price_high_prev = _window_max(close, -60, -20)
+    rsi_high_prev = _window_max(values['RSI'], -60, -20)
+    divergence = (price_high_recent > price_high_prev) & (rsi_high_recent < rsi_high_prev)
+
+    return pd.DataFrame({
+        'Close': last['Close'],
+        'Change %': rules['change'],
+        'Trend': rules['trend'],
+        'RSI': last['RSI'],
+        'RSI Status': rules['rsi_status'],
+        'MACD Hist': last['MACD_Hist'],
+        'MA Aligned': rules['ma_bullish'],
+        'MA200 Dev %': rules['dist_ma200'],
+        '60D Low': _window_min(values['Low'], -60, None),
+        '60D High': _window_max(values['High'], -60, None),
+        'Bearish Divergence': divergence,
+        'Verdict': rules['verdict'],
+        'Bars': (~np.isnan(close)).sum(axis=0),
+    })
+
+
+def latest_signals(df):
+    """個股頁面：對 calculate_indicators 的輸出取最新一列的規則判斷 (Series)"""
+    values = {c: df[c].to_numpy(dtype='f8')[:, None] for c in df.columns if df[c].dtype.kind in 'fiu'}
+    return evaluate_rules(values).iloc[0]
+
+
+def verdict_message(code):
+    """評語代號 → (Streamlit 訊息類型, 文字)"""
+    for key, level, text in VERDICTS:
+        if key == code:
+            return level, text
+    return VERDICT_RANGE[1], VERDICT_RANGE[2]
+
+
+def screen_universe(ind, min_bars=MIN_BARS):
+    """
+    [核心優化] 全市場篩選：對 IndicatorMatrix 的所有股票一次套用個股頁面的規則。
+    回傳以 Ticker 為索引的 DataFrame，排除 K 棒不足或最新收盤價缺失的股票。
+    """
+    table = evaluate_rules(ind.values)
+    table.index = pd.Index(ind.tickers, name='Ticker')
+    table = table[(table['Bars'] >= min_bars) & table['Close'].notna()]
+    return table.drop(columns='Bars')
@@ -0,0 +1,130 @@
+# ----------------------------------------------------------------------
+# 代號解析 (Symbol Resolution)
+#   個股頁面輸入的代號先查本地代號目錄，不再另外下載一次驗證：
+#   1. 已知代號：成分股清單、代號清單檔 (symbol_listing.csv)、價格庫已有 K 棒、曾經查詢成功
+#   2. 無效代號：負面快取 NEGATIVE_TTL 內直接略過
+#   3. 未知代號：直接抓歷史 K 棒，抓得到就是有效代號 (台股依序嘗試 .TW → .TWO)；
+#      只有資料源確實回應「沒有資料」才列入負面快取，網路 / 資料源錯誤 (FetchError) 不算
+# ----------------------------------------------------------------------
+
+import os
+import json
+import time
+import threading
+import pandas as pd
+from market_data import DATA_DIR, FetchError
+
+NEGATIVE_TTL = 6 * 3600  # 無效代號的快取時間 (避免短暫的網路錯誤把代號擋太久)
+LISTING_FILE = 'symbol_listing.csv'  # 選用：完整上市/上櫃代號清單 (欄位 Symbol, Name)
+
+
+def candidate_symbols(symbol):
+    """輸入代號 → 依序嘗試的候選代號 (4 碼數字視為台股上市，找不到再試上櫃)"""
+    if symbol.isdigit() and len(symbol) == 4:
+        return [f"{symbol}.TW", f"{symbol}.TWO"]
+    if symbol.endswith('.TW'):
+        return [symbol, f"{symbol}O"]
+    return [symbol]
+
+
+class SymbolDirectory:
+    """
+    [核心優化] 本地代號目錄 + 負面快取，持久化在 <root>/symbols.json。
+    """
+
+    def __init__(self, root=DATA_DIR, price_store=None):
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, 'symbols.json')
+        self.price_store = price_store
+        self._lock = threading.Lock()
+        data = self._load()
+        self.listing = data.get('listing', {})
+        self.invalid = data.get('invalid', {})
+        self._load_listing_file(os.path.join(root, LISTING_FILE))
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _load_listing_file(self, path):
+        try:
+            listing = pd.read_csv(path, dtype=str)
+        except (FileNotFoundError, ValueError):
+            return
+        for symbol, name in zip(listing['Symbol'], listing.get('Name', listing['Symbol'])):
+            self.listing.setdefault(str(symbol).upper(), name)
+
+    def _save(self):
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump({'listing': self.listing, 'invalid': self.invalid}, fh, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def seed(self, constituents):
+        """加入成分股清單 (DataFrame，含 Ticker / Name)"""
+        if constituents is None or constituents.empty:
+            return
+        names = constituents['Name'] if 'Name' in constituents.columns else constituents['Ticker']
+        with self._lock:
+            new = {t: n for t, n in zip(constituents['Ticker'], names) if t not in self.listing}
+            if new:
+                self.listing.update(new)
+                self._save()
+
+    def is_known(self, symbol):
+        if symbol in self.listing:
+            return True
+        return self.price_store is not None and self.price_store.load_bars(symbol) is not None
+
+    def is_invalid(self, symbol):
+        checked_at = self.invalid.get(symbol)
+        return checked_at is not None and time.time() - checked_at < NEGATIVE_TTL
+
+    def mark_valid(self, symbol):
+        with self._lock:
+            changed = self.invalid.pop(symbol, None) is not None
+            if symbol not in self.listing:
+                self.listing[symbol] = symbol
+                changed = True
+            if changed:
+                self._save()
+
+    def mark_invalid(self, symbol):
+        with self._lock:
+            self.invalid[symbol] = time.time()
+            self._save()
+
+    def resolve(self, raw):
+        """
+        回傳依序嘗試的候選代號：已知代號排最前面，負面快取中的代號直接排除。
+        """
+        candidates = [c for c in candidate_symbols(raw.upper().strip()) if not self.is_invalid(c)]
+        known = [c for c in candidates if self.is_known(c)]
+        return known + [c for c in candidates if c not in known]
+
+    def lookup(self, raw, loader):
+        """
+        解析代號並取得歷史數據：loader(symbol) 回傳 K 棒 DataFrame，抓得到即代表代號有效；
+        資料源出錯時 loader 拋出 FetchError。
+        回傳 (代號, DataFrame)；全部無效時回傳 (None, 空 DataFrame)，
+        沒有找到有效代號且途中資料源出錯時拋出 FetchError (不能斷定代號無效)。
+        """
+        error = None
+        for symbol in self.resolve(raw):
+            try:
+                data = loader(symbol)
+            except FetchError as e:
+                error = e
+                continue
+            if data is not None and not data.empty:
+                self.mark_valid(symbol)
+                return symbol, data
+            # 已知代號抓不到多半是暫時的網路問題；資料源剛出過錯時後面的候選也不可靠，都不列入負面快取
+            if error is None and not self.is_known(symbol):
+                self.mark_invalid(symbol)
+        if error is not None:
+            raise error
+        return None, pd.DataFrame()
@@ -0,0 +1,279 @@
+# ----------------------------------------------------------------------
+# 市場熱力圖 (Treemap) 計算與快照
+#   process_data_for_periods 與圖表建構不依賴 Streamlit，
+#   每個數據快照只建一次四個週期的 metrics + Plotly figure JSON，
+#   頁面重跑 / 切換分頁時直接送出快取的 JSON。
+#   即時模式 (LiveTreemap) 沿用快照的階層與版面，只改寫變動股票的顏色。
+#   大型股票池 (上千檔) 只畫市值前 TREEMAP_MAX_LEAVES 檔，其餘併入各產業的「其他」節點。
+# ----------------------------------------------------------------------
+
+import json
+import base64
+import numpy as np
+import pandas as pd
+
+# (分頁名稱, 欄位, 標題後綴, 色階範圍)
+TREEMAP_HORIZONS = [
+    ("1 Day", '1D Change', '(1 Day)', [-4, 4]),
+    ("1 Week", '1W Change', '(1 Week)', [-8, 8]),
+    ("1 Month", '1M Change', '(1 Month)', [-15, 15]),
+    ("YTD", 'YTD Change', '(YTD)', [-40, 40]),
+]
+
+
+# 估值著色：(選項名稱, 估值表欄位, 色階範圍)；低估值為綠色
+VALUATION_COLORS = [
+    ("P/E", 'TrailingPE', [5, 50]),
+    ("P/FCF", 'P/FCF', [5, 50]),
+]
+
+TREEMAP_MAX_LEAVES = 600     # S&P 500 不受影響；更大的股票池才合併小型股
+OTHERS_PREFIX = 'OTHERS:'    # 「其他」節點的代號前綴 (沒有單一報價)
+
+
+def collapse_small_caps(df, value_cols, max_leaves=TREEMAP_MAX_LEAVES, harmonic=()):
+    """
+    [核心優化] 市值排名 max_leaves 之後的股票，依 Sector 合併成一個「其他」葉節點：
+    市值加總，value_cols 以市值加權平均 (與 treemap 父節點顏色的算法相同)；
+    harmonic 中的欄位 (本益比等倍數) 改用市值加權調和平均。
+    """
+    if len(df) <= max_leaves:
+        return df
+    ranked = df.sort_values('Market Cap', ascending=False)
+    keep, rest = ranked.iloc[:max_leaves], ranked.iloc[max_leaves:]
+    sector = rest['Sector']
+
+    others = pd.DataFrame({
+        'Market Cap': rest['Market Cap'].groupby(sector).sum(),
+        'Count': sector.groupby(sector).size(),
+    })
+    for col in value_cols:
+        weight = rest['Market Cap'].where(rest[col].notna(), 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if col in harmonic:
+                others[col] = weight.groupby(sector).sum() / (weight / rest[col]).fillna(0).groupby(sector).sum()
+            else:
+                others[col] = (weight * rest[col].fillna(0)).groupby(sector).sum() / weight.groupby(sector).sum()
+    others = others.reset_index()
+    others['Ticker'] = OTHERS_PREFIX + others['Sector'].astype(str)
+    others['Name'] = "其他 " + others['Count'].astype(str) + " 檔"
+    others['Industry'] = "其他 (Others)"
+    others['Close'] = np.nan
+    return pd.concat([keep, others.drop(columns='Count')], ignore_index=True)
+
+
+def process_data_for_periods(base_df, history_data, market_caps):
+    if history_data.empty:
+        return pd.DataFrame()
+
+    closes = pd.DataFrame()
+    
+    if isinstance(history_data.columns, pd.MultiIndex):
+        level0 = history_data.columns.get_level_values(0)
+        if 'Close' in level0:
+            closes = history_data['Close']
+        else:
+            level1 = history_data.columns.get_level_values(1)
+            if 'Close' in level1:
+                closes = history_data.xs('Close', level=1, axis=1)
+            else:
+                if 'Adj Close' in level1:
+                    closes = history_data.xs('Adj Close', level=1, axis=1)
+    else:
+        if 'Close' in history_data.columns:
+            closes = history_data[['Close']]
+    
+    if closes.empty:
+        return pd.DataFrame()
+
+    closes = closes.ffill()
+    
+    try:
+        current_prices = closes.iloc[-1]
+        res_1d = closes.pct_change(1).iloc[-1] * 100
+        res_1w = closes.pct_change(5).iloc[-1] * 100
+        res_1m = closes.pct_change(21).iloc[-1] * 100
+        res_ytd = ((closes.iloc[-1] - closes.iloc[0]) / closes.iloc[0]) * 100
+        
+        metrics_df = pd.DataFrame({
+            'Ticker': current_prices.index,
+            'Close': current_prices.values,
+            '1D Change': res_1d.values,
+            '1W Change': res_1w.values,
+            '1M Change': res_1m.values,
+            'YTD Change': res_ytd.values
+        })
+        
+        base_df['Ticker'] = base_df['Ticker'].astype(str)
+        metrics_df['Ticker'] = metrics_df['Ticker'].astype(str)
+        
+        merged_df = pd.merge(base_df, metrics_df, on='Ticker', how='inner')
+        merged_df['Market Cap'] = merged_df['Ticker'].map(market_caps).fillna(0)
+        merged_df = merged_df.dropna(subset=['Close'])
+        merged_df = merged_df[merged_df['Market Cap'] > 0]
+        
+        return merged_df
+
+    except Exception as e:
+        print(f"Vectorization error: {e}")
+        return pd.DataFrame()
+
+
+def build_treemap_figure(df, change_col, title, color_range):
+    import plotly.express as px  # 只在建快照時需要 (datasets / prefetch 匯入時不載入)
+    # Ensure 'Name' column exists to prevent KeyError
+    if 'Name' not in df.columns:
+        df = df.assign(Name=df['Ticker'])
+
+    fig = px.treemap(
+        df, path=[px.Constant(title), 'Sector', 'Industry', 'Name'], values='Market Cap',
+        color=change_col, color_continuous_scale='RdYlGn', color_continuous_midpoint=0, range_color=color_range,
+        custom_data=['Ticker', 'Close', change_col]
+    )
+    fig.update_traces(
+        textinfo="label+text", 
+        textfont=dict(family="Arial Black", size=15), 
+        hovertemplate='<b>%{label}</b><br>代號: %{customdata[0]}<br>股價: %{customdata[1]:.2f}<br>漲跌幅: %{customdata[2]:.2f}%'
+    )
+    # [Fix] Enforce High Contrast Black Text
+    fig.update_layout(
+        height=600, 
+        margin=dict(t=20, l=10, r=10, b=10),
+        font=dict(color='black', size=14),
+        paper_bgcolor='white',
+        plot_bgcolor='white'
+    )
+    return fig
+
+
+def build_valuation_figure(metrics, valuation, column, title, color_range):
+    """以估值欄位 (P/E、P/FCF) 著色的熱力圖；缺值或負值 (虧損) 的股票不列入"""
+    df = metrics.merge(valuation[['Ticker', column]], on='Ticker', how='inner')
+    df = df[df[column] > 0].reset_index(drop=True)
+    if df.empty:
+        return None
+    df = collapse_small_caps(df, [column], harmonic=(column,))
+    fig = build_treemap_figure(df, column, title, color_range)
+    fig.update_layout(coloraxis=dict(colorscale='RdYlGn_r', cmid=None))
+    fig.update_traces(hovertemplate='<b>%{label}</b><br>代號: %{customdata[0]}<br>股價: %{customdata[1]:.2f}<br>'
+                                    + column + ': %{customdata[2]:.1f}x')
+    return fig
+
+def build_treemap_snapshot(base_df, history_data, market_caps, title_prefix):
+    """
+    [核心優化] 一次建好四個週期的熱力圖：回傳 {'metrics': DataFrame, 'figures': {欄位: figure JSON}}
+    """
+    final_df = process_data_for_periods(base_df.copy(), history_data, market_caps)
+    if final_df.empty:
+        return {'metrics': final_df, 'figures': {}}
+    final_df = final_df[final_df['Market Cap'] > 0].reset_index(drop=True)
+    # metrics 保留全部股票 (估值著色、即時報價)；圖表只畫合併後的節點
+    display_df = collapse_small_caps(final_df, [col for _, col, _, _ in TREEMAP_HORIZONS])
+
+    figures = {}
+    for _, change_col, suffix, color_range in TREEMAP_HORIZONS:
+        fig = build_treemap_figure(display_df, change_col, f'{title_prefix} {suffix}', color_range)
+        figures[change_col] = fig.to_json()
+    return {'metrics': final_df, 'figures': figures}
+
+
+def _decode_array(value):
+    # Plotly 的 typed array JSON ({'dtype', 'bdata'}) 或一般 list → NumPy 陣列
+    if isinstance(value, dict) and 'bdata' in value:
+        return np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype']).copy()
+    return np.asarray(value, dtype='f8')
+
+
+def _encode_array(arr):
+    arr = np.ascontiguousarray(arr, dtype='f8')
+    return {'dtype': 'f8', 'bdata': base64.b64encode(arr.tobytes()).decode('ascii')}
+
+
+class LiveTreemap:
+    """
+    [核心優化] 即時模式的 1D 熱力圖：階層 (ids/parents/values) 與版面沿用快照的 figure JSON，
+    價格變動時只重算變動股票的漲跌幅，並以 np.add.at 把差值加到各層父節點的加權平均。
+    """
+
+    def __init__(self, figure_json):
+        self.figure = json.loads(figure_json)
+        trace = self.figure['data'][0]
+        ids, parents = trace['ids'], trace['parents']
+        n = len(ids)
+        position = {node_id: i for i, node_id in enumerate(ids)}
+        is_parent = np.zeros(n, dtype=bool)
+        for p in parents:
+            if p in position:
+                is_parent[position[p]] = True
+
+        leaves = np.flatnonzero(~is_parent)
+        customdata = trace['customdata']
+        self.customdata = [list(row) for row in customdata]
+        weights = _decode_array(trace['values'])[leaves]
+        colors = _decode_array(trace['marker']['colors'])
+        changes = colors[leaves]
+
+        # 每個葉節點的所有祖先 (不足的層數指向多出來的一格，計算後丟棄)
+        chains = []
+        for i in leaves:
+            chain, node = [], parents[i]
+            while node in position:
+                chain.append(position[node])
+                node = parents[position[node]]
+            chains.append(chain)
+        depth = max((len(c) for c in chains), default=0)
+        ancestors = np.full((len(leaves), depth), n)
+        for row, chain in enumerate(chains):
+            ancestors[row, :len(chain)] = chain
+
+        self.colors = np.append(colors, np.nan)
+        self.numerator = np.zeros(n + 1)
+        self.denominator = np.zeros(n + 1)
+        np.add.at(self.numerator, ancestors, (weights * changes)[:, None])
+        np.add.at(self.denominator, ancestors, weights[:, None])
+
+        # 「其他」節點沒有單一報價：維持快照數值 (仍計入父節點)，只有個股葉節點隨報價更新
+        live = np.array([not str(customdata[i][0]).startswith(OTHERS_PREFIX) for i in leaves], dtype=bool)
+        self.leaves = leaves[live]
+        self.tickers = [customdata[i][0] for i in self.leaves]
+        self.weights = weights[live]
+        self.changes = changes[live].copy()
+        self.ancestors = ancestors[live]
+
+        closes = np.array([float(customdata[i][1]) for i in self.leaves])
+        self.prices = closes
+        # 前一交易日收盤價：由快照的收盤價與 1D 漲跌幅反推，價格不變時漲跌幅與快照一致
+        self.reference = closes / (1 + self.changes / 100)
+
+    def update(self, prices):
+        """套用最新價格 (順序同 self.tickers)，回傳有變動的股票數"""
+        prices = np.asarray(prices, dtype='f8')
+        dirty = np.flatnonzero(prices != self.prices)
+        if len(dirty) == 0:
+            return 0
+        new_changes = (prices[dirty] / self.reference[dirty] - 1) * 100
+        delta = self.weights[dirty] * (new_changes - self.changes[dirty])
+        np.add.at(self.numerator, self.ancestors[dirty], delta[:, None])
+
+        self.prices[dirty] = prices[dirty]
+        self.changes[dirty] = new_changes
+        self.colors[self.leaves[dirty]] = new_changes
+        touched = np.unique(self.ancestors[dirty])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.colors[touched] = self.numerator[touched] / self.denominator[touched]
+
+        for j in dirty:
+            row = self.customdata[self.leaves[j]]
+            row[1], row[2] = float(self.prices[j]), float(self.changes[j])
+        for node in touched[touched < len(self.customdata)]:
+            self.customdata[node][2] = float(self.colors[node])
+        return len(dirty)
+
+    def to_figure(self):
+        """目前狀態的 figure dict：只替換顏色與 customdata，其餘沿用快照"""
+        trace = dict(self.figure['data'][0])
+        trace['marker'] = dict(trace['marker'], colors=_encode_array(self.colors[:-1]))
+        trace['customdata'] = self.customdata
+        # uirevision 固定：重繪時保留使用者目前展開的層級
+        layout = dict(self.figure.get('layout', {}), uirevision='live')
+        return dict(self.figure, data=[trace], layout=layout)
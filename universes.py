@@ -0,0 +1,164 @@
+# ----------------------------------------------------------------------
+# 股票池註冊表 (Universe Registry)
+#   股票池定義放在 universes/registry.json，成分股 (Ticker, Name, Sector, Industry, Weight)
+#   來自本地 CSV 或遠端 CSV：
+#   - 專案內 universes/ 為預設，<DATA_DIR>/universes/ 可放置同名檔案覆蓋或新增股票池
+#     (例如完整上市櫃清單 tw_all.csv、nasdaq100.csv、russell1000.csv)
+#   - 本地檔案不存在、也沒有遠端來源的股票池不會列出
+#   - 每次載入記錄成分股版本 (代號集合的雜湊) 與增減變動；遠端來源失敗時沿用最後一份成功的清單
+# ----------------------------------------------------------------------
+
+import os
+import json
+import time
+import threading
+import pandas as pd
+from market_data import DATA_DIR
+from shared_cache import digest
+
+UNIVERSE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'universes')
+REGISTRY_FILE = 'registry.json'
+UNIVERSE_COLUMNS = ['Ticker', 'Name', 'Sector', 'Industry', 'Weight']
+MAX_CHANGES = 50  # 每個股票池保留的成分股變動紀錄筆數
+
+
+def normalize_constituents(df, spec=None):
+    """欄位改名 / 代號轉換 / 補齊缺少的欄位，回傳以 UNIVERSE_COLUMNS 為欄位、代號不重複的 DataFrame"""
+    spec = spec or {}
+    df = df.rename(columns=spec.get('columns', {}))
+    if 'Ticker' not in df.columns:
+        raise ValueError("constituents need a Ticker column")
+    df = df.copy()
+    df['Ticker'] = df['Ticker'].astype(str).str.strip().str.upper()
+    if spec.get('ticker_replace'):
+        old, new = spec['ticker_replace']
+        df['Ticker'] = df['Ticker'].str.replace(old, new, regex=False)
+    df = df[df['Ticker'].ne('') & df['Ticker'].ne('NAN')].drop_duplicates('Ticker')
+
+    if 'Name' not in df.columns:
+        df['Name'] = df['Ticker']
+    if 'Sector' not in df.columns:
+        df['Sector'] = 'Unknown'
+    if 'Industry' not in df.columns:
+        df['Industry'] = df['Sector']
+    df['Name'] = df['Name'].fillna(df['Ticker'])
+    df['Sector'] = df['Sector'].fillna('Unknown')
+    df['Industry'] = df['Industry'].fillna(df['Sector'])
+    df['Weight'] = pd.to_numeric(df['Weight'], errors='coerce') if 'Weight' in df.columns else float('nan')
+    return df[UNIVERSE_COLUMNS].reset_index(drop=True)
+
+
+def membership_version(df):
+    """成分股版本：代號集合的雜湊 (順序、名稱、權重變動不影響)"""
+    return digest(tuple(sorted(df['Ticker']))) if df is not None and not df.empty else None
+
+
+class UniverseRegistry:
+    """
+    [核心優化] 股票池定義 + 成分股載入，載入紀錄持久化在 <root>/universes/state/<key>.json。
+    reader(url) 讀取遠端 CSV (預設 market_data provider)。
+    """
+
+    def __init__(self, root=DATA_DIR, dirs=None, reader=None):
+        self.dirs = dirs or [UNIVERSE_DIR, os.path.join(root, 'universes')]
+        self.state_dir = os.path.join(root, 'universes', 'state')
+        os.makedirs(self.state_dir, exist_ok=True)
+        self._read_remote = reader or self._provider_read
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _provider_read(url):
+        from market_data import get_provider
+        return get_provider().read_csv(url)
+
+    # --- 定義 ---
+    def registry(self):
+        """合併各目錄的 registry.json (後面的目錄覆蓋前面)"""
+        specs = {}
+        for folder in self.dirs:
+            try:
+                with open(os.path.join(folder, REGISTRY_FILE), 'r', encoding='utf-8') as fh:
+                    for key, spec in json.load(fh).items():
+                        specs[key] = dict(specs.get(key, {}), **spec)
+            except (FileNotFoundError, ValueError):
+                continue
+        return specs
+
+    def _local_file(self, spec):
+        # 後面的目錄 (使用者資料目錄) 優先
+        if not spec.get('file'):
+            return None
+        for folder in reversed(self.dirs):
+            path = os.path.join(folder, spec['file'])
+            if os.path.exists(path):
+                return path
+        return None
+
+    def available(self):
+        """有本地檔案或遠端來源的股票池：{key: spec}"""
+        return {k: s for k, s in self.registry().items()
+                if s.get('source') or self._local_file(s)}
+
+    def title(self, key):
+        return self.registry().get(key, {}).get('title', key)
+
+    # --- 載入 ---
+    def load(self, key):
+        spec = self.registry()[key]
+        try:
+            path = self._local_file(spec)
+            if path:
+                raw = pd.read_csv(path, dtype={'Ticker': str})
+            elif spec.get('source'):
+                raw = self._read_remote(spec['source'])
+            else:
+                raise FileNotFoundError(f"no constituents file for universe {key}")
+            df = normalize_constituents(raw, spec)
+            if df.empty:
+                raise ValueError(f"empty constituents for universe {key}")
+        except Exception as e:
+            print(f"Universe load error ({key}): {e}")
+            return self._last_good(key)
+        self._record(key, df)
+        return df
+
+    def _state_path(self, key, ext='.json'):
+        return os.path.join(self.state_dir, key + ext)
+
+    def state(self, key):
+        """{'version', 'since', 'count', 'changes': [{'version', 'at', 'added', 'removed'}]}"""
+        try:
+            with open(self._state_path(key), 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _last_good(self, key):
+        try:
+            return pd.read_csv(self._state_path(key, '.csv'), dtype={'Ticker': str})
+        except (FileNotFoundError, ValueError):
+            return pd.DataFrame(columns=UNIVERSE_COLUMNS)
+
+    def _write(self, path, text):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            fh.write(text)
+        os.replace(tmp, path)
+
+    def _record(self, key, df):
+        version = membership_version(df)
+        with self._lock:
+            state = self.state(key)
+            if state.get('version') == version:
+                return
+            previous = set(self._last_good(key)['Ticker'])
+            current = set(df['Ticker'])
+            changes = state.get('changes', [])
+            if state.get('version'):
+                changes.append({'version': version, 'at': time.time(),
+                                'added': sorted(current - previous), 'removed': sorted(previous - current)})
+            self._write(self._state_path(key, '.csv'), df.to_csv(index=False))
+            self._write(self._state_path(key), json.dumps({
+                'version': version, 'since': time.time(), 'count': len(df),
+                'changes': changes[-MAX_CHANGES:],
+            }, ensure_ascii=False))
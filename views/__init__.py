@@ -0,0 +1,24 @@
+# ----------------------------------------------------------------------
+# 頁面模組 (Views)
+#   每個儀表板頁面一個模組，提供 render(mode) 與 refresh(mode) (強制更新時只作廢該頁的數據)。
+#   主程式每次重跑只執行側邊欄與目前頁面；頁面模組在第一次切換到該頁時才 import
+#   (plotly.subplots、技術圖、即時報價等依賴跟著延後)，之後留在 sys.modules 不再重新定義函數。
+# ----------------------------------------------------------------------
+
+import importlib
+
+# 側邊欄選項 → 頁面模組
+PAGES = {
+    "🔎 個股技術戰略 (Stock Strategy)": 'stock',
+    "🧮 全市場技術篩選 (Screener)": 'screener',
+    "🇺🇸 美股 S&P 500": 'market_map',
+    "🇹🇼 台股權值股 (TWSE)": 'market_map',
+    "🗺️ 更多股票池 (Universes)": 'market_map',
+    "💰 資金與籌碼 (Liquidity)": 'liquidity',
+    "🚢 原物料與航運 (Commodities)": 'commodity',
+    "📉 總經與風險指標 (Macro)": 'macro',
+}
+
+
+def load(page):
+    return importlib.import_module(f"{__name__}.{PAGES[page]}")
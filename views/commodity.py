@@ -0,0 +1,74 @@
+# ----------------------------------------------------------------------
+# 原物料與航運 (Commodities)
+# ----------------------------------------------------------------------
+
+import streamlit as st
+import plotly.express as px
+import datasets
+from shared_cache import invalidate_dataset
+from perf_trace import traced, traced_cache
+from views.common import LOCAL_CACHE_TTL
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def get_commodity_data():
+    return datasets.get_commodity_data()
+
+@traced(cat='render')
+def plot_line_chart(data, title, color):
+    fig = px.line(data, title=title)
+    fig.update_traces(line_color=color, line_width=2)
+    # [Fix] Enforce High Contrast Black Text
+    fig.update_layout(
+        height=350, 
+        margin=dict(l=20, r=20, t=40, b=20), 
+        xaxis_title=None, yaxis_title=None,
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+        font=dict(color='black')
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+@traced(cat='render')
+def render_commodity_page():
+    st.subheader("🚢 原物料與航運 (Commodities)")
+    with st.spinner("正在獲取原物料行情..."):
+        comm_data = get_commodity_data()
+        if comm_data.empty:
+            st.warning("⚠️ 暫時無法取得原物料行情，請稍後再試。")
+            return
+        tickers = set(comm_data.columns.get_level_values(0))
+        
+        # 航運區塊
+        st.markdown('<div class="dashboard-card">', unsafe_allow_html=True)
+        st.markdown("#### ⚓ 航運指標 (Shipping)")
+        c1, c2 = st.columns([3, 1])
+        with c1:
+            if 'BDRY' in tickers:
+                data = comm_data['BDRY']['Close'].dropna()
+                plot_line_chart(data, "BDI 替代指標 (BDRY ETF)", "#1f77b4")
+        with c2:
+            st.metric("BDI 狀態", "監控中")
+            st.link_button("查看 Investing.com", "https://www.investing.com/indices/baltic-dry")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        # 能源區塊
+        st.markdown('<div class="dashboard-card">', unsafe_allow_html=True)
+        st.markdown("#### 🛢️ 能源與金屬 (Energy & Metals)")
+        c3, c4 = st.columns(2)
+        with c3:
+            if 'CL=F' in tickers:
+                data = comm_data['CL=F']['Close'].dropna()
+                plot_line_chart(data, "WTI 原油", "#ef4444")
+        with c4:
+            if 'HG=F' in tickers:
+                data = comm_data['HG=F']['Close'].dropna()
+                plot_line_chart(data, "銅 (Copper)", "#10b981")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+def render(mode):
+    render_commodity_page()
+
+def refresh(mode):
+    invalidate_dataset('commodity')
+    get_commodity_data.clear()
+    datasets.get_price_store().expire(datasets.COMMODITY_TICKERS)
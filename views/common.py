@@ -0,0 +1,52 @@
+# ----------------------------------------------------------------------
+# 頁面共用 (Shared View Helpers)
+#   多個頁面共用的本程序快取 (L1) 與元件；各頁面模組只在第一次切換到該頁時載入。
+# ----------------------------------------------------------------------
+
+import streamlit as st
+import datasets
+from shared_cache import invalidate_dataset
+from perf_trace import traced, traced_cache
+
+# 本程序快取 (L1) 只保留短時間，讓多個 replica 透過共用快取 (L2) 盡快收斂到同一份數據
+LOCAL_CACHE_TTL = 300
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def get_constituents(universe):
+    return datasets.get_constituents(universe)
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def available_universes():
+    return datasets.available_universes()
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def fetch_price_history(tickers, period="1y"):
+    return datasets.fetch_price_history(tickers, period)
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def get_macro_data():
+    return datasets.get_macro_data()
+
+def refresh_macro(mode):
+    invalidate_dataset('macro')
+    get_macro_data.clear()
+    datasets.get_price_store().expire(datasets.MACRO_TICKERS)
+
+@traced(cat='render')
+def render_backtest_table(stats):
+    if stats.empty:
+        st.warning("無回測數據")
+        return
+    st.dataframe(
+        stats, use_container_width=True, hide_index=True,
+        column_config={
+            'Horizon': st.column_config.NumberColumn("持有 (K 棒)"),
+            'Hit Rate %': st.column_config.NumberColumn(format="%.1f%%"),
+            'Mean Return %': st.column_config.NumberColumn(format="%.2f%%"),
+            'Excess %': st.column_config.NumberColumn(format="%.2f%%"),
+            'Median Return %': st.column_config.NumberColumn(format="%.2f%%"),
+            'Avg Drawdown %': st.column_config.NumberColumn(format="%.2f%%"),
+            'Worst Drawdown %': st.column_config.NumberColumn(format="%.2f%%"),
+        },
+    )
+    st.caption("命中率：看多訊號之後上漲 / 看空訊號之後下跌的比例；超額報酬相對全部 K 棒的平均報酬。訊號樣本互相重疊。")
@@ -0,0 +1,75 @@
+# ----------------------------------------------------------------------
+# 資金與籌碼 (Liquidity)
+#   手動輸入面板與診斷在 fragment 內：修改輸入只重跑這一段，不重算下方的 OBV 區塊；
+#   OBV 為計算圖節點 (compute_graph.py)，只有 S&P 500 數據版本改變時才重算。
+# ----------------------------------------------------------------------
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+from compute_graph import ComputeGraph
+from perf_trace import traced
+from views.common import get_macro_data, refresh_macro
+
+def obv_chart_frame(sp500):
+    """S&P 500 收盤價與 OBV，各自正規化到 0~1 以便同圖比較"""
+    direction = np.where(sp500['Close'].pct_change() >= 0, 1, -1)
+    obv = (sp500['Volume'] * direction).cumsum()
+    norm_price = (sp500['Close'] - sp500['Close'].min()) / (sp500['Close'].max() - sp500['Close'].min())
+    norm_obv = (obv - obv.min()) / (obv.max() - obv.min())
+    return pd.DataFrame({'S&P 500': norm_price, 'OBV (資金)': norm_obv})
+
+@st.fragment
+def render_liquidity_inputs():
+    # 手動輸入卡片
+    st.markdown('<div class="dashboard-card">', unsafe_allow_html=True)
+    with st.expander("🛠️ 關鍵數據輸入面板 (Input Panel)", expanded=True):
+        col_in1, col_in2, col_in3 = st.columns(3)
+        with col_in1:
+            st.markdown("**🇹🇼 貨幣供給**")
+            m1b_val = st.number_input("M1B 年增率 (%)", value=5.24, step=0.01)
+            m2_val = st.number_input("M2 年增率 (%)", value=5.44, step=0.01)
+        with col_in2:
+            st.markdown("**🇹🇼 信用交易**")
+            margin_ratio = st.number_input("融資維持率 (%)", value=169.39, step=0.1)
+        with col_in3:
+            st.markdown("**🇺🇸 美股槓桿**")
+            us_margin_debt = st.number_input("Margin Debt ($T)", value=1.21, step=0.01)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    # 結果卡片
+    st.markdown('<div class="dashboard-card">', unsafe_allow_html=True)
+    st.subheader("📊 籌碼水位診斷")
+    col_res1, col_res2, col_res3 = st.columns(3)
+    
+    with col_res1:
+        gap = m1b_val - m2_val
+        st.metric("資金剪刀差 (M1B - M2)", f"{gap:.2f}%", delta=gap)
+        st.caption("正值代表資金動能充沛")
+
+    with col_res2:
+        status_margin = "🟢 安全" if margin_ratio > 160 else "🔴 危險"
+        st.metric("融資維持率", f"{margin_ratio}%", delta=status_margin, delta_color="off")
+
+    with col_res3:
+        st.metric("美股融資餘額", f"${us_margin_debt}T")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@traced(cat='render')
+def render_liquidity_page():
+    st.header("💰 資金量體與籌碼戰情室")
+    render_liquidity_inputs()
+
+    # OBV 分析
+    st.markdown('<div class="dashboard-card">', unsafe_allow_html=True)
+    st.subheader("🌊 量價趨勢 (S&P 500)")
+    with st.spinner("計算 OBV 中..."):
+        graph = ComputeGraph(st.session_state, 'liquidity')
+        sp500 = graph.source('sp500', lambda: get_macro_data()['^GSPC'])
+        st.line_chart(graph.node('obv', obv_chart_frame, sp500).value)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render(mode):
+    render_liquidity_page()
+
+refresh = refresh_macro
@@ -0,0 +1,154 @@
+# ----------------------------------------------------------------------
+# 總經與風險指標 (Macro)
+#   多因子恐懼與貪婪指數 (macro_engine.py) 的完整歷史由共用快取提供，
+#   歷史圖只在數據版本改變時重建 (compute_graph.py)；多因子數據不足時退回 VIX + RSI 代理指標。
+# ----------------------------------------------------------------------
+
+import streamlit as st
+import plotly.express as px
+import plotly.graph_objects as go
+import datasets
+from indicators import fear_greed_score
+from macro_engine import FACTORS, INDEX_COLUMN, label
+from compute_graph import ComputeGraph
+from shared_cache import invalidate_dataset
+from perf_trace import traced, traced_cache
+from views.common import LOCAL_CACHE_TTL, get_macro_data, refresh_macro
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def get_fear_greed_history():
+    return datasets.get_fear_greed_history()
+
+def calculate_fear_greed(vix_close, sp500_close):
+    # 14 期 RSI 與個股頁面共用增量狀態，新 K 棒到達時只推進新的部分
+    score, vix_close, rsi, st.session_state['fear_greed_rsi'] = fear_greed_score(
+        vix_close, sp500_close, st.session_state.get('fear_greed_rsi'))
+    return score, vix_close, rsi
+
+@traced(cat='render')
+def plot_gauge(score):
+    fig = go.Figure(go.Indicator(
+        mode = "gauge+number", value = score,
+        domain = {'x': [0, 1], 'y': [0, 1]}, 
+        title = {'text': "市場情緒 (Proxy)", 'font': {'size': 18, 'color': 'black'}},
+        gauge = {
+            'axis': {'range': [None, 100], 'tickwidth': 1, 'tickcolor': 'black'}, 
+            'bar': {'color': "darkblue"},
+            'steps': [
+                {'range': [0, 25], 'color': '#ff4b4b'}, # Red
+                {'range': [25, 45], 'color': '#ffbaba'}, # Light Red
+                {'range': [45, 55], 'color': '#e0e0e0'}, # Grey
+                {'range': [55, 75], 'color': '#baffba'}, # Light Green
+                {'range': [75, 100], 'color': '#008000'} # Green
+            ]
+        }
+    ))
+    # [Fix] Enforce High Contrast Black Text
+    fig.update_layout(
+        height=300, 
+        margin=dict(t=60, b=20, l=30, r=30),
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+        font=dict(color='black')
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+def fear_greed_figure(history):
+    """指數的每日歷史 (0~100)，背景標示恐懼 / 貪婪區間；區間按鈕在瀏覽器端切換"""
+    index = history[INDEX_COLUMN].dropna()
+    fig = go.Figure(go.Scatter(x=index.index, y=index.values, mode='lines', name=INDEX_COLUMN,
+                               line=dict(color='darkblue', width=1.5)))
+    fig.add_hrect(y0=0, y1=25, fillcolor='#ff4b4b', opacity=0.15, line_width=0)
+    fig.add_hrect(y0=75, y1=100, fillcolor='#008000', opacity=0.15, line_width=0)
+    fig.add_hline(y=50, line_dash="dot", line_color="grey")
+    fig.update_layout(
+        height=350, margin=dict(t=30, b=20, l=30, r=30),
+        plot_bgcolor='white', paper_bgcolor='white', font=dict(color='black'),
+        yaxis=dict(range=[0, 100], title="分數"),
+        xaxis=dict(rangeselector=dict(buttons=[
+            dict(count=6, label="6M", step="month", stepmode="backward"),
+            dict(count=1, label="1Y", step="year", stepmode="backward"),
+            dict(count=3, label="3Y", step="year", stepmode="backward"),
+            dict(step="all", label="All"),
+        ])),
+    )
+    return fig
+
+@traced(cat='render')
+def render_factor_table(latest):
+    rows = [{'因子': name, '分數': latest.get(key)} for key, (name, _) in FACTORS.items()]
+    st.dataframe(rows, use_container_width=True, hide_index=True,
+                 column_config={'分數': st.column_config.ProgressColumn(min_value=0, max_value=100, format="%.0f")})
+
+@traced(cat='render')
+def render_macro_page():
+    st.markdown('<div class="dashboard-card">', unsafe_allow_html=True)
+    st.subheader("📉 總經與風險指標 (Macro Risk)")
+    st.caption("市場恐慌指數 (VIX) 與 貪婪指數")
+    
+    with st.spinner("正在計算總經風險指標..."):
+        macro_data = get_macro_data()
+        
+        # [Safety Check] Ensure Close column exists and handle MultiIndex properly
+        try:
+            # macro_data is guaranteed to be (Ticker, Price) via get_macro_data
+            if '^VIX' not in macro_data.columns.get_level_values(0):
+                st.error("無法取得 VIX 數據")
+                return
+            
+            vix_series = macro_data['^VIX']['Close'].dropna()
+            sp500_series = macro_data['^GSPC']['Close'].dropna()
+            history = get_fear_greed_history()
+            index = history[INDEX_COLUMN].dropna() if not history.empty else history
+            if len(index):
+                latest = history.loc[index.index[-1]]
+                f_g_score = int(round(latest[INDEX_COLUMN]))
+                v_val = vix_series.iloc[-1]
+            else:
+                latest = None
+                f_g_score, v_val, r_val = calculate_fear_greed(vix_series.iloc[-1], sp500_series)
+            
+            col1, col2 = st.columns([1, 1])
+            with col1:
+                plot_gauge(f_g_score)
+                st.metric("VIX 恐慌指數", f"{v_val:.2f}")
+
+            with col2:
+                if latest is not None:
+                    st.metric("市場情緒", label(f_g_score), delta=f"{latest.name:%Y-%m-%d}", delta_color="off")
+                    render_factor_table(latest)
+                    st.caption("各因子為過去一年的百分位 (0 = 最恐懼，100 = 最貪婪)，指數為可用因子的平均。")
+                else:
+                    st.caption("Fear & Greed 模型基於 VIX 與 RSI 加權計算 (多因子數據不足)。")
+                st.info("💡 台灣景氣對策信號請參閱國發會")
+                st.link_button("👉 國發會查詢系統", "https://index.ndc.gov.tw/n/zh_tw/indicators")
+        except Exception as e:
+            st.error(f"數據處理錯誤: {e}")
+            return
+
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    if latest is not None:
+        st.markdown('<div class="dashboard-card">', unsafe_allow_html=True)
+        st.markdown("#### 恐懼與貪婪指數歷史 (Fear & Greed History)")
+        graph = ComputeGraph(st.session_state, 'macro')
+        history_node = graph.source('fear_greed', lambda: history)
+        st.plotly_chart(graph.node('history_chart', fear_greed_figure, history_node).value, use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    st.markdown('<div class="dashboard-card">', unsafe_allow_html=True)
+    st.markdown("#### VIX 波動率走勢 (1 Year)")
+    fig_vix = px.line(vix_series, title="CBOE VIX Index")
+    fig_vix.add_hline(y=20, line_dash="dash", line_color="red")
+    fig_vix.update_layout(plot_bgcolor='white', font=dict(color='black'))
+    st.plotly_chart(fig_vix, use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render(mode):
+    render_macro_page()
+
+def refresh(mode):
+    refresh_macro(mode)
+    invalidate_dataset('fear_greed')
+    get_fear_greed_history.clear()
+    datasets.get_price_store().expire(datasets.FEAR_GREED_TICKERS)
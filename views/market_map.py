@@ -0,0 +1,155 @@
+# ----------------------------------------------------------------------
+# 市場熱力圖 (Market Map)
+#   S&P 500 / TWSE / 更多股票池三個頁面共用：快照 figure JSON、估值著色、即時模式。
+#   估值著色不在頁面中等待整個股票池的基本面：背景建立估值表，建立中以已完成的股票畫部分熱力圖。
+# ----------------------------------------------------------------------
+
+import json
+from datetime import datetime
+import streamlit as st
+import datasets
+from treemap import TREEMAP_HORIZONS, VALUATION_COLORS, LiveTreemap, build_valuation_figure
+from live_feed import LiveFeed
+from shared_cache import invalidate_dataset
+from perf_trace import traced, traced_cache
+from views.common import LOCAL_CACHE_TTL, get_constituents, available_universes, fetch_price_history
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def fetch_market_caps(tickers):
+    return datasets.fetch_market_caps(tickers)
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def get_treemap_snapshot(universe, data_version):
+    return datasets.get_treemap_snapshot(universe, data_version)
+
+def valuation_figure_json(universe, data_version, color_by, valuation):
+    _, column, color_range = next(v for v in VALUATION_COLORS if v[0] == color_by)
+    metrics = get_treemap_snapshot(universe, data_version)['metrics']
+    if valuation.empty:
+        return None
+    fig = build_valuation_figure(metrics, valuation, column, f"{datasets.universe_title(universe)} ({color_by})", color_range)
+    return fig.to_json() if fig is not None else None
+
+# 完整估值表的 figure 才快取 (以估值表內容為 key)；建立中的部分結果每次直接畫
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def get_valuation_figure(universe, data_version, color_by, valuation):
+    return valuation_figure_json(universe, data_version, color_by, valuation)
+
+# 估值表建立中：部分熱力圖的更新頻率 (秒)
+VALUATION_POLL_INTERVAL = 3.0
+
+@st.fragment(run_every=VALUATION_POLL_INTERVAL)
+@traced(cat='render')
+def render_valuation_progress(universe, data_version, color_by):
+    valuation, done, total, building = datasets.get_valuation_snapshot(universe)
+    if not building:
+        st.rerun()  # 建立完成：整頁重跑，改畫完整 (快取) 的熱力圖
+    st.progress(min(done / total, 1.0) if total else 0.0,
+                text=f"正在背景抓取基本面：{done} / {total} 檔 (熱力圖只顯示已完成的股票)")
+    fig_json = valuation_figure_json(universe, data_version, color_by, valuation)
+    if fig_json is not None:
+        st.plotly_chart(json.loads(fig_json), use_container_width=True, key=f"valuation_partial_{universe}")
+
+# 即時模式：每個 (股票池, 數據版本) 一條共用的報價執行緒，版本更新時停止舊的
+LIVE_REFRESH_INTERVAL = 0.5
+
+@st.cache_resource(max_entries=4, on_release=lambda feed: feed.stop())
+def get_live_feed(universe, data_version):
+    metrics = get_treemap_snapshot(universe, data_version)['metrics']
+    return LiveFeed(metrics['Ticker'].tolist(), metrics['Close'].to_numpy()).start()
+
+@st.fragment(run_every=LIVE_REFRESH_INTERVAL)
+@traced(cat='render')
+def render_live_treemap(universe, data_version, figure_json):
+    # 只有這個 fragment 依固定頻率重跑；階層與版面沿用快照，只重算有成交的股票
+    feed = get_live_feed(universe, data_version)
+    key = f"live_treemap:{universe}:{data_version}"
+    if key not in st.session_state:
+        live = LiveTreemap(figure_json)
+        st.session_state[key] = (live, feed.table.positions(live.tickers))
+    live, order = st.session_state[key]
+    live.update(feed.table.prices()[order])
+    st.plotly_chart(live.to_figure(), use_container_width=True, key=f"live_chart_{universe}")
+    if feed.table.updated_at:
+        st.caption(f"⚡ 最後成交更新：{datetime.fromtimestamp(feed.table.updated_at):%H:%M:%S}")
+
+def treemap_universe(mode):
+    """熱力圖頁面 → 股票池代號 (「更多股票池」頁面由下拉選單決定)"""
+    if "S&P 500" in mode:
+        return 'sp500'
+    if "TWSE" in mode:
+        return 'twse'
+    return st.session_state.get('treemap_universe', 'sp500')
+
+@traced(cat='render')
+def render_universe_picker():
+    universes = available_universes()
+    universe = st.selectbox("股票池", list(universes), key='treemap_universe', format_func=universes.get)
+    st.caption("股票池定義於 universes/registry.json；成分股 CSV (Ticker, Name, Sector, Industry, Weight) "
+               "可放在 universes/ 或資料目錄的 universes/ 下。")
+    return universe
+
+@traced(cat='render')
+def render_treemap_page(universe):
+    # 市場概況 (Treemap)：直接送出該數據版本預先建好的 figure JSON
+    title_prefix = datasets.universe_title(universe)
+    with st.spinner(f'正在載入 {title_prefix} 數據...'):
+        base_df = get_constituents(universe)
+
+        if base_df.empty: st.error("無法取得清單"); return
+        tickers_list = base_df['Ticker'].tolist()
+
+        history_data = fetch_price_history(tickers_list)
+        if history_data.empty: st.error("無法取得股價"); return
+
+        snapshot = get_treemap_snapshot(universe, datasets.history_version(history_data))
+
+    if not snapshot: st.warning("無數據"); return
+
+    st.subheader(f"🗺️ 市場熱力圖 ({title_prefix})")
+    col_color, col_live = st.columns([3, 1])
+    with col_color:
+        color_by = st.radio("顏色依據", ["漲跌幅"] + [label for label, _, _ in VALUATION_COLORS],
+                            horizontal=True, key=f"color_by_{universe}")
+    with col_live:
+        live = st.toggle("⚡ 即時模式 (Live 1 Day)", key=f"live_{universe}", disabled=color_by != "漲跌幅")
+
+    if color_by != "漲跌幅":
+        # 整個股票池的基本面由背景排程預先算好；冷啟動時在背景逐檔抓取 (有速率限制)，先畫已完成的部分
+        data_version = datasets.history_version(history_data)
+        valuation, _, _, building = datasets.get_valuation_snapshot(universe)
+        if building:
+            render_valuation_progress(universe, data_version, color_by)
+            return
+        fig_json = get_valuation_figure(universe, data_version, color_by, valuation)
+        if fig_json is None: st.warning("無估值數據"); return
+        st.plotly_chart(json.loads(fig_json), use_container_width=True)
+        st.session_state['last_update'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return
+
+    tabs = st.tabs([label for label, _, _, _ in TREEMAP_HORIZONS])
+    for tab, (_, change_col, _, _) in zip(tabs, TREEMAP_HORIZONS):
+        with tab:
+            if live and change_col == '1D Change':
+                render_live_treemap(universe, datasets.history_version(history_data), snapshot['figures'][change_col])
+            else:
+                st.plotly_chart(json.loads(snapshot['figures'][change_col]), use_container_width=True)
+
+def render(mode):
+    universe = render_universe_picker() if "股票池" in mode else treemap_universe(mode)
+    render_treemap_page(universe)
+
+def refresh(mode):
+    universe = treemap_universe(mode)
+    base_df = get_constituents(universe)
+    if base_df.empty:
+        return
+    tickers_list = base_df['Ticker'].tolist()
+    invalidate_dataset('prices', tickers_list)
+    invalidate_dataset('market_caps', tickers_list)
+    invalidate_dataset('treemap', universe)
+    fetch_price_history.clear()
+    fetch_market_caps.clear()
+    get_treemap_snapshot.clear()
+    get_valuation_figure.clear()
+    datasets.get_price_store().expire(tickers_list)
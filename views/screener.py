@@ -0,0 +1,111 @@
+# ----------------------------------------------------------------------
+# 全市場技術篩選 (Screener) + 規則回測
+# ----------------------------------------------------------------------
+
+import streamlit as st
+import datasets
+from strategy import verdict_message
+from shared_cache import invalidate_dataset
+from perf_trace import traced, traced_cache
+from views.common import LOCAL_CACHE_TTL, get_constituents, available_universes, fetch_price_history, render_backtest_table
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def get_screener_table(universe, data_version):
+    return datasets.get_screener_table(universe, data_version)
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def get_backtest_table(universe, period, data_version):
+    return datasets.get_backtest_table(universe, period, data_version)
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def backtest_version(universe, period):
+    return datasets.backtest_version(universe, period)
+
+@traced(cat='render')
+def render_screener_page():
+    st.markdown('<div class="dashboard-card">', unsafe_allow_html=True)
+    st.subheader("🧮 全市場技術篩選 (Technical Screener)")
+    st.caption("以個股技術戰略的規則 (趨勢 / 均線排列 / 乖離率 / 60 日區間 / 頂部背離) 掃描整個股票池")
+
+    col_u, col_t, col_v = st.columns([1, 2, 2])
+    with col_u:
+        universes = available_universes()
+        universe = st.radio("股票池", list(universes), key='screener_universe', format_func=universes.get)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    with st.spinner(f"正在掃描 {universes[universe]} ..."):
+        base_df = get_constituents(universe)
+        if base_df.empty: st.error("無法取得清單"); return
+
+        # 與熱力圖共用同一份 1y 價格寬表，不逐檔下載
+        history_data = fetch_price_history(base_df['Ticker'].tolist())
+        if history_data.empty: st.error("無法取得股價"); return
+
+        table = get_screener_table(universe, datasets.history_version(history_data))
+
+    if table.empty: st.warning("無數據"); return
+
+    with col_t:
+        trends = st.multiselect("主要趨勢", sorted(table['Trend'].unique()))
+    with col_v:
+        flags = st.multiselect("條件", ["均線多頭排列", "頂部背離", "RSI 超買", "RSI 超賣"])
+
+    view = table
+    if trends:
+        view = view[view['Trend'].isin(trends)]
+    if "均線多頭排列" in flags:
+        view = view[view['MA Aligned']]
+    if "頂部背離" in flags:
+        view = view[view['Bearish Divergence']]
+    if "RSI 超買" in flags:
+        view = view[view['RSI'] > 70]
+    if "RSI 超賣" in flags:
+        view = view[view['RSI'] < 30]
+
+    view = view.assign(Verdict=[verdict_message(v)[1].replace("評語：", "") for v in view['Verdict']])
+    st.caption(f"符合條件：{len(view)} / {len(table)} 檔")
+    st.dataframe(
+        view, use_container_width=True, hide_index=True,
+        column_config={
+            'Close': st.column_config.NumberColumn(format="%.2f"),
+            'Change %': st.column_config.NumberColumn(format="%.2f%%"),
+            'RSI': st.column_config.NumberColumn(format="%.1f"),
+            'MACD Hist': st.column_config.NumberColumn(format="%.3f"),
+            'MA200 Dev %': st.column_config.NumberColumn(format="%.1f%%"),
+            '60D Low': st.column_config.NumberColumn(format="%.2f"),
+            '60D High': st.column_config.NumberColumn(format="%.2f"),
+        },
+    )
+
+    # --- 規則回測：同一組規則套用在每一根歷史 K 棒 ---
+    st.markdown("### 📊 規則回測 (Rule Backtest)")
+    col_p, col_run = st.columns([1, 4])
+    with col_p:
+        period = st.selectbox("回測期間", ["1y", "2y", "5y"], index=2, key='backtest_period')
+    run_key = f"backtest:{universe}:{period}"
+    with col_run:
+        st.write("")
+        if st.button("▶️ 執行回測", key='backtest_run'):
+            st.session_state[run_key] = True
+    if st.session_state.get(run_key):
+        with st.spinner(f"正在回測 {universes[universe]} ({period}) ..."):
+            stats = get_backtest_table(universe, period, backtest_version(universe, period))
+        render_backtest_table(stats)
+
+def render(mode):
+    render_screener_page()
+
+def refresh(mode):
+    universe = st.session_state.get('screener_universe', 'sp500')
+    base_df = get_constituents(universe)
+    if base_df.empty:
+        return
+    tickers_list = base_df['Ticker'].tolist()
+    invalidate_dataset('prices', tickers_list)
+    invalidate_dataset('screener', universe)
+    invalidate_dataset('backtest', universe)
+    fetch_price_history.clear()
+    get_screener_table.clear()
+    get_backtest_table.clear()
+    backtest_version.clear()
+    datasets.get_price_store().expire(tickers_list)
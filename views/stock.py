@@ -0,0 +1,400 @@
+# ----------------------------------------------------------------------
+# 個股技術戰略 (Stock Strategy)
+#   價格區塊先畫，基本面在背景執行緒載入後再填入；技術圖 (charts.py / make_subplots) 只在這個頁面載入。
+#   代號解析 → K 棒 → 指標 → 訊號 / 回測 / 圖表 為計算圖 (compute_graph.py) 的節點，
+#   調整顯示區間等互動只重算受影響的節點。
+# ----------------------------------------------------------------------
+
+import threading
+import concurrent.futures
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import datasets
+from charts import build_tech_chart
+from indicators import update_indicators
+from backtest import backtest_frame
+from strategy import latest_signals, verdict_message, DIVERGENCE_BEARISH, DIVERGENCE_NONE
+from shared_cache import invalidate_dataset
+from intraday_store import INTRADAY_INTERVALS, INTRADAY_SYNC_INTERVAL
+from compute_graph import ComputeGraph
+from perf_trace import traced, traced_cache
+from market_data import FetchError
+from views.common import LOCAL_CACHE_TTL, render_backtest_table
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def get_stock_data(ticker, period="2y"):
+    return datasets.get_stock_data(ticker, period)
+
+# 盤中 K 棒：本地日檔讀取只需毫秒，快取時間與同步間隔相同
+@traced_cache(st.cache_data(ttl=INTRADAY_SYNC_INTERVAL))
+def get_intraday_data(ticker, interval):
+    return datasets.get_intraday_data(ticker, interval)
+
+# 分析週期：日 K 依期間抓取，盤中週期依 INTRADAY_INTERVALS 的預設天數
+TIMEFRAME_LABELS = {
+    '1y': '1y', '2y': '2y', '5y': '5y',
+    '1m': '1分K (5日)', '5m': '5分K (20日)', '15m': '15分K (40日)', '60m': '60分K (120日)',
+}
+
+def get_chart_data(ticker, timeframe):
+    if timeframe in INTRADAY_INTERVALS:
+        return get_intraday_data(ticker, timeframe)
+    return get_stock_data(ticker, period=timeframe)
+
+@traced_cache(st.cache_data(ttl=LOCAL_CACHE_TTL))
+def get_fundamentals(ticker):
+    return datasets.get_fundamentals(ticker)
+
+# 背景執行緒 (附上目前 session 的 ScriptRunContext，可在執行緒中使用 st.cache_data)
+@st.cache_resource
+def get_background_executor():
+    return concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='page-background')
+
+def submit_in_background(fn, *args):
+    ctx = get_script_run_ctx()
+    def task():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+    return get_background_executor().submit(task)
+
+def tech_chart_figure(df, ticker, window, interval):
+    # 顯示區間：縮小區間時只畫區間內的 K 棒，點數夠少就回到原始週期的完整解析度
+    if window is not None:
+        days = df.index.normalize()
+        df = df[(days >= pd.Timestamp(window[0])) & (days <= pd.Timestamp(window[1]))]
+    return build_tech_chart(df, ticker, interval)
+
+@traced(cat='render')
+def render_fundamental_snapshot(fund_data):
+    try:
+        st.markdown("### 2. 基本面體質快照 (Fundamental Snapshot)")
+        f1, f2, f3, f4 = st.columns(4)
+
+        fwd_eps = fund_data.get('ForwardEPS')
+        f1.metric("Forward EPS", f"${fwd_eps:.2f}" if fwd_eps is not None else "N/A")
+
+        pe = fund_data.get('TrailingPE')
+        f2.metric("P/E (本益比)", f"{pe:.1f}x" if pe is not None else "N/A")
+
+        peg = fund_data.get('PEG')
+        peg_est = False
+        if peg is None:
+            pe_val = fund_data.get('TrailingPE')
+            growth = fund_data.get('EarningsGrowth')
+            if pe_val and growth and growth > 0:
+                peg = pe_val / (growth * 100)
+                peg_est = True
+
+        peg_str = f"{peg:.2f}" if peg is not None else "N/A"
+        f3.metric("PEG (Est.)" if peg_est else "PEG", peg_str)
+
+        p_fcf = fund_data.get('P/FCF')
+        f4.metric("P/FCF", f"{p_fcf:.1f}x" if p_fcf is not None else "N/A")
+
+        st.write("")
+
+        # [Clean-up] Removed redundant date block, using 3 columns only
+        f5, f6, f7 = st.columns(3)
+
+        gm = fund_data.get('GrossMargin')
+        f5.metric("毛利率", f"{gm*100:.1f}%" if gm is not None else "N/A")
+
+        om = fund_data.get('OperatingMargin')
+        f6.metric("營益率", f"{om*100:.1f}%" if om is not None else "N/A")
+
+        cl = fund_data.get('ContractLiabilities')
+        val_str = "N/A"
+        if cl is not None:
+            val_str = f"${cl/1e9:.1f}B" if cl > 1e9 else f"${cl/1e6:.1f}M"
+        f7.metric("合約負債 (RPO)", val_str)
+
+        st.write("")
+
+    except Exception as e:
+        st.error(f"基本面數據渲染錯誤: {e}")
+
+@traced(cat='render')
+def render_analyst_section(fund_data, last_row):
+    try:
+        est_df = fund_data.get('EarningsEst')
+        trend_df = fund_data.get('EPSTrend')
+        rec_summary = fund_data.get('RecSummary') # 評級分佈 DataFrame
+
+        has_est_data = est_df is not None and not est_df.empty
+        has_trend_data = trend_df is not None and not trend_df.empty
+        has_rec_data = rec_summary is not None and not rec_summary.empty
+
+        target_mean = fund_data.get('TargetMean')
+        recommendation = fund_data.get('Recommendation')
+
+        with st.expander("📊 點擊展開：分析師看法 (Analyst Estimates & Consensus)", expanded=True):
+
+            tabs = []
+            if has_est_data: tabs.append("未來預估")
+            if has_trend_data: tabs.append("修正趨勢")
+            if has_rec_data: tabs.append("評級分佈")
+
+            if tabs:
+                tab_objs = st.tabs(tabs)
+
+                # 1. 未來預估
+                if has_est_data:
+                    with tab_objs[tabs.index("未來預估")]:
+                        try:
+                            plot_data = est_df.copy()
+                            plot_data.index = plot_data.index.astype(str).str.lower()
+                            idx_map = {}
+                            for idx in plot_data.index:
+                                if 'avg' in idx: idx_map['avg'] = idx
+                                elif 'low' in idx: idx_map['low'] = idx
+                                elif 'high' in idx: idx_map['high'] = idx
+
+                            target_cols = [c for c in plot_data.columns if 'q' in c] or [c for c in plot_data.columns if 'y' in c]
+
+                            if 'avg' in idx_map and target_cols:
+                                rows = [idx_map['avg']]
+                                if 'low' in idx_map: rows.append(idx_map['low'])
+                                if 'high' in idx_map: rows.append(idx_map['high'])
+                                plot_df = plot_data.loc[rows, target_cols].T.reset_index()
+                                rename_map = {'index': 'Period', idx_map['avg']: 'Average'}
+                                if 'low' in idx_map: rename_map[idx_map['low']] = 'Low'
+                                if 'high' in idx_map: rename_map[idx_map['high']] = 'High'
+                                plot_df = plot_df.rename(columns=rename_map)
+                                if 'Low' not in plot_df.columns: plot_df['Low'] = plot_df['Average']
+                                if 'High' not in plot_df.columns: plot_df['High'] = plot_df['Average']
+
+                                fig_est = px.bar(plot_df, x='Period', y='Average', title="分析師 EPS 預估", text_auto='.2f', color='Average', color_continuous_scale='Blues')
+                                fig_est.update_traces(error_y=dict(type='data', array=plot_df['High']-plot_df['Average'], arrayminus=plot_df['Average']-plot_df['Low'], visible=True))
+                                fig_est.update_layout(plot_bgcolor='white', font=dict(color='black'))
+                                st.plotly_chart(fig_est, use_container_width=True)
+                            else:
+                                st.info("無季度數據")
+                        except: st.info("繪圖失敗")
+
+                # 2. 修正趨勢
+                if has_trend_data:
+                    with tab_objs[tabs.index("修正趨勢")]:
+                        try:
+                            trend_plot = trend_df.T
+                            time_order = ['90daysAgo', '60daysAgo', '30daysAgo', '7daysAgo', 'current']
+                            valid_order = [t for t in time_order if t in trend_plot.index]
+                            if valid_order:
+                                trend_plot = trend_plot.loc[valid_order]
+                                fig_trend = go.Figure()
+                                for col in trend_plot.columns:
+                                    fig_trend.add_trace(go.Scatter(x=trend_plot.index, y=trend_plot[col], mode='lines+markers', name=col))
+                                fig_trend.update_layout(title="EPS 預估修正趨勢", plot_bgcolor='white', font=dict(color='black'))
+                                st.plotly_chart(fig_trend, use_container_width=True)
+                        except: st.info("繪圖失敗")
+
+                # 3. 評級分佈 (新增)
+                if has_rec_data:
+                    with tab_objs[tabs.index("評級分佈")]:
+                        try:
+                            latest_rec = rec_summary.iloc[0] # Series
+                            rec_keys = ['strongBuy', 'buy', 'hold', 'sell', 'strongSell']
+                            rec_vals = [latest_rec.get(k, 0) for k in rec_keys]
+
+                            fig_rec = px.bar(x=rec_keys, y=rec_vals, title="分析師評級分佈 (Consensus)", 
+                                             labels={'x': 'Rating', 'y': 'Count'}, color=rec_keys,
+                                             color_discrete_map={'strongBuy': 'green', 'buy': 'lightgreen', 'hold': 'grey', 'sell': 'pink', 'strongSell': 'red'})
+                            fig_rec.update_layout(plot_bgcolor='white', font=dict(color='black'))
+                            st.plotly_chart(fig_rec, use_container_width=True)
+                        except: st.info("繪圖失敗")
+
+            else:
+                if target_mean is None:
+                    st.info("⚠️ 暫無詳細分析師數據。")
+
+            # 目標價顯示 (Always show if available)
+            if target_mean is not None:
+                st.markdown("#### 🎯 目標價與評級 (Price Targets)")
+
+                col_t1, col_t2 = st.columns([1, 2])
+                with col_t1:
+                    st.metric("分析師評級", str(recommendation).upper().replace('_', ' ') if recommendation else "N/A")
+                    st.metric("平均目標價", f"${target_mean}", delta=f"{((target_mean - last_row['Close'])/last_row['Close']*100):.1f}%" if last_row['Close'] else None)
+                    if fund_data.get('NumAnalysts'):
+                        st.caption(f"基於 {fund_data['NumAnalysts']} 位分析師")
+
+                with col_t2:
+                    current_price = last_row['Close']
+                    low_target = fund_data.get('TargetLow', current_price * 0.9)
+                    high_target = fund_data.get('TargetHigh', current_price * 1.1)
+
+                    fig_target = go.Figure()
+                    fig_target.add_trace(go.Bar(y=['Price'], x=[low_target], name='Low', orientation='h', marker_color='#ff4b4b'))
+                    fig_target.add_trace(go.Bar(y=['Price'], x=[target_mean - low_target], name='Mean', orientation='h', marker_color='#2b7de9', base=low_target))
+                    fig_target.add_trace(go.Bar(y=['Price'], x=[high_target - target_mean], name='High', orientation='h', marker_color='#008000', base=target_mean))
+                    fig_target.add_vline(x=current_price, line_width=3, line_dash="dash", line_color="black", annotation_text="Now")
+
+                    fig_target.update_layout(barmode='stack', title="目標價區間", height=200, margin=dict(l=20, r=20, t=30, b=20), showlegend=False, plot_bgcolor='white', font=dict(color='black'))
+                    st.plotly_chart(fig_target, use_container_width=True)
+
+    except Exception as e:
+        st.error(f"分析師預估區塊錯誤: {e}")
+
+@traced(cat='render')
+def render_stock_strategy_page():
+    st.markdown('<div class="dashboard-card">', unsafe_allow_html=True)
+    c1, c2 = st.columns([4, 1])
+    with c1:
+        st.subheader("🔍 個股技術戰略分析 (Technical Strategy)")
+        st.caption("基於《Technical Analysis Profitability Rules》與基本面估值模型")
+    
+    col_input1, col_input2, col_btn = st.columns([3, 1, 1])
+    with col_input1:
+        ticker_input = st.text_input("輸入股票代號 (例如: NVDA, AAPL, 2330.TW)", value="AAPL")
+    with col_input2:
+        timeframe = st.selectbox("分析週期", list(TIMEFRAME_LABELS), index=0, format_func=TIMEFRAME_LABELS.get)
+    with col_btn:
+        st.write("") 
+        st.write("") 
+        analyze_btn = st.button("🚀 開始分析", type="primary", use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    if analyze_btn or (ticker_input and ticker_input != ""):
+        ticker = ticker_input.upper().strip()
+        
+        if ticker.isdigit() and len(ticker) == 4:
+            st.caption(f"💡 偵測到數字代號，將以台股上市模式查詢：{ticker}.TW")
+
+        # 已知代號：基本面與 K 棒同時開始抓 (背景執行緒)，不必等價格數據
+        directory = datasets.get_symbol_directory()
+        candidates = directory.resolve(ticker)
+        fund_future = None
+        if candidates and directory.is_known(candidates[0]):
+            fund_future = submit_in_background(get_fundamentals, candidates[0])
+
+        # 代號解析與歷史 K 棒同一次完成：已知代號不再另外驗證，未知代號以抓到的 K 棒判斷 (.TW → .TWO)
+        # 同一個輸入在這個 session 只解析一次
+        graph = ComputeGraph(st.session_state, 'stock')
+        try:
+            with st.spinner(f"正在查詢 {ticker} ..."):
+                resolved = graph.node('symbol', lambda: directory.lookup(ticker, lambda symbol: get_chart_data(symbol, timeframe))[0],
+                                      key=(ticker, timeframe)).value
+        except FetchError:
+            # 資料源出錯：不能斷定代號無效，下次重跑再查
+            st.error(f"⚠️ 暫時無法取得 {ticker} 的行情，請稍後再試。")
+            return
+
+        if resolved is None:
+            graph.discard('symbol')
+            st.error(f"❌ 查無代號：{ticker}")
+            return
+        ticker = resolved
+        st.session_state['stock_symbol'] = ticker  # 強制更新只作廢目前顯示的代號
+        if fund_future is None or candidates[0] != ticker:
+            fund_future = submit_in_background(get_fundamentals, ticker)
+
+        with st.spinner(f"✅ 代號確認！正在計算 {ticker} 技術指標..."):
+            # K 棒每次重跑都讀取 (本程序快取)，下游節點依數據版本決定是否重算
+            try:
+                prices = graph.source('prices', lambda: get_chart_data(ticker, timeframe), key=(ticker, timeframe))
+            except FetchError:
+                st.error(f"⚠️ 暫時無法取得 {ticker} 的行情，請稍後再試。")
+                return
+            df = prices.value
+            if df.empty or len(df) < 50:
+                st.warning("⚠️ 數據不足，無法進行完整技術分析。")
+                return
+            
+            # 數據版本改變時只推進新 K 棒 (指標狀態存在 session_state)
+            def with_indicators(frame):
+                cache_key = f"indicators:{ticker}:{timeframe}"
+                frame, st.session_state[cache_key] = update_indicators(frame, st.session_state.get(cache_key))
+                return frame
+
+            indicators = graph.node('indicators', with_indicators, prices)
+            df = indicators.value
+            last_row = df.iloc[-1]
+            signals = graph.node('signals', latest_signals, indicators).value  # 規則與全市場篩選共用 (strategy.py)
+
+            # --- A. 狀態儀表板 ---
+            st.markdown("### 1. 即時技術狀態 (Technical Status)")
+            m1, m2, m3, m4 = st.columns(4)
+            
+            chg = signals['Change %']
+            m1.metric(f"收盤價 ({ticker})", f"${last_row['Close']:.2f}", f"{chg:.2f}%")
+            
+            m2.metric("主要趨勢", signals['Trend'])
+
+            rsi_val = signals['RSI']
+            m3.metric("RSI 動能", f"{rsi_val:.1f}", signals['RSI Status'])
+            
+            macd_val = signals['MACD Hist']
+            macd_sig = "多方控盤" if macd_val > 0 else "空方控盤"
+            m4.metric("MACD 動能", f"{macd_val:.2f}", macd_sig)
+
+            st.write("")
+
+            # --- 基本面 / 分析師區塊：先放佔位，價格相關區塊畫完後再填入 ---
+            fund_slot = st.empty()
+            analyst_slot = st.empty()
+            fund_slot.info("⏳ 基本面數據載入中...")
+
+            # --- B. 圖表區域 ---
+            st.markdown("### 3. 技術分析圖表")
+            window = None
+            first_day, last_day = df.index[0].date(), df.index[-1].date()
+            if first_day < last_day:
+                window = st.slider("顯示區間", min_value=first_day, max_value=last_day, value=(first_day, last_day),
+                                   format="YYYY-MM-DD", key=f"chart_window:{ticker}:{timeframe}")
+                if window == (first_day, last_day):
+                    window = None
+            interval = timeframe if timeframe in INTRADAY_INTERVALS else '1d'
+            chart = graph.node('chart', lambda frame: tech_chart_figure(frame, ticker, window, interval),
+                               indicators, key=(window, interval))
+            st.plotly_chart(chart.value, use_container_width=True)
+
+            # --- C. 策略檢查清單 ---
+            st.markdown("---")
+            
+            c1, c2 = st.columns(2)
+            with c1:
+                st.markdown('<div class="dashboard-card">', unsafe_allow_html=True)
+                st.markdown("#### 🔍 趨勢與型態")
+                st.markdown(f"- **均線排列**: {'✅ 多頭' if signals['MA Aligned'] else '⚠️ 糾結/空頭'}")
+                st.markdown(f"- **乖離率**: {signals['MA200 Dev %']:.1f}%")
+                st.markdown(f"- **區間 (60日)**: ${signals['60D Low']:.0f} ~ ${signals['60D High']:.0f}")
+                st.markdown('</div>', unsafe_allow_html=True)
+
+            with c2:
+                st.markdown('<div class="dashboard-card">', unsafe_allow_html=True)
+                st.markdown("#### 🛡️ 風險與建議")
+                
+                divergence = DIVERGENCE_BEARISH if signals['Bearish Divergence'] else DIVERGENCE_NONE
+                st.markdown(f"- **背離訊號**: {divergence}")
+                
+                level, verdict = verdict_message(signals['Verdict'])
+                getattr(st, level)(verdict)
+                st.markdown('</div>', unsafe_allow_html=True)
+
+            with st.expander("📊 規則回測：本檔歷史上出現同樣評語之後的表現"):
+                render_backtest_table(graph.node('backtest', backtest_frame, indicators).value)
+
+        fund_data = fund_future.result()
+        with fund_slot.container():
+            render_fundamental_snapshot(fund_data)
+        with analyst_slot.container():
+            render_analyst_section(fund_data, last_row)
+
+def render(mode):
+    render_stock_strategy_page()
+
+def refresh(mode):
+    # 只作廢目前顯示的代號 (其他代號與其他頁面的共用快取、同步節流不受影響)
+    ticker = st.session_state.get('stock_symbol')
+    get_stock_data.clear()
+    get_fundamentals.clear()
+    get_intraday_data.clear()
+    if not ticker:
+        return
+    invalidate_dataset('stock', ticker)
+    invalidate_dataset('fundamentals', ticker)
+    datasets.get_price_store().expire([ticker])
+    datasets.get_intraday_store().expire([ticker])
+    datasets.get_fundamentals_store().expire([ticker])